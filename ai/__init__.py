@@ -7,12 +7,20 @@ Exports:
 - Recommender: suggests moves + strategy comments (uses ML model when available).
 - FeedbackGenerator: produces human-friendly textual tips.
 - utils: feature extraction helpers.
+- IncrementalFeatureEncoder: push/pop-aware version of encode_board_features.
+- FallbackSearcher: alpha-beta search used for suggestions when no engine is available.
+- ForestModel: array-backed inference for the exported random forests (forest_runtime).
+- ModelRegistry / get_registry: per-process, memory-mapped model loading with reload on change.
 - AnalysisPipeline: convenient wrapper for full analysis (eval + suggestions + feedback).
 """
 from .evaluator import Evaluator
 from .recommender import Recommender
 from .feedback_generator import FeedbackGenerator
-from .utils import encode_board_features, move_type_label
+from .utils import encode_board_features, encode_boards_features, move_type_label
+from .feature_encoder import IncrementalFeatureEncoder
+from .search import FallbackSearcher
+from .forest_runtime import ForestModel
+from .model_registry import ModelRegistry, get_registry
 from .analysis_pipeline import AnalysisPipeline
 
-__all__ = ["Evaluator", "Recommender", "FeedbackGenerator", "encode_board_features", "AnalysisPipeline", "move_type_label"]
+__all__ = ["Evaluator", "Recommender", "FeedbackGenerator", "encode_board_features", "encode_boards_features", "AnalysisPipeline", "move_type_label", "IncrementalFeatureEncoder", "FallbackSearcher", "ForestModel", "ModelRegistry", "get_registry"]
@@ -18,8 +18,25 @@ class AnalysisPipeline:
 
 
     def analyze(self, board, last_move=None):
-        eval_cp = self.evaluator.evaluate_board(board)
-        suggestions = self.recommender.suggest_moves(board)
+        # one MultiPV search (if an engine is present) feeds both eval and suggestions
+        engine_lines = None
+        searched = False
+        if self.evaluator.engine_service:
+            searched = True
+            try:
+                engine_lines = self.evaluator.engine_service.analyze_multipv(
+                    board,
+                    multipv=self.recommender.config.get("engine_multipv", self.recommender.count),
+                    limit=self.evaluator.config.get("engine_time", 0.05)
+                )
+            except Exception:
+                engine_lines = None
+        # the root was already searched (successfully or not): never search it again
+        if engine_lines:
+            eval_cp = engine_lines[0]["cp"]
+        else:
+            eval_cp = self.evaluator.evaluate_board(board, use_engine=not searched)
+        suggestions = self.recommender.suggest_moves(board, engine_lines=engine_lines, use_engine=not searched)
         feedback = self.feedback_gen.generate_feedback(board, last_move=last_move, eval_score=eval_cp, suggestions=suggestions)
         return {
             "eval": eval_cp,
@@ -0,0 +1,141 @@
+# ai/bitboard_eval.py
+"""
+Bitboard material + mobility evaluation, the fallback when neither engine nor model
+gives a score.
+
+- material: popcount(board.pieces_mask(piece, color)) x piece value
+- mobility: pseudo-legal attack count, i.e. for every knight, bishop, rook, queen and
+  king the squares it attacks that are not occupied by its own side (pawns are not
+  counted). No move list is generated.
+
+Two paths compute the same value:
+- evaluate(board): one position, python-chess attack masks.
+- evaluate_batch(boards) / evaluate_bitboards(bb): many positions at once on an
+  (n, 12) uint64 array of piece bitboards; sliding attacks use Kogge-Stone fills, so
+  the cost is a fixed number of NumPy ops per batch. Along one direction the rays of
+  different pieces never overlap (a ray stops at the first piece it meets), and
+  knight/king offsets are injective, so popcounts of the per-direction unions equal
+  the per-piece sums of the scalar path.
+
+Scores are centipawns from White's perspective.
+"""
+
+import chess
+import numpy as np
+
+PIECE_TYPES = [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING]
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 320,
+    chess.BISHOP: 330,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 0       # both sides always have one
+}
+# centipawns per attacked square
+MOBILITY_WEIGHT = 1.0
+
+_MOBILE = [chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING]
+_VALUES = np.array([PIECE_VALUES[pt] for pt in PIECE_TYPES], dtype=np.int64)
+
+
+def evaluate(board: chess.Board) -> float:
+    """Material + mobility of one position."""
+    score = 0
+    for pt in PIECE_TYPES:
+        val = PIECE_VALUES[pt]
+        if val:
+            score += val * (chess.popcount(board.pieces_mask(pt, chess.WHITE)) - chess.popcount(board.pieces_mask(pt, chess.BLACK)))
+    return float(score + MOBILITY_WEIGHT * (mobility(board, chess.WHITE) - mobility(board, chess.BLACK)))
+
+
+def mobility(board: chess.Board, color: bool) -> int:
+    """Attacked squares not occupied by `color`, summed over its non-pawn pieces."""
+    own = board.occupied_co[color]
+    total = 0
+    for pt in _MOBILE:
+        for sq in chess.scan_forward(board.pieces_mask(pt, color)):
+            total += chess.popcount(board.attacks_mask(sq) & ~own)
+    return total
+
+
+def board_bitboards(boards) -> np.ndarray:
+    """(n, 12) uint64: white P, N, B, R, Q, K then black P..K piece masks per board."""
+    rows = []
+    for b in boards:
+        white, black = b.occupied_co[chess.WHITE], b.occupied_co[chess.BLACK]
+        kinds = (b.pawns, b.knights, b.bishops, b.rooks, b.queens, b.kings)
+        rows.append([k & white for k in kinds] + [k & black for k in kinds])
+    return np.array(rows, dtype=np.uint64).reshape(-1, 12)
+
+
+def evaluate_batch(boards) -> np.ndarray:
+    """evaluate() for every board, as one float64 array."""
+    return evaluate_bitboards(board_bitboards(boards))
+
+
+def evaluate_bitboards(bb: np.ndarray) -> np.ndarray:
+    bb = np.asarray(bb, dtype=np.uint64).reshape(-1, 12)
+    counts = popcount(bb).astype(np.int64)
+    material = (counts[:, :6] - counts[:, 6:]) @ _VALUES
+    white, black = bb[:, :6], bb[:, 6:]
+    own_w = np.bitwise_or.reduce(white, axis=1)
+    own_b = np.bitwise_or.reduce(black, axis=1)
+    empty = ~(own_w | own_b)
+    mob = _mobility_batch(white, own_w, empty) - _mobility_batch(black, own_b, empty)
+    return material.astype(np.float64) + MOBILITY_WEIGHT * mob
+
+
+def _popcount_lut(x: np.ndarray) -> np.ndarray:
+    x = np.ascontiguousarray(x, dtype=np.uint64)
+    return _BYTE_POPCOUNT[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1, dtype=np.int64)
+
+
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# np.bitwise_count needs NumPy >= 2.0
+popcount = getattr(np, "bitwise_count", _popcount_lut)
+
+_U = np.uint64
+_FULL = _U(0xFFFFFFFFFFFFFFFF)
+_NOT_A = _U(~chess.BB_FILE_A & 0xFFFFFFFFFFFFFFFF)
+_NOT_H = _U(~chess.BB_FILE_H & 0xFFFFFFFFFFFFFFFF)
+_NOT_AB = _U(~(chess.BB_FILE_A | chess.BB_FILE_B) & 0xFFFFFFFFFFFFFFFF)
+_NOT_GH = _U(~(chess.BB_FILE_G | chess.BB_FILE_H) & 0xFFFFFFFFFFFFFFFF)
+
+# (shift, mask of squares the shifted bits may land on); positive = towards h8
+_ROOK_DIRS = [(8, _FULL), (-8, _FULL), (1, _NOT_A), (-1, _NOT_H)]
+_BISHOP_DIRS = [(9, _NOT_A), (7, _NOT_H), (-7, _NOT_A), (-9, _NOT_H)]
+_KNIGHT_STEPS = [(17, _NOT_A), (15, _NOT_H), (10, _NOT_AB), (6, _NOT_GH),
+                 (-6, _NOT_AB), (-10, _NOT_GH), (-15, _NOT_A), (-17, _NOT_H)]
+_KING_STEPS = _ROOK_DIRS + _BISHOP_DIRS
+
+
+def _shift(x: np.ndarray, s: int) -> np.ndarray:
+    return x << _U(s) if s > 0 else x >> _U(-s)
+
+
+def _sliding_attacks(gen: np.ndarray, empty: np.ndarray, s: int, mask) -> np.ndarray:
+    """Kogge-Stone occluded fill of `gen` along one direction, shifted once more to get the attacks."""
+    pro = empty & mask
+    gen = gen | (pro & _shift(gen, s))
+    pro = pro & _shift(pro, s)
+    gen = gen | (pro & _shift(gen, 2 * s))
+    pro = pro & _shift(pro, 2 * s)
+    gen = gen | (pro & _shift(gen, 4 * s))
+    return _shift(gen, s) & mask
+
+
+def _mobility_batch(pieces: np.ndarray, own: np.ndarray, empty: np.ndarray) -> np.ndarray:
+    """pieces: (n, 6) masks of one side (P..K); returns its mobility per board."""
+    knights, bishops, rooks, queens, kings = (pieces[:, i] for i in range(1, 6))
+    not_own = ~own
+    total = np.zeros(len(pieces), dtype=np.int64)
+    for s, mask in _ROOK_DIRS:
+        total += popcount(_sliding_attacks(rooks | queens, empty, s, mask) & not_own)
+    for s, mask in _BISHOP_DIRS:
+        total += popcount(_sliding_attacks(bishops | queens, empty, s, mask) & not_own)
+    for s, mask in _KNIGHT_STEPS:
+        total += popcount(_shift(knights, s) & mask & not_own)
+    for s, mask in _KING_STEPS:
+        total += popcount(_shift(kings, s) & mask & not_own)
+    return total
@@ -0,0 +1,79 @@
+# ai/eval_cache.py
+"""
+Bounded in-process cache of position evaluations, keyed by the python-chess
+Zobrist hash (chess.polyglot.zobrist_hash).
+
+Each entry stores the score together with the tier that produced it
+('material' < 'model' < 'engine') and the search depth (0 for model/material).
+- get() only returns an entry whose tier is at least the requested tier, so a
+  cheap material score never shadows an engine evaluation.
+- put() keeps the existing entry if it is stronger (higher tier, or same tier
+  and deeper), i.e. deeper results win.
+- Least recently used entries are evicted once max_entries is reached.
+"""
+
+import threading
+from collections import OrderedDict
+
+TIER_RANK = {"material": 0, "model": 1, "engine": 2}
+
+
+class EvalCache:
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max(0, int(max_entries))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: int, min_tier: str = "material"):
+        """Return (score, tier, depth) or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or TIER_RANK[entry[1]] < TIER_RANK[min_tier]:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: int, score: float, tier: str, depth: int = 0):
+        if self.max_entries == 0:
+            return
+        depth = int(depth or 0)
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None and (TIER_RANK[old[1]], old[2]) > (TIER_RANK[tier], depth):
+                # stronger/deeper result already cached
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = (score, tier, depth)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, tier: str = None):
+        """Drop every entry, or only those of one tier (e.g. "model" after a model reload)."""
+        with self._lock:
+            if tier is None:
+                self._entries.clear()
+                return
+            for key in [k for k, entry in self._entries.items() if entry[1] == tier]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0
+            }
+
+    def __len__(self):
+        return len(self._entries)
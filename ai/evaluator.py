@@ -3,89 +3,180 @@
 Evaluator: provides evaluate_board() that returns centipawn evaluation (float).
 Behavior:
 - If Stockfish (engine_service) is provided and available, prefers engine analysis.
-- Otherwise uses a trained ML model (models/move_evaluator.pkl) if present.
-- If no model, uses a fallback material evaluator.
+- Otherwise uses a trained ML model (models/move_evaluator.pkl) if present, loaded
+  through the shared model_registry (memory-mapped, reloaded when the file changes).
+- If no model, uses a fallback material + mobility evaluator (bitboard_eval).
+- Results are memoized in a Zobrist-keyed LRU cache (ai_config 'eval_cache_size',
+  0 disables it); see eval_cache.EvalCache.
 """
 
 import os
 import numpy as np
-import joblib
 import chess
-from .utils import encode_board_features
+import chess.polyglot
+from . import bitboard_eval
+from .eval_cache import EvalCache
+from .model_registry import get_registry
+from .utils import encode_board_features, encode_boards_features
 
-MODEL_PATH_DEFAULT = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "models", "move_evaluator.pkl")
+MODEL_PATH_DEFAULT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "move_evaluator.pkl")
+_FROM_REGISTRY = object()
 
 class Evaluator:
-    def __init__(self, engine_service=None, ai_config: dict = None, model_path: str = None):
+    def __init__(self, engine_service=None, ai_config: dict = None, model_path: str = None, registry=None):
         """
         engine_service: instance of ChessEngineService (may be None)
         ai_config: config dict with keys 'fallback_search_depth', 'engine_time' etc.
         model_path: path to saved move_evaluator.pkl
+        registry: model_registry.ModelRegistry (default: the process-wide one)
         """
         self.engine_service = engine_service
         self.config = ai_config or {}
         self.model_path = model_path or MODEL_PATH_DEFAULT
-        self.model = None
-        self._load_model()
+        self.registry = registry or get_registry()
+        self.reload_interval = self.config.get("model_reload_interval", 2.0)
+        self._pinned = _FROM_REGISTRY
+        self._model_version = None
+        self.cache = EvalCache(self.config.get("eval_cache_size", 4096))
+        self.model     # load now rather than on the first request
 
-    def _load_model(self):
-        if os.path.exists(self.model_path):
-            try:
-                self.model = joblib.load(self.model_path)
-            except Exception as e:
-                print(f"[Evaluator] Could not load model at {self.model_path}: {e}")
-                self.model = None
+    @property
+    def model(self):
+        """
+        The ML model in use: the shared registry's model for model_path (reloaded when
+        the file changes), unless one was assigned directly (`evaluator.model = ...`).
+        """
+        if self._pinned is not _FROM_REGISTRY:
+            return self._pinned
+        loaded = self.registry.get(self.model_path, max_age=self.reload_interval)
+        if loaded.version != self._model_version:
+            # evaluations cached from the previous model are stale (engine and
+            # material entries do not depend on it)
+            if self._model_version is not None:
+                self.cache.clear(tier="model")
+            self._model_version = loaded.version
+        return loaded.model
+
+    @model.setter
+    def model(self, model):
+        self._pinned = model
 
-    def evaluate_board(self, board: chess.Board) -> float:
+    def evaluate_board(self, board: chess.Board, use_engine: bool = True) -> float:
         """
         Returns centipawn score from White's perspective (positive = White advantage).
         Priority:
-         1) Use engine if available.
+         1) Use engine if available (and use_engine).
          2) Use ML model if loaded.
          3) Fallback material heuristic.
         """
+        # read once: a reload in the registry cannot switch models halfway through this call
+        model = self.model
+        key = chess.polyglot.zobrist_hash(board)
+        cached = self.cache.get(key, min_tier=self._best_tier(use_engine, model))
+        if cached is not None:
+            return cached[0]
+
         # 1) engine
-        if self.engine_service:
-            try:
-                info = self.engine_service.analyze(board, limit=self.config.get("engine_time", 0.05))
-                if info and "score" in info:
-                    score = info["score"]
-                    # convert to centipawns
-                    if score.is_mate():
-                        mate = score.white().mate()
-                        return 100000.0 if mate and mate > 0 else -100000.0
-                    cp = score.white().cp
-                    return float(cp) if cp is not None else 0.0
-            except Exception:
-                pass
-                
+        if use_engine and self.engine_service:
+            res = self._engine_eval(board)
+            if res is not None:
+                self.cache.put(key, res[0], "engine", res[1])
+                return res[0]
+
         # 2) ML model
-        if self.model is not None:
+        if model is not None:
             try:
                 feat = encode_board_features(board).reshape(1, -1)
-                pred = self.model.predict(feat)
+                pred = model.predict(feat)
                 # model returns rough centipawn value
-                return float(pred[0])
+                score = float(pred[0])
+                self.cache.put(key, score, "model")
+                return score
             except Exception as e:
                 print("[Evaluator] model prediction failed:", e)
 
         # 3) fallback material eval
-        return float(self._material_eval(board))
-
-    def _material_eval(self, board: chess.Board) -> int:
-        # simple piece-value sum (centipawn style)
-        values = {
-            chess.PAWN: 100,
-            chess.KNIGHT: 320,
-            chess.BISHOP: 330,
-            chess.ROOK: 500,
-            chess.QUEEN: 900,
-            chess.KING: 20000
-        }
-        score = 0
-        for ptype, val in values.items():
-            score += len(board.pieces(ptype, chess.WHITE)) * val
-            score -= len(board.pieces(ptype, chess.BLACK)) * val
-        # small mobility factor
-        score += int(0.1 * len(list(board.legal_moves)))
+        score = float(self._material_eval(board))
+        self.cache.put(key, score, "material")
         return score
+
+    def evaluate_boards(self, boards: list, features=None, use_engine: bool = True) -> list:
+        """
+        Batched evaluate_board(): same priority per position, but every position that
+        falls through to the ML model is scored by ONE model.predict call.
+        features: optional precomputed encode_boards_features(boards) matrix.
+        Returns a list of floats in the same order as `boards`.
+        """
+        model = self.model
+        scores = [None] * len(boards)
+        keys = [chess.polyglot.zobrist_hash(b) for b in boards]
+        min_tier = self._best_tier(use_engine, model)
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key, min_tier=min_tier)
+            if cached is not None:
+                scores[i] = cached[0]
+
+        # 1) engine (searches cannot be batched; one per position)
+        if use_engine and self.engine_service:
+            for i, board in enumerate(boards):
+                if scores[i] is None:
+                    res = self._engine_eval(board)
+                    if res is not None:
+                        scores[i] = res[0]
+                        self.cache.put(keys[i], res[0], "engine", res[1])
+
+        # 2) ML model, one predict over all remaining positions
+        pending = [i for i, s in enumerate(scores) if s is None]
+        if pending and model is not None:
+            try:
+                if features is not None:
+                    X = np.asarray(features)[pending]
+                else:
+                    X = encode_boards_features([boards[i] for i in pending])
+                preds = model.predict(X)
+                for i, pred in zip(pending, preds):
+                    scores[i] = float(pred)
+                    self.cache.put(keys[i], scores[i], "model")
+            except Exception as e:
+                print("[Evaluator] batched model prediction failed:", e)
+
+        # 3) fallback material eval, vectorized over the remaining positions
+        pending = [i for i, s in enumerate(scores) if s is None]
+        if pending:
+            material = bitboard_eval.evaluate_batch([boards[i] for i in pending])
+            for i, score in zip(pending, material):
+                scores[i] = float(score)
+                self.cache.put(keys[i], scores[i], "material")
+        return scores
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
+
+    def _best_tier(self, use_engine: bool = True, model=None) -> str:
+        """Strongest tier this evaluator can currently produce with `model` (minimum acceptable cache tier)."""
+        if use_engine and self.engine_service and getattr(self.engine_service, "available", True):
+            return "engine"
+        if model is not None:
+            return "model"
+        return "material"
+
+    def _engine_eval(self, board: chess.Board):
+        """Engine (centipawns from White's perspective, depth), or None if unavailable."""
+        try:
+            info = self.engine_service.analyze(board, limit=self.config.get("engine_time", 0.05))
+            if info and "score" in info:
+                score = info["score"]
+                depth = info.get("depth", 0)
+                # convert to centipawns
+                if score.is_mate():
+                    mate = score.white().mate()
+                    return (100000.0 if mate and mate > 0 else -100000.0), depth
+                cp = score.white().cp
+                return (float(cp) if cp is not None else 0.0), depth
+        except Exception:
+            pass
+        return None
+
+    def _material_eval(self, board: chess.Board) -> float:
+        # bitboard material + pseudo-legal attack mobility (no move generation)
+        return bitboard_eval.evaluate(board)
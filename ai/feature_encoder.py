@@ -0,0 +1,133 @@
+# ai/feature_encoder.py
+"""
+Incremental version of utils.encode_board_features.
+
+IncrementalFeatureEncoder follows board.push / board.pop and keeps the material counts
+and piece-square sums up to date from the moved, captured and promoted pieces, so only
+the cheap per-position terms (mobility, check, castling rights) are recomputed per node.
+The produced vectors are identical to encode_board_features(board).
+
+Usage:
+    enc = IncrementalFeatureEncoder(board)
+    for mv in board.legal_moves:
+        feat = enc.features_after(mv)      # push, encode, pop
+"""
+
+import chess
+import numpy as np
+from .utils import PST
+
+PIECE_TYPES = [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING]
+
+# index of each PST sum in the encoder state, matching encode_board_features order:
+# [white pawns, black pawns, white knights, black knights]
+_PST_SLOT = {
+    (chess.PAWN, chess.WHITE): 0,
+    (chess.PAWN, chess.BLACK): 1,
+    (chess.KNIGHT, chess.WHITE): 2,
+    (chess.KNIGHT, chess.BLACK): 3,
+}
+
+
+def _material_slot(piece_type: int, color: bool) -> int:
+    # material vector is 6 white counts (P..K) followed by 6 black counts
+    return (piece_type - 1) + (0 if color == chess.WHITE else 6)
+
+
+def _pst_value(piece_type: int, color: bool, square: int) -> float:
+    # pst is indexed from white's perspective; if black, mirror
+    idx = square if color == chess.WHITE else chess.square_mirror(square)
+    return PST[piece_type][idx]
+
+
+class IncrementalFeatureEncoder:
+    def __init__(self, board: chess.Board):
+        """
+        board: the board to follow. Moves must be made through push()/pop() of this
+        encoder (which forward to the board) so the running terms stay in sync.
+        """
+        self.board = board
+        self._stack = []
+        self.reset()
+
+    def reset(self):
+        """Recompute the running terms from scratch (e.g. after the board was changed directly)."""
+        board = self.board
+        self._material = [0] * 12
+        for pt in PIECE_TYPES:
+            self._material[_material_slot(pt, chess.WHITE)] = len(board.pieces(pt, chess.WHITE))
+            self._material[_material_slot(pt, chess.BLACK)] = len(board.pieces(pt, chess.BLACK))
+        self._pst = [0.0, 0.0, 0.0, 0.0]
+        for (pt, color), slot in _PST_SLOT.items():
+            s = 0.0
+            for sq in board.pieces(pt, color):
+                s += _pst_value(pt, color, sq)
+            self._pst[slot] = s
+        self._stack = []
+
+    def push(self, move: chess.Move):
+        board = self.board
+        self._stack.append((list(self._material), list(self._pst)))
+
+        piece = board.piece_at(move.from_square)
+        color = piece.color
+
+        # captured piece (en passant captures a pawn off the destination square;
+        # chess960-style castling "captures" an own rook, which is not a capture)
+        if board.is_en_passant(move):
+            cap_square = move.to_square + (-8 if color == chess.WHITE else 8)
+            captured = chess.Piece(chess.PAWN, not color)
+        else:
+            cap_square = move.to_square
+            captured = board.piece_at(move.to_square)
+            if captured is not None and captured.color == color:
+                captured = None
+        if captured is not None:
+            self._remove(captured.piece_type, captured.color, cap_square)
+
+        # moved piece leaves its square and arrives (possibly promoted) on the target.
+        # Castling only relocates king and rook, neither of which has a PST here.
+        placed = move.promotion or piece.piece_type
+        self._remove(piece.piece_type, color, move.from_square)
+        self._add(placed, color, move.to_square)
+
+        board.push(move)
+
+    def pop(self) -> chess.Move:
+        move = self.board.pop()
+        self._material, self._pst = self._stack.pop()
+        return move
+
+    def features(self):
+        """Feature vector of the current position, identical to encode_board_features(board)."""
+        board = self.board
+        mobility = [board.legal_moves.count()]
+        king_in_check = [1 if board.is_check() else 0]
+        castling = [
+            1 if board.has_kingside_castling_rights(chess.WHITE) else 0,
+            1 if board.has_queenside_castling_rights(chess.WHITE) else 0,
+            1 if board.has_kingside_castling_rights(chess.BLACK) else 0,
+            1 if board.has_queenside_castling_rights(chess.BLACK) else 0
+        ]
+        features = self._material + mobility + king_in_check + castling + self._pst
+        return np.array(features, dtype=float)
+
+    def features_after(self, move: chess.Move):
+        """Feature vector of the position after `move`; the board is left unchanged."""
+        self.push(move)
+        try:
+            return self.features()
+        finally:
+            self.pop()
+
+    def _remove(self, piece_type: int, color: bool, square: int):
+        self._material[_material_slot(piece_type, color)] -= 1
+        slot = _PST_SLOT.get((piece_type, color))
+        if slot is not None:
+            self._pst[slot] -= _pst_value(piece_type, color, square)
+
+    def _add(self, piece_type: int, color: bool, square: int):
+        self._material[_material_slot(piece_type, color)] += 1
+        slot = _PST_SLOT.get((piece_type, color))
+        if slot is not None:
+            self._pst[slot] += _pst_value(piece_type, color, square)
@@ -0,0 +1,184 @@
+# ai/forest_runtime.py
+"""
+Array-backed inference for the trained random forests.
+
+flatten_forest() turns a fitted RandomForestRegressor / RandomForestClassifier into
+a few contiguous NumPy arrays holding the nodes of every tree back to back:
+    feature   int32   (nodes,)   split feature (0 at leaves)
+    threshold float64 (nodes,)   split threshold (x <= threshold goes left)
+    left      int32   (nodes,)   left child; a leaf points to itself
+    right     int32   (nodes,)   right child; a leaf points to itself
+    value     float64 (nodes, k) leaf output: the regression value, or the class
+                                 probabilities (normalized like sklearn's predict_proba)
+    roots     int32   (trees,)   first node of every tree
+save_forest() writes them as .npy files plus a meta.json into a directory (e.g.
+models/move_evaluator.forest/), which load_forest() reads back without unpickling
+any estimator; load_model() prefers that export over the pickle.
+
+ForestModel.predict() walks all trees for all rows at once: one fancy-indexing step
+per tree level, since leaves point to themselves the walk simply runs for the
+forest's max depth. Features are compared as float32 and the trees are summed in
+sklearn's order, so predictions are identical to the estimator's predict().
+"""
+
+import json
+import os
+import numpy as np
+
+FOREST_FORMAT = 1
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+
+def forest_path(model_path: str) -> str:
+    """Directory of the exported forest next to a pickled model (x.pkl -> x.forest)."""
+    return os.path.splitext(model_path)[0] + ".forest"
+
+
+def load_model(model_path: str, mmap_mode: str = None):
+    """
+    The model to serve for a pickled estimator path: the exported forest next to it
+    when present and at least as recent as the pickle (mapped with mmap_mode), else
+    the pickle itself, else None when neither exists.
+    """
+    exported = forest_path(model_path)
+    meta = os.path.join(exported, "meta.json")
+    if os.path.exists(meta) and (not os.path.exists(model_path) or os.path.getmtime(meta) >= os.path.getmtime(model_path)):
+        return load_forest(exported, mmap_mode=mmap_mode)
+    if os.path.exists(model_path):
+        import joblib
+        return joblib.load(model_path)
+    return None
+
+
+def flatten_forest(model) -> "ForestModel":
+    """ForestModel with the same predictions as a fitted sklearn random forest."""
+    classes = getattr(model, "classes_", None)
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for est in model.estimators_:
+        tree = est.tree_
+        n = tree.node_count
+        leaf = tree.children_left == -1
+        own = np.arange(offset, offset + n, dtype=np.int32)
+        features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(leaf, own, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(leaf, own, tree.children_right + offset).astype(np.int32))
+        if classes is None:
+            values.append(tree.value[:, :, 0].astype(np.float64))
+        else:
+            # as DecisionTreeClassifier.predict_proba: leaf counts/fractions -> probabilities
+            proba = tree.value[:, 0, :len(classes)].astype(np.float64)
+            normalizer = proba.sum(axis=1)[:, None]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(proba / normalizer)
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+    arrays = {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "value": np.ascontiguousarray(np.concatenate(values)),
+        "roots": np.asarray(roots, dtype=np.int32),
+    }
+    meta = {
+        "format": FOREST_FORMAT,
+        "kind": "regressor" if classes is None else "classifier",
+        "n_features": int(model.n_features_in_),
+        "max_depth": int(max_depth),
+        "nodes": int(offset),
+        "trees": len(roots),
+        "classes": None if classes is None else classes.tolist(),
+    }
+    return ForestModel(arrays, meta)
+
+
+def save_forest(model, path: str) -> str:
+    """Flatten a fitted forest and write it to directory `path`; returns `path`."""
+    forest = model if isinstance(model, ForestModel) else flatten_forest(model)
+    os.makedirs(path, exist_ok=True)
+    # every file is written aside and renamed into place: processes that have the
+    # previous export memory-mapped keep reading the old inode, never a truncated file
+    for name in ARRAYS:
+        target = os.path.join(path, f"{name}.npy")
+        with open(target + ".tmp", "wb") as f:
+            np.save(f, forest.arrays[name])
+        os.replace(target + ".tmp", target)
+    # meta.json last: its presence (and mtime) marks a complete export
+    target = os.path.join(path, "meta.json")
+    with open(target + ".tmp", "w") as f:
+        json.dump(forest.meta, f)
+    os.replace(target + ".tmp", target)
+    return path
+
+
+def load_forest(path: str, mmap_mode: str = None) -> "ForestModel":
+    """Read a forest written by save_forest(); mmap_mode='r' maps the arrays instead of copying them."""
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        meta = json.load(f)
+    if meta.get("format") != FOREST_FORMAT:
+        raise ValueError(f"unsupported forest format {meta.get('format')} in {path}")
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAYS}
+    nodes, trees = meta.get("nodes", len(arrays["feature"])), meta.get("trees", len(arrays["roots"]))
+    if any(len(arrays[name]) != nodes for name in ARRAYS if name != "roots") or len(arrays["roots"]) != trees:
+        # caught between two exports: the files do not belong together
+        raise ValueError(f"incomplete forest export in {path}")
+    return ForestModel(arrays, meta)
+
+
+class ForestModel:
+    """Drop-in for the sklearn forests' predict() (and predict_proba() for classifiers)."""
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.arrays = arrays
+        self.meta = meta
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.max_depth = meta["max_depth"]
+        self.n_features_in_ = meta["n_features"]
+        self.classes_ = None if meta["classes"] is None else np.asarray(meta["classes"])
+
+    @property
+    def is_classifier(self) -> bool:
+        return self.classes_ is not None
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.arrays.values())
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf node index reached in every tree: (rows, trees)."""
+        # sklearn validates X to float32 before comparing with the float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        rows = np.arange(X.shape[0])[:, None]
+        idx = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[idx]] <= self.threshold[idx]
+            idx = np.where(go_left, self.left[idx], self.right[idx])
+        return idx
+
+    def _mean_value(self, X) -> np.ndarray:
+        leaves = self.value[self.apply(X)]          # (rows, trees, k)
+        # running sum over the trees in order, as sklearn accumulates them
+        total = np.cumsum(leaves, axis=1)[:, -1]
+        return total / len(self.roots)
+
+    def predict_proba(self, X) -> np.ndarray:
+        if not self.is_classifier:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._mean_value(X)
+
+    def predict(self, X) -> np.ndarray:
+        mean = self._mean_value(X)
+        if self.is_classifier:
+            return self.classes_.take(np.argmax(mean, axis=1))
+        return mean[:, 0]
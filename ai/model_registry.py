@@ -0,0 +1,179 @@
+# ai/model_registry.py
+"""
+Process-wide registry of the served models.
+
+Every Evaluator/Recommender asks the registry for its model path instead of loading
+the file itself, so a process holds each model once however many AIService
+instances it creates. Exported forests (ai/forest_runtime.py) are opened with
+mmap_mode='r': their node arrays are read-only file mappings, so every uvicorn
+worker on the machine shares the same physical pages through the OS page cache
+instead of holding a private copy. A pickle without an export is still loaded with
+joblib (private memory).
+
+get() re-checks the files at most once per `max_age` seconds; when the export or
+the pickle changed (e.g. train_model wrote new models), the new version is loaded
+and swapped in without restarting the process. Evaluator/Recommender read the model
+once per call (evaluate_board, evaluate_boards, one batch of strategy labels), so a
+call in flight finishes with the model it started with; a later call of the same
+request may already get the new one. A failed reload keeps serving the previous
+version.
+
+stats() reports per model its format, version and memory: the array size, and for
+mapped forests the resident / shared bytes of their mappings (/proc/self/smaps).
+"""
+
+import os
+import threading
+import time
+from .forest_runtime import ForestModel, forest_path, load_model
+
+
+class LoadedModel:
+    def __init__(self, path: str, model, signature, version: int):
+        self.path = path
+        self.model = model
+        self.signature = signature
+        self.version = version
+        self.loaded_at = time.time()
+        self.checked = time.monotonic()
+
+
+def _signature(model_path: str):
+    """What identifies the files behind a model: mtime and size of the export's meta.json and the pickle."""
+    sig = []
+    for p in (os.path.join(forest_path(model_path), "meta.json"), model_path):
+        try:
+            st = os.stat(p)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append(None)
+    return tuple(sig)
+
+
+class ModelRegistry:
+    def __init__(self, mmap_mode: str = "r"):
+        self.mmap_mode = mmap_mode
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.reload_errors = 0
+
+    def get(self, model_path: str, max_age: float = 2.0) -> LoadedModel:
+        """
+        The LoadedModel for `model_path` (its .model is None when no file exists).
+        max_age: seconds before the files are checked for changes again; None never
+        re-checks after the first load.
+        """
+        path = os.path.abspath(model_path)
+        entry = self._entries.get(path)
+        if entry is not None and (max_age is None or time.monotonic() - entry.checked < max_age):
+            return entry
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and (max_age is None or time.monotonic() - entry.checked < max_age):
+                return entry
+            signature = _signature(path)
+            if entry is not None and signature == entry.signature:
+                entry.checked = time.monotonic()
+                return entry
+            try:
+                model = load_model(path, mmap_mode=self.mmap_mode)
+            except Exception as e:
+                print(f"[ModelRegistry] Could not load model at {path}: {e}")
+                if entry is not None:
+                    # keep serving the previous version; retried after max_age
+                    self.reload_errors += 1
+                    entry.checked = time.monotonic()
+                    return entry
+                model = None
+            if entry is not None:
+                self.reloads += 1
+            entry = LoadedModel(path, model, signature, entry.version + 1 if entry is not None else 1)
+            self._entries[path] = entry
+            return entry
+
+    def stats(self) -> dict:
+        smaps = _mapped_memory()
+        models = {}
+        for path, entry in list(self._entries.items()):
+            model = entry.model
+            info = {"version": entry.version, "loaded_at": entry.loaded_at, "format": None, "nbytes": 0}
+            if isinstance(model, ForestModel):
+                mapped = smaps.get(os.path.realpath(forest_path(path)), {}) if smaps is not None else {}
+                info.update(
+                    format="forest-mmap" if self.mmap_mode else "forest",
+                    nbytes=model.nbytes,
+                    rss_bytes=mapped.get("rss", 0) if smaps is not None else None,
+                    shared_bytes=mapped.get("shared", 0) if smaps is not None else None,
+                )
+            elif model is not None:
+                # unpickled estimator: all of it lives in this process' private heap
+                nbytes = _estimator_nbytes(model)
+                info.update(format="pickle", nbytes=nbytes, rss_bytes=nbytes, shared_bytes=0)
+            models[path] = info
+        return {
+            "models": models,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "process_rss_bytes": _process_rss(),
+        }
+
+
+def _estimator_nbytes(model) -> int:
+    total = 0
+    for est in getattr(model, "estimators_", []):
+        state = est.tree_.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes
+    return total
+
+
+def _mapped_memory():
+    """
+    {forest directory: {"rss", "shared"}} summed over the file mappings under each
+    directory, from /proc/self/smaps; None where smaps is not available.
+    """
+    try:
+        f = open("/proc/self/smaps", "r")
+    except OSError:
+        return None
+    out = {}
+    current = None
+    with f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            if not fields[0].endswith(":"):
+                # mapping header: address perms offset dev inode [path]
+                path = fields[5] if len(fields) > 5 else ""
+                current = out.setdefault(os.path.dirname(path), {"rss": 0, "shared": 0}) if path.endswith(".npy") else None
+            elif current is not None:
+                if fields[0] == "Rss:":
+                    current["rss"] += int(fields[1]) * 1024
+                elif fields[0] in ("Shared_Clean:", "Shared_Dirty:"):
+                    current["shared"] += int(fields[1]) * 1024
+    return out
+
+
+def _process_rss():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # peak, not current, where /proc is not available (kB on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return None
+
+
+_default = ModelRegistry()
+
+
+def get_registry() -> ModelRegistry:
+    """The registry shared by every Evaluator/Recommender of this process."""
+    return _default
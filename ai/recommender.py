@@ -3,114 +3,214 @@
 Recommender: produce a list of suggested moves with short comments.
 
 Behavior:
-- Tries to use engine for best move(s) via engine_service.bestmove
+- Tries to use engine for the top-N moves via a single engine_service.analyze_multipv search
 - If ML strategy_recommender exists (models/strategy_recommender.pkl), it will predict move-type
-  for candidate moves to give higher-level strategy tags.
-- Fallback: use a simple shallow search (material heuristic) and rule-based comments.
+  for candidate moves to give higher-level strategy tags (loaded through the shared
+  model_registry, like the Evaluator's model).
+- Fallback: with ai_config 'fallback_search_depth' below 2 (the default), a one-ply batched
+  scoring of every legal move (ML model or material heuristic). From 2 up, an alpha-beta
+  search (search.FallbackSearcher, static_eval at every node) within 'fallback_search_time'
+  seconds picks the candidate moves; when the Evaluator has a model, the candidates are then
+  scored and ranked by ONE batched model predict over their child positions, so the
+  suggestion scores stay on the scale of the root eval without a predict per leaf.
 """
 
 import os
 import chess
-import joblib
-from .utils import encode_board_features, move_type_label, label_to_int, int_to_label
+import numpy as np
+from .feature_encoder import IncrementalFeatureEncoder
+from .model_registry import get_registry
+from .search import FallbackSearcher
+from .utils import encode_boards_features, move_type_label, label_to_int, int_to_label
 
-MODEL_PATH_DEFAULT = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "models", "strategy_recommender.pkl")
+MODEL_PATH_DEFAULT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "strategy_recommender.pkl")
+_FROM_REGISTRY = object()
 
 class Recommender:
-    def __init__(self, evaluator, ai_config: dict = None, model_path: str = None):
+    def __init__(self, evaluator, ai_config: dict = None, model_path: str = None, registry=None):
         """
         evaluator: instance of Evaluator (used for scoring candidate moves)
         ai_config: may contain 'suggestion_count'
+        registry: model_registry.ModelRegistry (default: the process-wide one)
         """
         self.evaluator = evaluator
         self.config = ai_config or {}
         self.count = int(self.config.get("suggestion_count", 3))
         self.model_path = model_path or MODEL_PATH_DEFAULT
-        self.model = None
-        self._load_model()
+        self.registry = registry or get_registry()
+        self.reload_interval = self.config.get("model_reload_interval", 2.0)
+        self._pinned = _FROM_REGISTRY
+        self.model     # load now rather than on the first request
 
-    def _load_model(self):
-        if os.path.exists(self.model_path):
-            try:
-                self.model = joblib.load(self.model_path)
-            except Exception as e:
-                print(f"[Recommender] Could not load model at {self.model_path}: {e}")
-                self.model = None
+    @property
+    def model(self):
+        """
+        The ML model in use: the shared registry's model for model_path (reloaded when
+        the file changes), unless one was assigned directly (`recommender.model = ...`).
+        """
+        if self._pinned is not _FROM_REGISTRY:
+            return self._pinned
+        loaded = self.registry.get(self.model_path, max_age=self.reload_interval)
+        return loaded.model
+
+    @model.setter
+    def model(self, model):
+        self._pinned = model
 
-    def suggest_moves(self, board: chess.Board):
+    def suggest_moves(self, board: chess.Board, engine_lines: list = None, use_engine: bool = True):
         """
         Return list of suggestions (ordered) of form:
         { uci, san, score (centipawn), strategy_label, comment }
-        """
-        suggestions = []
 
-        # 1) Prefer engine best move if engine available
-        engine_best = None
-        if self.evaluator.engine_service:
+        engine_lines: optional result of engine_service.analyze_multipv(board) that the
+        caller already computed (e.g. for the root eval). When omitted and an engine is
+        available, a single MultiPV search is run here instead of one search per move.
+        use_engine: False when the caller already tried the root search and it failed.
+        """
+        # 1) Prefer engine: one MultiPV search gives the top-N moves with scores
+        if engine_lines is None and use_engine and self.evaluator.engine_service:
             try:
-                mv = self.evaluator.engine_service.bestmove(board, depth=self.config.get("engine_depth", 12))
-                if mv:
-                    engine_best = mv.uci()
+                engine_lines = self.evaluator.engine_service.analyze_multipv(
+                    board,
+                    multipv=self.config.get("engine_multipv", self.count),
+                    limit=self.config.get("engine_time", 0.05)
+                )
             except Exception:
-                engine_best = None
+                engine_lines = None
+            # the engine had its chance: no per-child searches after a failed root search
+            use_engine = False
+        if engine_lines is not None:
+            return self._suggestions_from_lines(board, engine_lines)[:self.count]
 
-        # Build candidate list: legal moves scored by evaluator (fast)
-        candidates = []
-        for mv in board.legal_moves:
-            board.push(mv)
-            score = self.evaluator.evaluate_board(board)
-            board.pop()
-            candidates.append((mv, score))
+        # 2) Fallback search: alpha-beta within a fixed time budget
+        search_depth = int(self.config.get("fallback_search_depth", 0))
+        if search_depth >= 2:
+            return self._suggestions_from_search(board, search_depth)
+
+        # 3) One ply: score every child position in one batch (one model.predict
+        #    over a feature matrix instead of one predict per legal move)
+        moves = list(board.legal_moves)
+        children, features = self._expand_children(
+            board, moves, with_features=self.evaluator.model is not None or self.model is not None
+        )
+        scores = self.evaluator.evaluate_boards(children, features=features, use_engine=use_engine)
 
         # Sort: if white to move, descending (maximize), else ascending
-        candidates.sort(key=lambda x: x[1], reverse=(board.turn == chess.WHITE))
+        order = sorted(range(len(moves)), key=lambda i: scores[i], reverse=(board.turn == chess.WHITE))
 
         # pick top N
-        top = candidates[:max(self.count, 8)]
+        top = order[:max(self.count, 8)]
 
-        # Use model to predict strategy label per candidate if available
-        for mv, score in top:
-            san = None
-            try:
-                san = board.san(mv)
-            except Exception:
-                san = mv.uci()
-            # strategy label: from ML classifier if present; else use heuristic
-            label = None
-            if self.model is not None:
-                try:
-                    # encode position after move
-                    board.push(mv)
-                    feat = encode_board_features(board).reshape(1, -1)
-                    board.pop()
-                    pred = self.model.predict(feat)
-                    label = int_to_label(int(pred[0]))
-                except Exception:
-                    label = move_type_label(board, mv)
-            else:
-                label = move_type_label(board, mv)
-
-            comment = self._comment_for_label(label, mv)
-            suggestions.append({
-                "uci": mv.uci(),
-                "san": san,
-                "score": score,
-                "strategy": label,
-                "comment": comment
-            })
-
-        # If engine_best exists, ensure it's at top (if not already)
-        if engine_best:
-            if not any(s['uci'] == engine_best for s in suggestions):
-                try:
-                    board_move = chess.Move.from_uci(engine_best)
-                    san = board.san(board_move)
-                except Exception:
-                    san = engine_best
-                suggestions.insert(0, {"uci": engine_best, "san": san, "score": None, "strategy": "engine", "comment": "Engine recommended move"})
+        # strategy labels for all top candidates in one classifier call
+        labels = self._strategy_labels(
+            board,
+            [moves[i] for i in top],
+            features=features[top] if features is not None else None
+        )
+        suggestions = []
+        for i, label in zip(top, labels):
+            suggestions.append(self._make_suggestion(board, moves[i], scores[i], label))
         # limit to requested count
         return suggestions[:self.count]
 
+    def _suggestions_from_lines(self, board: chess.Board, lines: list):
+        moves = [line["move"] for line in lines]
+        labels = self._strategy_labels(board, moves)
+        suggestions = []
+        for line, label in zip(lines, labels):
+            mv = line["move"]
+            s = self._make_suggestion(board, mv, line.get("cp"), label)
+            s["pv"] = [m.uci() for m in line.get("pv", [mv])]
+            suggestions.append(s)
+        return suggestions
+
+    def _suggestions_from_search(self, board: chess.Board, depth: int):
+        # a fresh searcher per call: suggest_moves may run in several threads at once
+        result = FallbackSearcher().search(
+            board,
+            max_depth=depth,
+            time_limit=self.config.get("fallback_search_time", 0.2),
+            multipv=self.count
+        )
+        lines = [(mv, float(score)) for mv, score in result.lines]
+        if self.evaluator.model is not None and lines:
+            # the search picks the candidates; the model scores them in one batch
+            children, features = self._expand_children(board, [mv for mv, _ in lines], with_features=True)
+            scores = self.evaluator.evaluate_boards(children, features=features, use_engine=False)
+            lines = sorted(
+                zip([mv for mv, _ in lines], scores),
+                key=lambda line: line[1], reverse=(board.turn == chess.WHITE)
+            )
+        moves = [mv for mv, _ in lines]
+        labels = self._strategy_labels(board, moves)
+        suggestions = []
+        for (mv, score), label in zip(lines, labels):
+            s = self._make_suggestion(board, mv, float(score), label)
+            if mv == result.best_move:
+                s["pv"] = [m.uci() for m in result.pv]
+            suggestions.append(s)
+        return suggestions
+
+    def _make_suggestion(self, board: chess.Board, mv: chess.Move, score, label: str):
+        san = None
+        try:
+            san = board.san(mv)
+        except Exception:
+            san = mv.uci()
+        comment = self._comment_for_label(label, mv)
+        return {
+            "uci": mv.uci(),
+            "san": san,
+            "score": score,
+            "strategy": label,
+            "comment": comment
+        }
+
+    @staticmethod
+    def _expand_children(board: chess.Board, moves: list, with_features: bool = False):
+        """
+        (child boards, feature matrix or None) in ONE push/pop per move: the incremental
+        encoder makes the move, the child is copied and, if asked, encoded in place.
+        """
+        if with_features and not moves:
+            return [], encode_boards_features([])
+        encoder = IncrementalFeatureEncoder(board)
+        children, rows = [], []
+        for mv in moves:
+            encoder.push(mv)
+            try:
+                children.append(board.copy(stack=False))
+                if with_features:
+                    rows.append(encoder.features())
+            finally:
+                encoder.pop()
+        return children, (np.vstack(rows) if with_features else None)
+
+    @staticmethod
+    def _child_features(board: chess.Board, moves: list):
+        # incremental encoder: only mobility/check/castling are recomputed per child
+        if not moves:
+            return encode_boards_features([])
+        encoder = IncrementalFeatureEncoder(board)
+        return np.vstack([encoder.features_after(mv) for mv in moves])
+
+    def _strategy_labels(self, board: chess.Board, moves: list, features=None) -> list:
+        """
+        Strategy label per move: from the ML classifier if present (one batched predict
+        over the positions after each move), else the move_type_label heuristic.
+        features: optional precomputed feature rows for the child positions.
+        """
+        model = self.model
+        if model is not None and moves:
+            try:
+                if features is None:
+                    features = self._child_features(board, moves)
+                preds = model.predict(features)
+                return [int_to_label(int(p)) for p in preds]
+            except Exception:
+                pass
+        return [move_type_label(board, mv) for mv in moves]
+
     def _comment_for_label(self, label: str, move: chess.Move) -> str:
         if label == "capture":
             return "This move captures a piece — check for recaptures and safety."
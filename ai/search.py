@@ -0,0 +1,343 @@
+# ai/search.py
+"""
+Engine-less move search used when no Stockfish is configured.
+
+FallbackSearcher is a small alpha-beta searcher:
+- iterative deepening up to `max_depth`, inside a wall-clock budget; when time runs
+  out the result of the last completed iteration is returned (best-so-far), so the
+  latency is bounded by the budget plus one node, never by the depth
+- negamax alpha-beta with quiescence search on captures/promotions at the leaves
+  (all evasions when in check: no stand-pat while the king is attacked)
+- repetitions (of the game so far or along the searched line) score as draws, from
+  the set of Zobrist keys on the current path
+- move ordering: transposition-table move, captures by MVV-LVA, killer moves, rest
+- transposition table keyed by the Zobrist hash (chess.polyglot.zobrist_hash)
+- the root keeps exact scores for the best `multipv` moves, so it can back the
+  top-N suggestions of Recommender
+
+Scores are centipawns from White's perspective, mates are +/-MATE_SCORE like the
+rest of the code base. The default leaf evaluation is `static_eval` (material plus
+the utils PSTs); pass `evaluate=` to use another White-perspective function.
+
+Usage:
+    result = FallbackSearcher().search(board, max_depth=3, time_limit=0.2, multipv=3)
+    result.lines   # [(move, score), ...] best first
+"""
+
+import time
+import chess
+import chess.polyglot
+from .utils import PST
+
+MATE_SCORE = 100000
+INF = 10 ** 9
+# scores beyond this are "mate in n" and are stored ply-independent in the TT
+MATE_BOUND = MATE_SCORE - 1000
+
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 320,
+    chess.BISHOP: 330,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 0
+}
+# the utils PSTs are on a ~+/-5 scale (feature units); scaled to centipawns here
+PST_SCALE = 10
+
+_EXACT, _LOWER, _UPPER = 0, 1, 2
+
+
+def static_eval(board: chess.Board) -> int:
+    """Material + pawn/knight PST, centipawns from White's perspective."""
+    score = 0
+    for pt, val in PIECE_VALUES.items():
+        if val:
+            score += val * (chess.popcount(board.pieces_mask(pt, chess.WHITE)) - chess.popcount(board.pieces_mask(pt, chess.BLACK)))
+    for pt, table in PST.items():
+        for sq in chess.scan_forward(board.pieces_mask(pt, chess.WHITE)):
+            score += PST_SCALE * table[sq]
+        for sq in chess.scan_forward(board.pieces_mask(pt, chess.BLACK)):
+            score -= PST_SCALE * table[chess.square_mirror(sq)]
+    return int(score)
+
+
+class _Timeout(Exception):
+    pass
+
+
+class SearchResult:
+    def __init__(self, lines, depth, nodes, elapsed, pv):
+        self.lines = lines          # [(move, white-perspective score)], best first
+        self.depth = depth          # last fully completed iteration
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.pv = pv                # principal variation of the best line
+
+    @property
+    def best_move(self):
+        return self.lines[0][0] if self.lines else None
+
+    @property
+    def score(self):
+        return self.lines[0][1] if self.lines else None
+
+
+class FallbackSearcher:
+    def __init__(self, evaluate=None, tt_size: int = 200000):
+        """
+        evaluate: callable(board) -> centipawns from White's perspective (static_eval by default)
+        tt_size: max transposition table entries; the table is cleared when full
+        """
+        self.evaluate = evaluate or static_eval
+        self.tt_size = int(tt_size)
+        self.tt = {}
+        self.nodes = 0
+        self._killers = []
+        self._deadline = None
+        self._path = set()
+
+    def search(self, board: chess.Board, max_depth: int = 2, time_limit: float = None, multipv: int = 1) -> SearchResult:
+        """
+        Search `board` to at most max_depth plies (plus quiescence) within time_limit
+        seconds. At least depth 1 is always completed so there is always a move to
+        return. The board is left unchanged.
+        """
+        start = time.perf_counter()
+        self.nodes = 0
+        self._killers = [[None, None] for _ in range(max(1, max_depth) + 1)]
+        board = board.copy()
+        root_moves = list(board.legal_moves)
+        if not root_moves:
+            return SearchResult([], 0, 0, 0.0, [])
+        self._path = self._game_keys(board)
+        multipv = max(1, min(int(multipv), len(root_moves)))
+        sign = 1 if board.turn == chess.WHITE else -1
+
+        lines, completed = [], 0
+        root_moves = self._order(board, root_moves, None, 0)
+        for depth in range(1, max(1, int(max_depth)) + 1):
+            # depth 1 always completes so there is always something to return
+            self._deadline = None if (time_limit is None or depth == 1) else start + time_limit
+            try:
+                scored = self._search_root(board, root_moves, depth, multipv)
+            except _Timeout:
+                break
+            completed = depth
+            scored.sort(key=lambda x: x[1], reverse=True)
+            # best moves of this iteration are searched first in the next one
+            root_moves = [mv for mv, _ in scored]
+            lines = [(mv, sign * score) for mv, score in scored[:multipv]]
+            if abs(scored[0][1]) >= MATE_BOUND:
+                break
+            if time_limit is not None and time.perf_counter() - start >= time_limit:
+                break
+
+        pv = self._principal_variation(board, lines[0][0], completed) if lines else []
+        return SearchResult(lines, completed, self.nodes, time.perf_counter() - start, pv)
+
+    def _search_root(self, board, moves, depth, multipv):
+        """Negamax scores (side to move) of the root moves; exact for the best `multipv`."""
+        scored = []
+        for mv in moves:
+            # alpha is the multipv-th best score so far: anything below it is not shown
+            best = sorted((s for _, s in scored), reverse=True)
+            alpha = best[multipv - 1] if len(best) >= multipv else -INF
+            board.push(mv)
+            try:
+                score = -self._negamax(board, depth - 1, -INF, -alpha, 1)
+            finally:
+                board.pop()
+            scored.append((mv, score))
+        return scored
+
+    @staticmethod
+    def _game_keys(board) -> set:
+        """Zobrist keys of the root and the game positions it can still repeat (since the last irreversible move)."""
+        board = board.copy()
+        keys = {chess.polyglot.zobrist_hash(board)}
+        for _ in range(min(board.halfmove_clock, len(board.move_stack))):
+            board.pop()
+            keys.add(chess.polyglot.zobrist_hash(board))
+        return keys
+
+    def _negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self._deadline is not None and self.nodes & 255 == 0 and time.perf_counter() > self._deadline:
+            raise _Timeout()
+
+        if board.halfmove_clock >= 100:
+            return 0
+        # a repetition needs 4 reversible plies: no hashing right after a capture or pawn move
+        key = chess.polyglot.zobrist_hash(board) if depth > 0 or board.halfmove_clock >= 4 else None
+        if key is not None and key in self._path:
+            return 0
+        if depth <= 0:
+            return self._quiescence(board, alpha, beta, ply)
+
+        entry = self.tt.get(key)
+        tt_move = None
+        if entry is not None:
+            e_depth, e_score, e_flag, tt_move = entry
+            if e_depth >= depth:
+                e_score = self._from_tt(e_score, ply)
+                if e_flag == _EXACT:
+                    return e_score
+                if e_flag == _LOWER and e_score >= beta:
+                    return e_score
+                if e_flag == _UPPER and e_score <= alpha:
+                    return e_score
+
+        moves = list(board.legal_moves)
+        if not moves:
+            return -(MATE_SCORE - ply) if board.is_check() else 0
+
+        alpha_orig = alpha
+        best_score, best_move = -INF, None
+        self._path.add(key)
+        try:
+            for mv in self._order(board, moves, tt_move, ply):
+                capture = board.is_capture(mv)
+                board.push(mv)
+                try:
+                    score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+                finally:
+                    board.pop()
+                if score > best_score:
+                    best_score, best_move = score, mv
+                if score > alpha:
+                    alpha = score
+                if alpha >= beta:
+                    if not capture and ply < len(self._killers):
+                        killers = self._killers[ply]
+                        if killers[0] != mv:
+                            killers[1], killers[0] = killers[0], mv
+                    break
+        finally:
+            # keys on the path are unique (a repeated one returned above)
+            self._path.discard(key)
+
+        if best_score <= alpha_orig:
+            flag = _UPPER
+        elif best_score >= beta:
+            flag = _LOWER
+        else:
+            flag = _EXACT
+        self._store(key, depth, self._to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    def _quiescence(self, board, alpha, beta, ply):
+        """
+        Captures/promotions only, until the position is quiet (stand-pat cutoff). In
+        check there is no standing pat: every evasion is searched, none means mate.
+        """
+        self.nodes += 1
+        if self._deadline is not None and self.nodes & 255 == 0 and time.perf_counter() > self._deadline:
+            raise _Timeout()
+
+        if board.is_check():
+            noisy = list(board.generate_legal_moves())
+            if not noisy:
+                return -(MATE_SCORE - ply)
+            # evasions may check back: the path keys stop perpetual-check cycles
+            key = chess.polyglot.zobrist_hash(board)
+            if key in self._path:
+                return 0
+        else:
+            key = None
+            stand_pat = self.evaluate(board) * (1 if board.turn == chess.WHITE else -1)
+            if stand_pat >= beta:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+            noisy = list(board.generate_legal_captures())
+            noisy += [mv for mv in board.generate_legal_moves(board.pawns, chess.BB_BACKRANKS) if not board.is_capture(mv)]
+            if not noisy:
+                return alpha
+
+        best = alpha if key is None else -INF
+        if key is not None:
+            self._path.add(key)
+        try:
+            for mv in sorted(noisy, key=lambda m: self._mvv_lva(board, m), reverse=True):
+                board.push(mv)
+                try:
+                    score = -self._quiescence(board, -beta, -alpha, ply + 1)
+                finally:
+                    board.pop()
+                if score >= beta:
+                    return score
+                if score > best:
+                    best = score
+                if score > alpha:
+                    alpha = score
+        finally:
+            if key is not None:
+                self._path.discard(key)
+        return best
+
+    def _order(self, board, moves, tt_move, ply):
+        killers = self._killers[ply] if ply < len(self._killers) else (None, None)
+
+        def key(mv):
+            if mv == tt_move:
+                return 3000000
+            if board.is_capture(mv) or mv.promotion:
+                return 2000000 + self._mvv_lva(board, mv)
+            if mv == killers[0]:
+                return 1000001
+            if mv == killers[1]:
+                return 1000000
+            return 0
+
+        return sorted(moves, key=key, reverse=True)
+
+    @staticmethod
+    def _mvv_lva(board, mv):
+        """Most valuable victim first, then least valuable attacker."""
+        if board.is_en_passant(mv):
+            victim = chess.PAWN
+        else:
+            victim = board.piece_type_at(mv.to_square) or 0
+        attacker = board.piece_type_at(mv.from_square) or 0
+        promo = PIECE_VALUES[mv.promotion] if mv.promotion else 0
+        return (PIECE_VALUES.get(victim, 0) + promo) * 10 - attacker
+
+    def _store(self, key, depth, score, flag, move):
+        if len(self.tt) >= self.tt_size:
+            self.tt.clear()
+        old = self.tt.get(key)
+        if old is None or old[0] <= depth:
+            self.tt[key] = (depth, score, flag, move)
+
+    @staticmethod
+    def _to_tt(score, ply):
+        # mate scores are stored relative to this node, not the root
+        if score >= MATE_BOUND:
+            return score + ply
+        if score <= -MATE_BOUND:
+            return score - ply
+        return score
+
+    @staticmethod
+    def _from_tt(score, ply):
+        if score >= MATE_BOUND:
+            return score - ply
+        if score <= -MATE_BOUND:
+            return score + ply
+        return score
+
+    def _principal_variation(self, board, first_move, depth):
+        """Best line from the TT, starting with first_move."""
+        pv, seen = [first_move], set()
+        board = board.copy(stack=False)
+        board.push(first_move)
+        while len(pv) < max(1, depth):
+            key = chess.polyglot.zobrist_hash(board)
+            entry = self.tt.get(key)
+            if entry is None or entry[3] is None or key in seen or entry[3] not in board.legal_moves:
+                break
+            seen.add(key)
+            pv.append(entry[3])
+            board.push(entry[3])
+        return pv
@@ -4,8 +4,10 @@ Helper utilities for feature extraction and simple heuristics.
 
 Functions:
 - encode_board_features(board): returns numpy vector representing features for ML.
+- encode_boards_features(boards): stacks the above into one matrix for batched predict.
 - move_type_label(board, move): returns string label: 'capture','develop','center','castle','other'
 - label_to_int / int_to_label: helpers for classifier mapping
+- position_key(board): normalized position string (FEN without move clocks)
 """
 
 import chess
@@ -13,6 +15,12 @@ import numpy as np
 
 LABELS = ["capture", "develop", "center", "castle", "other"]
 
+# length of the encode_board_features vector:
+# 12 material + 1 mobility + 1 check + 4 castling + 2 pawn PST + 2 knight PST
+N_FEATURES = 22
+# bump whenever encode_board_features changes, so stored feature shards are rebuilt
+FEATURE_VERSION = 1
+
 # basic piece-square tables (simplified) for small positional signal
 # Using tiny PSTs for pawns and knights to include positional info
 PST = {
@@ -86,6 +94,16 @@ def encode_board_features(board: chess.Board):
     return np.array(features, dtype=float)
 
 
+def encode_boards_features(boards):
+    """
+    Encode a list of boards into a 2D matrix (one row per board) so a model can
+    score all of them with a single predict() call.
+    """
+    if not boards:
+        return np.zeros((0, N_FEATURES), dtype=float)
+    return np.vstack([encode_board_features(b) for b in boards])
+
+
 def move_type_label(board: chess.Board, move: chess.Move) -> str:
     """
     Simple heuristic to label a move:
@@ -126,4 +144,13 @@ def label_to_int(label: str) -> int:
 def int_to_label(i: int) -> str:
     if 0 <= i < len(LABELS):
         return LABELS[i]
-    return "other"
\ No newline at end of file
+    return "other"
+
+
+def position_key(board: chess.Board) -> str:
+    """
+    Normalized key for caching per-position results: the first four FEN fields
+    (placement, side to move, castling, en passant only if capturable), without
+    the halfmove/fullmove clocks, so transpositions share one key.
+    """
+    return " ".join(board.fen(en_passant="legal").split()[:4])
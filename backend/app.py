@@ -1,15 +1,28 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import os, yaml, uvicorn
+from fastapi.responses import JSONResponse
+from .config import load_config
 from .routes import game_routes, ai_routes, user_routes
-from .database import models as db_models
+from .services.container import ServiceContainer, get_services
 
-ROOT = os.path.dirname(os.path.abspath(__file__))
-CONFIG_PATH = os.path.join(ROOT, "..", "config", "settings.yaml")
-with open(CONFIG_PATH, "r") as f:
-    CONFIG = yaml.safe_load(f)
+CONFIG = load_config()
 
-app = FastAPI(title="AI-Powered Chess Coach API", version="1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one set of services (DB, engine pool, models) per process, shared by all routers
+    services = ServiceContainer(CONFIG)
+    app.state.services = services
+    await services.startup()
+    try:
+        yield
+    finally:
+        await services.shutdown()
+        app.state.services = None
+
+
+app = FastAPI(title="AI-Powered Chess Coach API", version="1.0", lifespan=lifespan)
 
 # allow local frontend for development; lock down in prod
 app.add_middleware(
@@ -26,12 +39,18 @@ app.include_router(game_routes.router, prefix="/game", tags=["game"])
 app.include_router(ai_routes.router, prefix="/ai", tags=["ai"])
 app.include_router(user_routes.router, prefix="/user", tags=["user"])
 
-# ensure DB file exists / create tables
-db_models.init_db()
-
 @app.get("/")
 def root():
     return {"ok": True, "service": "AI-Powered Chess Coach Backend"}
 
+
+@app.get("/ready")
+def ready(services: ServiceContainer = Depends(get_services)):
+    """Readiness probe: 200 once the warmup (models, engine pool) is done, 503 while cold."""
+    state = services.readiness()
+    return JSONResponse(state, status_code=200 if state["status"] == "warm" else 503)
+
+
 if __name__ == "__main__":
-    uvicorn.run("backend.app:app", host=CONFIG['server']['host'], port=CONFIG['server']['port'], reload=CONFIG['server'].get('debug', True))
\ No newline at end of file
+    import uvicorn
+    uvicorn.run("backend.app:app", host=CONFIG['server']['host'], port=CONFIG['server']['port'], reload=CONFIG['server'].get('debug', True))
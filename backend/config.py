@@ -0,0 +1,17 @@
+# backend/config.py
+"""
+Loads config/settings.yaml once per process; every module that needs settings
+uses load_config() instead of re-reading the file.
+"""
+import os
+import yaml
+from functools import lru_cache
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(ROOT, "..", "config", "settings.yaml")
+
+
+@lru_cache(maxsize=None)
+def load_config(path: str = CONFIG_PATH) -> dict:
+    with open(path, "r") as f:
+        return yaml.safe_load(f) or {}
@@ -1,28 +1,100 @@
-from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import chess
-from ..services.chess_engine_service import ChessEngineService
-from ..services.ai_service import AIService
-import os, yaml
-
-ROOT = os.path.dirname(os.path.abspath(__file__))
-CONFIG_PATH = os.path.join(ROOT, "..", "..", "config", "settings.yaml")
-with open(CONFIG_PATH, "r") as f:
-    CONFIG = yaml.safe_load(f)
+import chess, json
+from ..services.container import ServiceContainer, get_services
 
 router = APIRouter()
-engine_service = ChessEngineService(CONFIG.get('engine', {}))
-ai_service = AIService(engine_service, CONFIG.get('ai', {}))
 
 class AnalyzeReq(BaseModel):
     fen: str
     last_move: str = None
 
 
+class AnalyzeBatchReq(BaseModel):
+    items: List[AnalyzeReq]
+
+
 @router.post("/analyze")
-def analyze(req: AnalyzeReq):
+async def analyze(req: AnalyzeReq, services: ServiceContainer = Depends(get_services)):
     try:
         board = chess.Board(req.fen)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid FEN: {e}")
-    return ai_service.analyze_position(board, last_move=req.last_move)
\ No newline at end of file
+    return await services.ai_service.analyze_position_async(board, last_move=req.last_move)
+
+
+@router.post("/analyze_batch")
+async def analyze_batch(req: AnalyzeBatchReq, services: ServiceContainer = Depends(get_services)):
+    """
+    Analyze up to ai.batch_max_items positions in one request. Results are returned in
+    request order; an item that fails carries an `error` instead of failing the batch.
+    """
+    max_items = int(services.config.get('ai', {}).get('batch_max_items', 64))
+    if len(req.items) > max_items:
+        raise HTTPException(status_code=413, detail=f"Too many items: {len(req.items)} > {max_items}")
+
+    # parse everything up front so bad FENs never reach the engine
+    results = [None] * len(req.items)
+    todo = []
+    for i, item in enumerate(req.items):
+        try:
+            todo.append((i, chess.Board(item.fen), item.last_move))
+        except Exception as e:
+            results[i] = {"fen": item.fen, "error": f"Invalid FEN: {e}"}
+
+    analyses = await services.ai_service.analyze_batch_async([(board, last_move) for _, board, last_move in todo])
+    for (i, _, _), analysis in zip(todo, analyses):
+        fen = req.items[i].fen
+        if isinstance(analysis, Exception):
+            results[i] = {"fen": fen, "error": f"Analysis failed: {analysis}"}
+        else:
+            results[i] = {"fen": fen, **analysis}
+    return {"results": results}
+
+
+@router.get("/models")
+async def model_stats(services: ServiceContainer = Depends(get_services)):
+    """Models loaded by this worker process, with their version and resident memory."""
+    return services.ai_service.model_stats()
+
+
+@router.get("/analyze/stream")
+async def analyze_stream(
+    request: Request,
+    fen: str,
+    last_move: Optional[str] = None,
+    max_depth: Optional[int] = Query(None, ge=1),
+    max_time: Optional[float] = Query(None, gt=0),
+    services: ServiceContainer = Depends(get_services)
+):
+    """
+    Server-Sent Events: an `analysis` event (depth, eval, suggestions) each time the
+    engine finishes a deeper iteration, then a `done` event with the final analysis
+    and feedback. Caps are clamped to ai.stream_max_depth / ai.stream_max_time; the
+    search stops when the client disconnects.
+    """
+    try:
+        board = chess.Board(fen)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid FEN: {e}")
+    ai_cfg = services.config.get('ai', {})
+    depth_cap = int(ai_cfg.get('stream_max_depth', 24))
+    time_cap = float(ai_cfg.get('stream_max_time', 10.0))
+    max_depth = min(max_depth or depth_cap, depth_cap)
+    max_time = min(max_time or time_cap, time_cap)
+
+    async def events():
+        stream = services.ai_service.analysis_events(board, last_move=last_move, max_depth=max_depth, max_time=max_time)
+        try:
+            async for event in stream:
+                if await request.is_disconnected():
+                    break
+                kind = "done" if event.get("final") else "analysis"
+                yield f"event: {kind}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            # stops the engine search and returns the engine to the pool
+            await stream.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
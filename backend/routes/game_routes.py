@@ -1,22 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import chess, uuid
-from ..services.database_service import DatabaseService
-from ..services.chess_engine_service import ChessEngineService
-from ..services.ai_service import AIService
-import os, yaml
-
-ROOT = os.path.dirname(os.path.abspath(__file__))
-CONFIG_PATH = os.path.join(ROOT, "..", "..", "config", "settings.yaml")
-with open(CONFIG_PATH, "r") as f:
-    CONFIG = yaml.safe_load(f)
+from ..services.container import ServiceContainer, get_services
 
 router = APIRouter()
 
-db = DatabaseService()
-engine_service = ChessEngineService(CONFIG.get('engine', {}))
-ai_service = AIService(engine_service, CONFIG.get('ai', {}))
-
 class StartGameReq(BaseModel):
     mode: str = "local"     # local | ai
     white_player: str = "human"
@@ -25,17 +15,23 @@ class StartGameReq(BaseModel):
 class MoveReq(BaseModel):
     game_id: str
     uci: str
+    # cursor: last move_no the client already has; only newer moves are returned
+    since_move_no: Optional[int] = None
+
+MOVES_PAGE_MAX = 500
 
 @router.post("/start")
-def start_game(req: StartGameReq):
+def start_game(req: StartGameReq, services: ServiceContainer = Depends(get_services)):
+    db = services.db
     game_id = str(uuid.uuid4())
     board = chess.Board()
     db.create_game(game_id=game_id, fen=board.fen(), mode=req.mode, white=req.white_player, black=req.black_player)
     return {"game_id": game_id, "fen": board.fen()}
 
 @router.post("/move")
-def make_move(req: MoveReq):
-    game = db.get_game(req.game_id)
+async def make_move(req: MoveReq, services: ServiceContainer = Depends(get_services)):
+    db, ai_service = services.db, services.ai_service
+    game = await run_in_threadpool(db.get_game, req.game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     board = chess.Board(game['fen'])
@@ -46,28 +42,65 @@ def make_move(req: MoveReq):
     if move not in board.legal_moves:
         raise HTTPException(status_code=400, detail="Illegal move")
     board.push(move)
-    db.add_move(req.game_id, req.uci, board.fen())
+    move_no = await run_in_threadpool(db.add_move, req.game_id, req.uci, board.fen())
     # Run AI analysis: returns evaluation, suggestions, feedback
-    analysis = ai_service.analyze_position(board, last_move=req.uci)
+    analysis = await ai_service.analyze_position_async(board, last_move=req.uci)
 
     return {
         "fen": board.fen(),
-        "moves": db.get_moves(req.game_id),
+        "move_no": move_no,
+        "moves": await run_in_threadpool(db.get_moves, req.game_id, req.since_move_no or 0),
         "analysis": analysis
     }
 
 
 
 @router.get("/state/{game_id}")
-def get_state(game_id: str):
-    game = db.get_game(game_id)
+async def get_state(game_id: str, since_move_no: Optional[int] = None, services: ServiceContainer = Depends(get_services)):
+    db, ai_service = services.db, services.ai_service
+    game = await run_in_threadpool(db.get_game, game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     board = chess.Board(game['fen'])
-    analysis = ai_service.analyze_position(board)
+    analysis = await ai_service.analyze_position_async(board)
     return {
         "game_id": game_id,
         "fen": game['fen'],
-        "moves": db.get_moves(game_id),
+        "move_no": game['move_count'],
+        "moves": await run_in_threadpool(db.get_moves, game_id, since_move_no or 0),
         "analysis": analysis
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/{game_id}/moves")
+def list_moves(
+    game_id: str,
+    after: int = Query(0, ge=0, description="return moves with move_no greater than this"),
+    limit: int = Query(100, ge=1, le=MOVES_PAGE_MAX),
+    services: ServiceContainer = Depends(get_services)
+):
+    """Full move history, one keyset page at a time; pass next_cursor back as `after`."""
+    db = services.db
+    if not db.get_game(game_id):
+        raise HTTPException(status_code=404, detail="Game not found")
+    moves = db.get_moves(game_id, since_move_no=after, limit=limit)
+    next_cursor = moves[-1]["move_no"] if len(moves) == limit else None
+    return {"game_id": game_id, "moves": moves, "next_cursor": next_cursor}
+
+
+@router.post("/{game_id}/review")
+async def review_game(game_id: str, services: ServiceContainer = Depends(get_services)):
+    """Analyze every ply of the game, classify inaccuracies/mistakes/blunders and store the report."""
+    try:
+        return await services.review_service.review_game(game_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+
+@router.get("/{game_id}/review")
+def get_review(game_id: str, services: ServiceContainer = Depends(get_services)):
+    """The stored review, if it covers the game's current moves."""
+    review = services.review_service.get_review(game_id)
+    if review is None:
+        raise HTTPException(status_code=404, detail="No current review for this game")
+    return review
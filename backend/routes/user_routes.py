@@ -1,15 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from ..services.database_service import DatabaseService
+from ..services.container import ServiceContainer, get_services
 
 router = APIRouter()
-db = DatabaseService()
 
 class CreateUserReq(BaseModel):
     username: str
 
 @router.post("/create")
-def create_user(req: CreateUserReq):
+def create_user(req: CreateUserReq, services: ServiceContainer = Depends(get_services)):
+    db = services.db
     user = db.get_user_by_username(req.username)
     if user:
         raise HTTPException(status_code=400, detail="Username already exists")
@@ -17,7 +17,8 @@ def create_user(req: CreateUserReq):
     return {"user_id": user_id, "username": req.username}
 
 @router.get("/{user_id}")
-def get_user(user_id: int):
+def get_user(user_id: int, services: ServiceContainer = Depends(get_services)):
+    db = services.db
     user = db.get_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
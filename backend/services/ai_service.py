@@ -3,20 +3,35 @@ AI service that glues evaluator, recommender and feedback generator.
 For Part 1 we provide a lightweight default evaluator and recommender inline,
 so the backend works without waiting for deep ML code in Part 2.
 """
+import asyncio
+import threading
+import time
 import chess
-from .. import db as db_module  # not used here; kept for possible DB interaction
-from .. import __name__ as pkgname
 import os
+from types import SimpleNamespace
 
 
-# Import ai modules from top-level ai/ if present. Fall back to basic internal logic.
-try:
-    from ...ai.evaluator import Evaluator
-    from ...ai.recommender import Recommender
-    from ...ai.feedback_generator import FeedbackGenerator
-    ai_available = True
-except Exception:
-    ai_available = False
+# The ai/ package (numpy, the model registry, trained models) is imported on first
+# use, not when the backend is imported: see load_ai() and AIService.warmup().
+_ai = None
+_ai_lock = threading.Lock()
+
+
+def load_ai():
+    """The ai/ classes used here, or False when the package cannot be imported (basic internal logic is used)."""
+    global _ai
+    if _ai is None:
+        with _ai_lock:
+            if _ai is None:
+                try:
+                    from ai.evaluator import Evaluator
+                    from ai.recommender import Recommender
+                    from ai.feedback_generator import FeedbackGenerator
+                    from ai.utils import position_key
+                    _ai = SimpleNamespace(Evaluator=Evaluator, Recommender=Recommender, FeedbackGenerator=FeedbackGenerator, position_key=position_key)
+                except Exception:
+                    _ai = False
+    return _ai
 
 # Minimal fallback evaluator/recommender/feedback if ai package isn't present
 class SimpleEvaluator:
@@ -30,11 +45,13 @@ class SimpleEvaluator:
     }
 
     def material(self, board: chess.Board):
+        # popcounts of the piece bitboards; this fallback must work without the ai
+        # package, so it keeps its own scale (0.1 per legal move) rather than ai.bitboard_eval's
         score = 0
         for ptype,val in self.PIECE_VALUES.items():
-            score += len(board.pieces(ptype, chess.WHITE)) * val
-            score -= len(board.pieces(ptype, chess.BLACK)) * val
-        score += int(0.1 * len(list(board.legal_moves)))
+            score += chess.popcount(board.pieces_mask(ptype, chess.WHITE)) * val
+            score -= chess.popcount(board.pieces_mask(ptype, chess.BLACK)) * val
+        score += int(0.1 * board.legal_moves.count())
         return float(score)
 
 class SimpleRecommender:
@@ -86,61 +103,332 @@ class SimpleFeedback:
 
 
 class AIService:
-    def __init__(self, engine_service, ai_config: dict=None):
+    def __init__(self, engine_service, ai_config: dict=None, async_engine_service=None, db=None):
+        """
+        engine_service: ChessEngineService used by the sync analyze_position (may be None)
+        async_engine_service: AsyncChessEngineService used by analyze_position_async
+        db: DatabaseService; when given, engine analyses are read from / written to its
+            position_analysis table so a position is searched once across games and users
+        """
         self.engine_service = engine_service
+        self.async_engine_service = async_engine_service
+        self.db = db
         self.ai_config = ai_config or {}
-        # if ai/ package exists use it
-        if ai_available:
-            # Evaluator takes engine_service, config
-            self.evaluator = Evaluator(engine_service, self.ai_config)
-            self.recommender = Recommender(self.evaluator, self.ai_config)
-            self.feedback = FeedbackGenerator()
-        else:
-            self.evaluator = SimpleEvaluator()
-            self.recommender = SimpleRecommender(self.evaluator, suggestion_count=self.ai_config.get('suggestion_count', 3))
-            self.feedback = SimpleFeedback()
+        # evaluator / recommender / feedback (and their models) are built on first use
+        # or by warmup(), whichever comes first
+        self._components = None
+        self._components_lock = threading.Lock()
+        self.warm = False
+
+    def _build_components(self) -> SimpleNamespace:
+        if self._components is None:
+            with self._components_lock:
+                if self._components is None:
+                    ai = load_ai()
+                    # if ai/ package exists use it
+                    if ai:
+                        evaluator = ai.Evaluator(self.engine_service, self.ai_config)
+                        recommender = ai.Recommender(evaluator, self.ai_config)
+                        feedback = ai.FeedbackGenerator()
+                    else:
+                        evaluator = SimpleEvaluator()
+                        recommender = SimpleRecommender(evaluator, suggestion_count=self.ai_config.get('suggestion_count', 3))
+                        feedback = SimpleFeedback()
+                    self._components = SimpleNamespace(ai=bool(ai), evaluator=evaluator, recommender=recommender, feedback=feedback)
+        return self._components
+
+    @property
+    def ai_available(self) -> bool:
+        return self._build_components().ai
+
+    @property
+    def evaluator(self):
+        return self._build_components().evaluator
 
+    @property
+    def recommender(self):
+        return self._build_components().recommender
+
+    @property
+    def feedback(self):
+        return self._build_components().feedback
+
+    def warmup(self):
+        """
+        Import the ai package, load the models and run one engine-less analysis so the
+        first real request does not pay for any of it. Blocking: run it in a thread.
+        """
+        self._build_components()
+        self._execute(self.plan(chess.Board()))
+        self.warm = True
+
+    def _multipv_args(self) -> dict:
+        return {
+            "multipv": self.ai_config.get('engine_multipv', self.ai_config.get('suggestion_count', 3)),
+            "limit": self.ai_config.get('engine_time', 0.05)
+        }
+
+    def model_stats(self) -> dict:
+        """Loaded models of this process: format, version, memory (see ai.model_registry)."""
+        registry = getattr(self.evaluator, "registry", None)
+        if registry is None:
+            return {"models": {}}
+        return registry.stats()
+
+    def plan(self, board: chess.Board, last_move: str = None, engine_service=None) -> "AnalysisPlan":
+        """Build the analysis plan for one request; engine_service is the engine its search will use."""
+        usable = engine_service is not None and (getattr(engine_service, "configured", False) or getattr(engine_service, "available", False))
+        stages = ["engine"] if usable else []
+        stages += ["eval", "suggestions", "feedback"]
+        return AnalysisPlan(board, last_move, stages)
 
     def analyze_position(self, board: chess.Board, last_move: str = None):
-        # Try engine first
-        engine_info = self.engine_service.analyze(board, limit=self.ai_config.get('engine_time', 0.05))
-        eval_cp = None
-        engine_best = None
-        if engine_info:
-            score = engine_info.get("score")
-            if score:
+        # A single MultiPV search gives both the root eval (score of the best
+        # line) and the top-N suggestions; the plan makes sure it runs only once.
+        plan = self.plan(board, last_move, self.engine_service)
+        if plan.needs("engine"):
+            stored = plan.run("stored_analysis", lambda: self._stored_lines(board, self.engine_service))
+            if stored is not None:
+                plan.provide("engine", stored)
+            else:
+                lines = plan.run("engine", lambda: self.engine_service.analyze_multipv(board, **self._multipv_args()))
+                self._store_lines(board, self.engine_service, lines)
+        return self._execute(plan)
+
+    async def analyze_position_async(self, board: chess.Board, last_move: str = None):
+        """
+        Async analyze_position: awaits the MultiPV search on the async engine pool
+        without holding a thread. Without an engine the CPU-bound fallback
+        (model / material scoring of every move) runs in a worker thread so it does
+        not block the event loop.
+        """
+        engine = self.async_engine_service
+        plan = self.plan(board, last_move, engine)
+        if plan.needs("engine"):
+            await engine.start()    # engine_name (the analysis cache key) is known once started
+            stored = await plan.run_async("stored_analysis", lambda: asyncio.to_thread(self._stored_lines, board, engine))
+            if stored is not None:
+                plan.provide("engine", stored)
+            else:
+                lines = await plan.run_async("engine", lambda: engine.analyze_multipv(board, **self._multipv_args()))
+                if lines:
+                    await asyncio.to_thread(self._store_lines, board, engine, lines)
+        if plan.result("engine") is not None:
+            return self._execute(plan)
+        return await asyncio.to_thread(self._execute, plan)
+
+    async def analyze_batch_async(self, items: list) -> list:
+        """
+        Analyze many positions; items is a list of (board, last_move) and the analyses
+        come back in the same order. With an engine pool the searches run concurrently,
+        at most one per pooled engine. Without an engine every root eval is scored by a
+        single model batch in a worker thread. A failing item yields its exception in
+        place of the analysis instead of failing the batch.
+        """
+        engine = self.async_engine_service
+        if engine is not None and engine.configured:
+            await engine.start()
+        if engine is None or not engine.available:
+            return await asyncio.to_thread(self._execute_batch, items)
+
+        # more concurrent searches than engines would only queue on the pool and
+        # could run into its checkout timeout
+        slots = asyncio.Semaphore(max(1, engine.stats()["engines"]))
+
+        async def one(board, last_move):
+            async with slots:
+                return await self.analyze_position_async(board, last_move)
+
+        return await asyncio.gather(*(one(board, last_move) for board, last_move in items), return_exceptions=True)
+
+    def _execute_batch(self, items: list) -> list:
+        plans = [self.plan(board, last_move) for board, last_move in items]
+        if self.ai_available:
+            # _root_eval handles game-over positions itself
+            pending = [p for p in plans if not p.board.is_game_over()]
+            if pending:
                 try:
-                    if score.is_mate():
-                        eval_cp = 100000.0 if score.white().mate() > 0 else -100000.0
-                    else:
-                        eval_cp = float(score.white().cp)
-                except Exception:
-                    eval_cp = None
+                    scores = self.evaluator.evaluate_boards([p.board for p in pending])
+                except Exception as e:
+                    # leave "eval" unprovided: every plan evaluates its own board below,
+                    # so one bad position fails its own entry, not the whole batch
+                    print("[AIService] batch evaluation failed, evaluating per item:", e)
+                    scores = None
+                for p, score in zip(pending, scores or []):
+                    p.provide("eval", score)
+        results = []
+        for plan in plans:
             try:
-                mv = self.engine_service.bestmove(board, depth=self.ai_config.get('engine_depth', 12))
-                if mv:
-                    engine_best = mv.uci()
-            except Exception:
-                engine_best = None
+                results.append(self._execute(plan))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def analysis_events(self, board: chess.Board, last_move: str = None, max_depth: int = None, max_time: float = None):
+        """
+        Async generator of progressively deeper analyses for streaming clients:
+        { depth, eval, suggestions, final } per completed engine depth, then a final
+        event with feedback. Without an engine a single final analysis is yielded.
+        """
+        engine = self.async_engine_service
+        lines = None
+        if engine is not None and engine.configured:
+            stream = engine.analysis_stream(board, self._multipv_args()["multipv"], max_depth=max_depth, max_time=max_time)
+            try:
+                async for lines in stream:
+                    suggestions = await asyncio.to_thread(self.recommender.suggest_moves, board, engine_lines=lines, use_engine=False) if self.ai_available else None
+                    yield {"depth": lines[0]["depth"], "eval": lines[0]["cp"], "suggestions": suggestions, "final": False}
+            finally:
+                # closed here, not whenever it is garbage collected: stops the search and
+                # returns the engine to the pool as soon as this generator is closed
+                await stream.aclose()
+        if lines:
+            await asyncio.to_thread(self._store_lines, board, engine, lines)
+            plan = AnalysisPlan(board, last_move, ["engine", "eval", "suggestions", "feedback"])
+            plan.provide("engine", lines)
+            result = await asyncio.to_thread(self._execute, plan)
+            result["depth"] = lines[0]["depth"]
+        else:
+            result = await self.analyze_position_async(board, last_move)
+            result["depth"] = None
+        result["final"] = True
+        yield result
 
+    def _stored_lines(self, board: chess.Board, engine_service):
+        """Engine lines for this position from the position_analysis table, or None."""
+        if self.db is None or not self.ai_available or not self.ai_config.get('analysis_cache', True):
+            return None
+        engine_name = getattr(engine_service, "engine_name", None)
+        if not engine_name:
+            return None
+        row = self.db.get_position_analysis(load_ai().position_key(board), engine_name, min_depth=self.ai_config.get('analysis_cache_min_depth', 0))
+        if row is None:
+            return None
+        lines = [{
+            "move": chess.Move.from_uci(line["uci"]),
+            "score": None,
+            "cp": line["cp"],
+            "pv": [chess.Move.from_uci(m) for m in line["pv"]],
+            "depth": line["depth"]
+        } for line in row["lines"]]
+        # a stored search with fewer lines than we now ask for is not good enough
+        if len(lines) < min(int(self._multipv_args()["multipv"]), board.legal_moves.count()):
+            return None
+        return lines
 
-        # If top-level ai module exists use it, else fallback
-        if ai_available:
-            eval_cp = self.evaluator.evaluate_board(board) if eval_cp is None else eval_cp
-            suggestions = self.recommender.suggest_moves(board)
-            feedback = self.feedback.generate_feedback(board, last_move=last_move, eval_score=eval_cp)
+    def _store_lines(self, board: chess.Board, engine_service, lines):
+        if self.db is None or not self.ai_available or not lines or not self.ai_config.get('analysis_cache', True):
+            return
+        engine_name = getattr(engine_service, "engine_name", None)
+        if not engine_name:
+            return
+        encoded = [{
+            "uci": line["move"].uci(),
+            "cp": line["cp"],
+            "pv": [m.uci() for m in line["pv"]],
+            "depth": line["depth"]
+        } for line in lines]
+        try:
+            self.db.save_position_analysis(load_ai().position_key(board), engine_name, lines[0]["depth"] or 0, lines[0]["cp"], encoded)
+        except Exception as e:
+            print("[AIService] could not persist analysis:", e)
+
+    def _execute(self, plan: "AnalysisPlan") -> dict:
+        """Run the remaining stages of the plan, reusing the engine result for eval and suggestions."""
+        board, last_move = plan.board, plan.last_move
+        engine_lines = plan.result("engine")
+        # the root was already searched (successfully or not): never search it again
+        searched = plan.done("engine")
+
+        if self.ai_available:
+            eval_cp = plan.run("eval", lambda: self._root_eval(board, engine_lines, use_engine=not searched))
+            suggestions = plan.run("suggestions", lambda: self.recommender.suggest_moves(board, engine_lines=engine_lines, use_engine=not searched))
+            feedback = plan.run("feedback", lambda: self.feedback.generate_feedback(board, last_move=last_move, eval_score=eval_cp))
         else:
-            if eval_cp is None:
-                eval_cp = self.evaluator.material(board)
-            suggestions = self.recommender.suggestions(board)
-            # include engine_best if present
-            if engine_best and not any(s['uci'] == engine_best for s in suggestions):
-                suggestions.insert(0, {"uci": engine_best, "san": engine_best, "score": None, "comment": "Engine best move"})
-                suggestions = suggestions[:self.ai_config.get('suggestion_count', 3)]
-            feedback = self.feedback.generate(board, last_move=last_move, eval_score=eval_cp)
+            eval_cp = plan.run("eval", lambda: self._root_eval(board, engine_lines))
+            suggestions = plan.run("suggestions", lambda: self._fallback_suggestions(board, engine_lines, eval_cp))
+            feedback = plan.run("feedback", lambda: self.feedback.generate(board, last_move=last_move, eval_score=eval_cp))
 
         return {
             "eval": eval_cp,
             "suggestions": suggestions,
-            "feedback": feedback
-        }
\ No newline at end of file
+            "feedback": feedback,
+            "timings": plan.timings_ms()
+        }
+
+    def _root_eval(self, board: chess.Board, engine_lines, use_engine: bool = True):
+        if engine_lines:
+            return engine_lines[0]["cp"]
+        if board.is_checkmate():
+            # side to move is mated
+            return -100000.0 if board.turn == chess.WHITE else 100000.0
+        if board.is_game_over():
+            return 0.0
+        if self.ai_available:
+            return self.evaluator.evaluate_board(board, use_engine=use_engine)
+        return self.evaluator.material(board)
+
+    def _fallback_suggestions(self, board: chess.Board, engine_lines, eval_cp):
+        suggestions = self.recommender.suggestions(board)
+        # include engine_best if present
+        if engine_lines:
+            best = engine_lines[0]["move"]
+            if not any(s['uci'] == best.uci() for s in suggestions):
+                suggestions.insert(0, {"uci": best.uci(), "san": board.san(best), "score": eval_cp, "comment": "Engine best move"})
+                suggestions = suggestions[:self.ai_config.get('suggestion_count', 3)]
+        return suggestions
+
+
+class AnalysisPlan:
+    """
+    The work for one analysis request. `stages` lists what is needed
+    ('engine' = the root MultiPV search, then 'eval', 'suggestions', 'feedback');
+    run() executes each stage at most once, keeps its result for the later stages
+    and records how long it took.
+    """
+
+    def __init__(self, board: chess.Board, last_move: str = None, stages: list = None):
+        self.board = board
+        self.last_move = last_move
+        self.stages = list(stages or [])
+        self._results = {}
+        self._timings = {}
+        self._created = time.perf_counter()
+
+    def needs(self, stage: str) -> bool:
+        return stage in self.stages and stage not in self._results
+
+    def done(self, stage: str) -> bool:
+        return stage in self._results
+
+    def result(self, stage: str):
+        return self._results.get(stage)
+
+    def provide(self, stage: str, value):
+        """Mark a stage as done with a result obtained elsewhere (e.g. a stored analysis)."""
+        self._results[stage] = value
+
+    def run(self, stage: str, fn):
+        if stage in self._results:
+            return self._results[stage]
+        start = time.perf_counter()
+        try:
+            self._results[stage] = fn()
+        finally:
+            self._timings[stage] = time.perf_counter() - start
+        return self._results[stage]
+
+    async def run_async(self, stage: str, fn):
+        if stage in self._results:
+            return self._results[stage]
+        start = time.perf_counter()
+        try:
+            self._results[stage] = await fn()
+        finally:
+            self._timings[stage] = time.perf_counter() - start
+        return self._results[stage]
+
+    def timings_ms(self) -> dict:
+        out = {stage: round(t * 1000, 2) for stage, t in self._timings.items()}
+        out["total"] = round((time.perf_counter() - self._created) * 1000, 2)
+        return out
@@ -0,0 +1,287 @@
+"""
+Async counterpart of ChessEngineService built on the python-chess asyncio engine
+protocol (chess.engine.popen_uci coroutines).
+
+Route handlers `await` the search instead of blocking a threadpool worker, so the
+number of in-flight analyses is bounded by engine capacity (the pool), not by the
+number of threads. The pool is spawned on the running event loop the first time it
+is needed (or explicitly via `await start()`), and uses the same `engine:` config
+section as ChessEngineService.
+
+Pooled engines are health-checked: a checked-out engine whose process has exited is
+replaced before it is used, and every `health_check_interval` seconds a background
+task pings the idle engines, restarts the ones that do not answer and respawns
+engines the pool lost, back up to pool_size.
+"""
+import asyncio
+import os
+import time
+import chess
+import chess.engine
+from .chess_engine_service import engine_settings, multipv_lines
+
+
+class AsyncChessEngineService:
+    def __init__(self, engine_config: dict = None):
+        settings = engine_settings(engine_config)
+        self.engine_path = settings["path"]
+        self.threads = settings["threads"]
+        self.hash_mb = settings["hash_mb"]
+        self.pool_size = settings["pool_size"]
+        self.checkout_timeout = settings["checkout_timeout"]
+        self.health_check_interval = settings["health_check_interval"]
+
+        self._loop = None
+        self._health_task = None
+        self._ready = None          # asyncio.Event set once the pool is spawned
+        self._pool = None           # asyncio.Queue of idle engines, bound to self._loop
+        self._engines = []          # (transport, protocol) of every live engine
+        self._metrics = {"checkouts": 0, "wait_total": 0.0, "wait_max": 0.0, "timeouts": 0, "restarts": 0}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.engine_path) and os.path.exists(self.engine_path)
+
+    @property
+    def available(self) -> bool:
+        return len(self._engines) > 0
+
+    @property
+    def engine_name(self):
+        """Engine id name/version reported over UCI, None until the pool is started."""
+        return self._engines[0][1].id.get("name") if self._engines else None
+
+    async def start(self):
+        """Spawn the engine pool on the running event loop (idempotent)."""
+        loop = asyncio.get_running_loop()
+        if not self.configured:
+            return
+        if self._loop is loop:
+            # another coroutine may still be spawning the pool
+            await self._ready.wait()
+            return
+        if self._loop is not None:
+            # the pool belonged to an event loop that is gone; its protocols are unusable
+            self._kill_all()
+        self._loop = loop
+        self._ready = asyncio.Event()
+        self._pool = asyncio.Queue()
+        try:
+            for _ in range(self.pool_size):
+                engine = await self._spawn()
+                if engine is None:
+                    break
+                self._pool.put_nowait(engine)
+        finally:
+            self._ready.set()
+        if self.health_check_interval > 0:
+            self._health_task = loop.create_task(self._health_loop())
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self.health_check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("[AsyncChessEngineService] health check failed:", e)
+
+    async def health_check(self, timeout: float = 5.0) -> int:
+        """
+        Ping every idle engine, restart the ones that do not answer and respawn
+        engines the pool lost (failed restarts) up to pool_size. Returns restarts.
+        """
+        if self._pool is None:
+            return 0
+        restarted = 0
+        for _ in range(self._pool.qsize()):
+            try:
+                engine = self._pool.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            try:
+                await asyncio.wait_for(engine.ping(), timeout=timeout)
+            except asyncio.CancelledError:
+                self._checkin(engine)
+                raise
+            except Exception:
+                engine = await self._restart(engine)
+                restarted += 1
+            self._checkin(engine)
+        while len(self._engines) < self.pool_size:
+            engine = await self._spawn()
+            if engine is None:
+                break
+            self._pool.put_nowait(engine)
+            restarted += 1
+        return restarted
+
+    def _exited(self, engine) -> bool:
+        for transport, protocol in self._engines:
+            if protocol is engine:
+                return transport.get_returncode() is not None
+        return True
+
+    async def _spawn(self):
+        try:
+            transport, engine = await chess.engine.popen_uci(self.engine_path)
+        except Exception as e:
+            print(f"[AsyncChessEngineService] Could not start engine at {self.engine_path}: {e}")
+            return None
+        try:
+            options = {name: value for name, value in (("Threads", self.threads), ("Hash", self.hash_mb)) if name in engine.options}
+            if options:
+                await engine.configure(options)
+        except Exception as e:
+            print("[AsyncChessEngineService] Could not configure engine:", e)
+        self._engines.append((transport, engine))
+        return engine
+
+    async def _discard(self, engine):
+        for entry in list(self._engines):
+            if entry[1] is engine:
+                self._engines.remove(entry)
+                try:
+                    await asyncio.wait_for(engine.quit(), timeout=1.0)
+                except Exception:
+                    entry[0].close()
+
+    async def _restart(self, engine):
+        await self._discard(engine)
+        self._metrics["restarts"] += 1
+        return await self._spawn()
+
+    async def _checkout(self):
+        await self.start()
+        if not self.available:
+            return None
+        start = time.perf_counter()
+        try:
+            engine = await asyncio.wait_for(self._pool.get(), timeout=self.checkout_timeout)
+        except asyncio.TimeoutError:
+            self._metrics["timeouts"] += 1
+            raise TimeoutError(f"no engine free after {self.checkout_timeout}s")
+        if self._exited(engine):
+            # the process died while idle: replace it before handing it out
+            print("[AsyncChessEngineService] idle engine exited, restarting")
+            engine = await self._restart(engine)
+            if engine is None:
+                return await self._checkout() if self.available else None
+        waited = time.perf_counter() - start
+        self._metrics["checkouts"] += 1
+        self._metrics["wait_total"] += waited
+        self._metrics["wait_max"] = max(self._metrics["wait_max"], waited)
+        return engine
+
+    def _checkin(self, engine):
+        if engine is not None and self._pool is not None:
+            self._pool.put_nowait(engine)
+
+    async def _run(self, fn):
+        """
+        Await fn(engine) on a pooled engine; None if no engine is configured. If the
+        engine process died, restart it and retry once on the fresh process.
+        """
+        for attempt in (1, 2):
+            engine = await self._checkout()
+            if engine is None:
+                return None
+            try:
+                return await fn(engine)
+            except chess.engine.EngineTerminatedError as e:
+                print("[AsyncChessEngineService] engine terminated, restarting:", e)
+                engine = await self._restart(engine)
+                if attempt == 2 or engine is None:
+                    raise
+            finally:
+                self._checkin(engine)
+
+    async def analyze(self, board: chess.Board, limit=0.1):
+        """Async ChessEngineService.analyze: engine InfoDict or None."""
+        try:
+            return await self._run(lambda engine: engine.analyse(board, chess.engine.Limit(time=limit)))
+        except Exception as e:
+            print("[AsyncChessEngineService] analyze error:", e)
+            return None
+
+    async def analyze_multipv(self, board: chess.Board, multipv: int = 3, limit=0.1):
+        """Async ChessEngineService.analyze_multipv: lines best first, None without engine."""
+        try:
+            infos = await self._run(lambda engine: engine.analyse(board, chess.engine.Limit(time=limit), multipv=max(1, int(multipv))))
+        except Exception as e:
+            print("[AsyncChessEngineService] analyze_multipv error:", e)
+            return None
+        if infos is None:
+            return None
+        return multipv_lines(infos)
+
+    async def bestmove(self, board: chess.Board, depth: int = 12):
+        try:
+            res = await self._run(lambda engine: engine.play(board, chess.engine.Limit(depth=depth)))
+        except Exception as e:
+            print("[AsyncChessEngineService] bestmove error:", e)
+            return None
+        return res.move if res else None
+
+    async def analysis_stream(self, board: chess.Board, multipv: int = 3, max_depth: int = None, max_time: float = None):
+        """
+        Async generator over an iterative-deepening search: yields the MultiPV lines
+        (same shape as analyze_multipv) each time the engine completes a new depth,
+        until max_depth / max_time is reached. The engine stays checked out while the
+        generator is alive; closing the generator (e.g. client disconnect) stops the
+        search and returns the engine to the pool. Yields nothing without an engine.
+        """
+        engine = await self._checkout()
+        if engine is None:
+            return
+        wanted = max(1, min(int(multipv), board.legal_moves.count()))
+        try:
+            limit = chess.engine.Limit(depth=max_depth, time=max_time)
+            with await engine.analysis(board, limit, multipv=wanted) as analysis:
+                last_depth = 0
+                async for info in analysis:
+                    # a depth is complete once its last PV line arrives
+                    if info.get("multipv", 1) != wanted or "pv" not in info:
+                        continue
+                    # analysis.multipv is the engine's latest state, which may already be
+                    # ahead of this queued info when the consumer is slow; dedupe on it
+                    lines = multipv_lines(analysis.multipv)
+                    if not lines or (lines[0]["depth"] or 0) <= last_depth:
+                        continue
+                    last_depth = lines[0]["depth"] or 0
+                    yield lines
+        except chess.engine.EngineTerminatedError as e:
+            print("[AsyncChessEngineService] engine terminated during analysis, restarting:", e)
+            engine = await self._restart(engine)
+        finally:
+            self._checkin(engine)
+
+    def stats(self) -> dict:
+        m = dict(self._metrics)
+        m["engines"] = len(self._engines)
+        m["idle"] = self._pool.qsize() if self._pool is not None else 0
+        m["in_use"] = m["engines"] - m["idle"]
+        m["wait_avg"] = m["wait_total"] / m["checkouts"] if m["checkouts"] else 0.0
+        return m
+
+    async def quit(self):
+        self._stop_health_task()
+        for _, engine in list(self._engines):
+            await self._discard(engine)
+        self._pool = None
+        self._loop = None
+
+    def _stop_health_task(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+    def _kill_all(self):
+        self._stop_health_task()
+        for transport, _ in self._engines:
+            try:
+                transport.close()
+            except Exception:
+                pass
+        self._engines = []
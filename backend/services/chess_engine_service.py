@@ -1,53 +1,252 @@
 import chess
 import chess.engine
 import os, shutil
+import queue, threading, time
+
+
+def score_to_cp(score) -> float:
+    """
+    Convert a python-chess PovScore to centipawns from White's perspective.
+    Mates are clamped to +/-100000 like the rest of the code base.
+    """
+    if score is None:
+        return None
+    white = score.white()
+    if white.is_mate():
+        return 100000.0 if white > chess.engine.Cp(0) else -100000.0
+    cp = white.score()
+    return float(cp) if cp is not None else 0.0
+
+
+def engine_settings(engine_config: dict = None) -> dict:
+    """Normalize the `engine:` config section (shared by the sync and async services)."""
+    engine_config = engine_config or {}
+    path = engine_config.get('stockfish_path', "") or ""
+    # also allow env var
+    if not path:
+        path = os.environ.get("STOCKFISH_PATH", "")
+    threads = int(engine_config.get('threads', 1) or 1)
+    pool_size = int(engine_config.get('pool_size', 0) or 0)
+    if pool_size <= 0:
+        pool_size = max(1, (os.cpu_count() or 1) // threads)
+    return {
+        "path": path,
+        "threads": threads,
+        "hash_mb": int(engine_config.get('hash_mb', 16) or 16),
+        "pool_size": pool_size,
+        "checkout_timeout": float(engine_config.get('checkout_timeout', 10.0)),
+        "health_check_interval": float(engine_config.get('health_check_interval', 30.0) or 0.0),
+    }
+
+
+def multipv_lines(infos) -> list:
+    """Turn the InfoDicts of a MultiPV search into [{ move, score, cp, pv, depth }, ...]."""
+    lines = []
+    for info in infos:
+        pv = info.get("pv")
+        if not pv:
+            continue
+        score = info.get("score")
+        lines.append({
+            "move": pv[0],
+            "score": score,
+            "cp": score_to_cp(score),
+            "pv": list(pv),
+            "depth": info.get("depth")
+        })
+    return lines
+
 
 class ChessEngineService:
+    """
+    Pool of UCI engine processes. Each call checks an engine out of the pool, runs
+    one search and checks it back in, so concurrent requests run on separate
+    engines instead of queueing on one process.
+
+    engine_config keys (config/settings.yaml `engine:`):
+    - stockfish_path: engine binary (or STOCKFISH_PATH env var)
+    - pool_size: number of engine processes; 0/missing = CPU count / threads
+    - threads, hash_mb: per-engine UCI `Threads` / `Hash` options
+    - checkout_timeout: seconds to wait for a free engine before giving up
+
+    health_check() runs only when called (this pool backs scripts, not the server);
+    the async pool the app serves from runs it every `health_check_interval` seconds.
+    """
+
     def __init__(self, engine_config: dict=None):
-        self.engine_path = ""
-        if engine_config:
-            self.engine_path = engine_config.get('stockfish_path', "") or ""
-        # also allow env var
-        if not self.engine_path:
-            self.engine_path = os.environ.get("STOCKFISH_PATH", "")
-        self.engine = None
+        settings = engine_settings(engine_config)
+        self.engine_path = settings["path"]
+        self.threads = settings["threads"]
+        self.hash_mb = settings["hash_mb"]
+        self.pool_size = settings["pool_size"]
+        self.checkout_timeout = settings["checkout_timeout"]
+
+        self._pool = queue.Queue()
+        self._engines = []          # every live engine, idle or checked out
+        self._lock = threading.Lock()
+        self._metrics = {"checkouts": 0, "wait_total": 0.0, "wait_max": 0.0, "timeouts": 0, "restarts": 0}
         if self.engine_path and os.path.exists(self.engine_path):
-            try:
-                self.engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
-            except Exception as e:
-                print(f"[ChessEngineService] Could not start engine at {self.engine_path}: {e}")
-                self.engine = None
+            for _ in range(self.pool_size):
+                engine = self._spawn()
+                if engine is None:
+                    break
+                self._pool.put(engine)
         else:
-            # no engine available; remain None -> fallbacks used
+            # no engine available; pool stays empty -> fallbacks used
+            pass
+
+    @property
+    def available(self) -> bool:
+        return len(self._engines) > 0
+
+    @property
+    def engine_name(self):
+        """Engine id name/version reported over UCI (e.g. 'Stockfish 16'), None without engine."""
+        with self._lock:
+            return self._engines[0].id.get("name") if self._engines else None
+
+    def _spawn(self):
+        try:
+            engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
+        except Exception as e:
+            print(f"[ChessEngineService] Could not start engine at {self.engine_path}: {e}")
+            return None
+        try:
+            options = {name: value for name, value in (("Threads", self.threads), ("Hash", self.hash_mb)) if name in engine.options}
+            if options:
+                engine.configure(options)
+        except Exception as e:
+            print("[ChessEngineService] Could not configure engine:", e)
+        with self._lock:
+            self._engines.append(engine)
+        return engine
+
+    def _discard(self, engine):
+        with self._lock:
+            if engine in self._engines:
+                self._engines.remove(engine)
+        try:
+            engine.quit()
+        except Exception:
             pass
 
+    def _restart(self, engine):
+        """Replace a crashed/unresponsive engine with a fresh process (None if that fails too)."""
+        self._discard(engine)
+        with self._lock:
+            self._metrics["restarts"] += 1
+        return self._spawn()
+
+    def _checkout(self):
+        start = time.perf_counter()
+        try:
+            engine = self._pool.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            raise TimeoutError(f"no engine free after {self.checkout_timeout}s")
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._metrics["checkouts"] += 1
+            self._metrics["wait_total"] += waited
+            self._metrics["wait_max"] = max(self._metrics["wait_max"], waited)
+        return engine
+
+    def _checkin(self, engine):
+        if engine is not None:
+            self._pool.put(engine)
+
+    def _run(self, fn):
+        """
+        Run fn(engine) on a pooled engine. If the engine process died, restart it
+        and retry once on the fresh process.
+        """
+        for attempt in (1, 2):
+            engine = self._checkout()
+            try:
+                return fn(engine)
+            except chess.engine.EngineTerminatedError as e:
+                print("[ChessEngineService] engine terminated, restarting:", e)
+                engine = self._restart(engine)
+                if attempt == 2 or engine is None:
+                    raise
+            finally:
+                self._checkin(engine)
+
+    def health_check(self) -> int:
+        """Ping every idle engine and restart the ones that do not answer. Returns restarts."""
+        restarted = 0
+        for _ in range(self._pool.qsize()):
+            try:
+                engine = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                engine.ping()
+            except Exception:
+                engine = self._restart(engine)
+                restarted += 1
+            self._checkin(engine)
+        return restarted
+
+    def stats(self) -> dict:
+        """Pool size and queue-wait metrics."""
+        with self._lock:
+            m = dict(self._metrics)
+            m["engines"] = len(self._engines)
+        m["idle"] = self._pool.qsize()
+        m["in_use"] = m["engines"] - m["idle"]
+        m["wait_avg"] = m["wait_total"] / m["checkouts"] if m["checkouts"] else 0.0
+        return m
+
     def analyze(self, board: chess.Board, limit=0.1):
         """
         Return engine analysis info or None if no engine present.
         `limit` is seconds (float).
         """
-        if not self.engine:
+        if not self.available:
             return None
         try:
-            info = self.engine.analyse(board, chess.engine.Limit(time=limit))
+            info = self._run(lambda engine: engine.analyse(board, chess.engine.Limit(time=limit)))
             return info
         except Exception as e:
             print("[ChessEngineService] analyze error:", e)
             return None
 
+    def analyze_multipv(self, board: chess.Board, multipv: int = 3, limit=0.1):
+        """
+        Run ONE MultiPV search and return the top `multipv` lines, best first:
+            [{ move, score, cp, pv, depth }, ...]
+        `cp` is centipawns from White's perspective, `pv` a list of chess.Move.
+        The first line's score doubles as the root evaluation.
+        Returns None if no engine present (or on error), [] if there are no legal moves.
+        """
+        if not self.available:
+            return None
+        try:
+            infos = self._run(lambda engine: engine.analyse(board, chess.engine.Limit(time=limit), multipv=max(1, int(multipv))))
+        except Exception as e:
+            print("[ChessEngineService] analyze_multipv error:", e)
+            return None
+        return multipv_lines(infos)
+
     def bestmove(self, board: chess.Board, depth: int = 12):
-        if not self.engine:
+        if not self.available:
             return None
         try:
-            res = self.engine.play(board, chess.engine.Limit(depth=depth))
+            res = self._run(lambda engine: engine.play(board, chess.engine.Limit(depth=depth)))
             return res.move
         except Exception as e:
             print("[ChessEngineService] bestmove error:", e)
             return None
 
     def quit(self):
-        try:
-            if self.engine:
-                self.engine.quit()
-        except Exception:
-            pass
+        with self._lock:
+            engines = list(self._engines)
+        for engine in engines:
+            self._discard(engine)
+        while not self._pool.empty():
+            try:
+                self._pool.get_nowait()
+            except queue.Empty:
+                break
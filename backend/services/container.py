@@ -0,0 +1,108 @@
+"""
+Application-scoped service container.
+
+One ServiceContainer per process holds the database service, the async engine pool,
+the AIService (with its evaluator/recommender models) and the GameReviewService.
+It is created in the FastAPI lifespan startup, closed on shutdown, and handed to
+route handlers through the `get_services` dependency:
+
+    @router.post("/analyze")
+    async def analyze(req: AnalyzeReq, services: ServiceContainer = Depends(get_services)):
+        ...
+
+Creating it is cheap: the ai package, the models and the engine pool are brought up
+by a background warmup task started in startup(), and GET /ready reports "cold"
+until that task has finished. A failed warmup is retried with exponential backoff
+(1 s doubling up to server.warmup_retry_max_delay), so /ready turns warm once the
+cause is gone, without restarting the process.
+"""
+import asyncio
+import threading
+import time
+from fastapi import Request
+from ..config import load_config
+from .database_service import DatabaseService
+from .async_engine_service import AsyncChessEngineService
+from .ai_service import AIService
+from .game_review_service import GameReviewService
+
+
+class ServiceContainer:
+    def __init__(self, config: dict = None):
+        self.config = config if config is not None else load_config()
+        self.db = DatabaseService(busy_timeout_ms=self.config.get('database', {}).get('busy_timeout_ms', 5000))
+        self.engine_service = AsyncChessEngineService(self.config.get('engine', {}))
+        self.ai_service = AIService(None, self.config.get('ai', {}), async_engine_service=self.engine_service, db=self.db)
+        self.review_service = GameReviewService(self.db, self.ai_service, self.config.get('ai', {}))
+        self._warmup_task = None
+        self.warmup_error = None
+        self.warmup_seconds = None
+        self.warmup_attempts = 0
+
+    async def startup(self):
+        # requests are accepted right away; whatever is still cold loads on first use
+        self._warmup_task = asyncio.create_task(self.warmup())
+
+    async def warmup(self):
+        """
+        Spawn the engine pool and load the ai package/models so the first request does
+        not pay for them; retried with backoff until it succeeds (or the task is cancelled).
+        """
+        max_delay = float(self.config.get('server', {}).get('warmup_retry_max_delay', 60.0))
+        delay = min(1.0, max_delay)
+        started = time.perf_counter()
+        while True:
+            self.warmup_attempts += 1
+            try:
+                await asyncio.gather(self.engine_service.start(), asyncio.to_thread(self.ai_service.warmup))
+            except Exception as e:
+                self.warmup_error = str(e)
+                print(f"[ServiceContainer] warmup attempt {self.warmup_attempts} failed: {e}; retrying in {delay:g}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_delay)
+                continue
+            self.warmup_error = None
+            self.warmup_seconds = time.perf_counter() - started
+            return
+
+    @property
+    def ready(self) -> bool:
+        task = self._warmup_task
+        # a warmup cancelled mid-attempt never loaded anything, even without an error
+        return task is not None and task.done() and not task.cancelled() and self.warmup_error is None
+
+    def readiness(self) -> dict:
+        return {
+            "status": "warm" if self.ready else "cold",
+            "models": self.ai_service.warm,
+            "engines": self.engine_service.stats()["engines"],
+            "warmup_seconds": self.warmup_seconds,
+            "attempts": self.warmup_attempts,
+            "error": self.warmup_error,
+        }
+
+    async def shutdown(self):
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+        await self.engine_service.quit()
+        self.db.close()
+
+
+_create_lock = threading.Lock()
+
+
+def get_services(request: Request) -> ServiceContainer:
+    """
+    FastAPI dependency returning the app's ServiceContainer. Normally created by the
+    lifespan handler; created on first use if the server did not run lifespan events
+    (e.g. a TestClient used outside a `with` block).
+    """
+    state = request.app.state
+    services = getattr(state, "services", None)
+    if services is None:
+        with _create_lock:
+            services = getattr(state, "services", None)
+            if services is None:
+                services = ServiceContainer()
+                state.services = services
+    return services
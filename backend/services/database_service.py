@@ -1,23 +1,108 @@
 # backend/services/database_service.py
 import sqlite3
 import os
+import json
+import threading
+from contextlib import contextmanager
 from typing import Optional, List, Dict
 
 ROOT = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(ROOT, "..", "database", "db.sqlite3")
 
 class DatabaseService:
-    def __init__(self, db_path: str = DB_PATH):
-        self.db_path = db_path
+    """
+    SQLite access for users, games and moves.
+
+    Each thread keeps one long-lived connection (WAL journal, synchronous=NORMAL,
+    busy timeout) instead of connecting per call, so the file open, schema read and
+    prepared statements (sqlite3 statement cache) are reused across requests.
+    """
+
+    def __init__(self, db_path: str = None, busy_timeout_ms: int = 5000):
+        self.db_path = db_path or DB_PATH
+        self.busy_timeout_ms = int(busy_timeout_ms)
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
         self._ensure_schema()
 
     def _get_conn(self):
-        return sqlite3.connect(self.db_path)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.busy_timeout_ms / 1000.0,
+                check_same_thread=False,   # only close() touches another thread's connection
+                cached_statements=256
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
 
-    def _ensure_schema(self):
+    @contextmanager
+    def _cursor(self):
+        """Cursor on this thread's connection; commits on success, rolls back on error."""
         conn = self._get_conn()
         cur = conn.cursor()
+        try:
+            yield cur
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def close(self):
+        """Close every thread's connection (e.g. on app shutdown)."""
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+    # bump when _migrate() gains a step; stored in PRAGMA user_version
+    SCHEMA_VERSION = 1
+
+    def _ensure_schema(self):
+        with self._cursor() as cur:
+            # IMMEDIATE: concurrent workers starting up wait instead of migrating twice
+            cur.execute("BEGIN IMMEDIATE")
+            self._create_tables(cur)
+            self._migrate(cur)
+
+    def _migrate(self, cur):
+        """Bring databases created by older versions up to SCHEMA_VERSION."""
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # v1: per-game move counter on games + unique (game_id, move_no) index
+            columns = [r[1] for r in cur.execute("PRAGMA table_info(games)").fetchall()]
+            if "move_count" not in columns:
+                cur.execute("ALTER TABLE games ADD COLUMN move_count INTEGER NOT NULL DEFAULT 0")
+            dup = cur.execute("SELECT 1 FROM moves GROUP BY game_id, move_no HAVING COUNT(*) > 1 LIMIT 1").fetchone()
+            if dup:
+                # racing COUNT(*)-based inserts could have produced duplicate numbers; renumber in insert order
+                cur.execute("""
+                    UPDATE moves SET move_no = (
+                        SELECT rn FROM (
+                            SELECT id, ROW_NUMBER() OVER (PARTITION BY game_id ORDER BY move_no, id) AS rn FROM moves
+                        ) r WHERE r.id = moves.id
+                    )
+                """)
+            cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_moves_game_move ON moves (game_id, move_no)")
+            cur.execute("UPDATE games SET move_count = COALESCE((SELECT MAX(move_no) FROM moves WHERE moves.game_id = games.id), 0)")
+        if version < self.SCHEMA_VERSION:
+            cur.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+
+    def _create_tables(self, cur):
         # users
         cur.execute("""
             CREATE TABLE IF NOT EXISTS users (
@@ -34,6 +119,7 @@ class DatabaseService:
                 mode TEXT,
                 white TEXT,
                 black TEXT,
+                move_count INTEGER NOT NULL DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
         """)
@@ -49,78 +135,129 @@ class DatabaseService:
                 FOREIGN KEY (game_id) REFERENCES games(id)
             );
         """)
-        conn.commit()
-        conn.close()
+        # engine analysis shared across games/users, keyed by normalized position
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS position_analysis (
+                position_key TEXT NOT NULL,
+                engine TEXT NOT NULL,
+                depth INTEGER,
+                eval REAL,
+                lines TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (position_key, engine)
+            );
+        """)
+        # latest post-game review per game; move_count tells whether it is still current
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS game_reviews (
+                game_id TEXT PRIMARY KEY,
+                move_count INTEGER NOT NULL,
+                report TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (game_id) REFERENCES games(id)
+            );
+        """)
 
     # Users
     def create_user(self, username: str) -> int:
-        conn = self._get_conn()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO users (username) VALUES (?)", (username,))
-        conn.commit()
-        uid = cur.lastrowid
-        conn.close()
-        return uid
+        with self._cursor() as cur:
+            cur.execute("INSERT INTO users (username) VALUES (?)", (username,))
+            return cur.lastrowid
 
     def get_user_by_username(self, username: str) -> Optional[dict]:
-        conn = self._get_conn()
-        cur = conn.cursor()
-        res = cur.execute("SELECT id, username, created_at FROM users WHERE username=? LIMIT 1", (username,)).fetchone()
-        conn.close()
+        with self._cursor() as cur:
+            res = cur.execute("SELECT id, username, created_at FROM users WHERE username=? LIMIT 1", (username,)).fetchone()
         if not res:
             return None
         return {"id": res[0], "username": res[1], "created_at": res[2]}
 
     def get_user(self, user_id: int) -> Optional[dict]:
-        conn = self._get_conn()
-        cur = conn.cursor()
-        res = cur.execute("SELECT id, username, created_at FROM users WHERE id=? LIMIT 1", (user_id,)).fetchone()
-        conn.close()
+        with self._cursor() as cur:
+            res = cur.execute("SELECT id, username, created_at FROM users WHERE id=? LIMIT 1", (user_id,)).fetchone()
         if not res:
             return None
         return {"id": res[0], "username": res[1], "created_at": res[2]}
 
     # Games
     def create_game(self, game_id: str, fen: str, mode: str, white: str, black: str):
-        conn = self._get_conn()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO games (id, fen, mode, white, black) VALUES (?, ?, ?, ?, ?)", (game_id, fen, mode, white, black))
-        conn.commit()
-        conn.close()
+        with self._cursor() as cur:
+            cur.execute("INSERT INTO games (id, fen, mode, white, black) VALUES (?, ?, ?, ?, ?)", (game_id, fen, mode, white, black))
 
     def get_game(self, game_id: str) -> Optional[dict]:
-        conn = self._get_conn()
-        cur = conn.cursor()
-        res = cur.execute("SELECT id, fen, mode, white, black, created_at FROM games WHERE id=? LIMIT 1", (game_id,)).fetchone()
-        conn.close()
+        with self._cursor() as cur:
+            res = cur.execute("SELECT id, fen, mode, white, black, created_at, move_count FROM games WHERE id=? LIMIT 1", (game_id,)).fetchone()
         if not res:
             return None
-        return {"id": res[0], "fen": res[1], "mode": res[2], "white": res[3], "black": res[4], "created_at": res[5]}
+        return {"id": res[0], "fen": res[1], "mode": res[2], "white": res[3], "black": res[4], "created_at": res[5], "move_count": res[6]}
 
     def update_game_fen(self, game_id: str, fen: str):
-        conn = self._get_conn()
-        cur = conn.cursor()
-        cur.execute("UPDATE games SET fen=? WHERE id=?", (fen, game_id))
-        conn.commit()
-        conn.close()
+        with self._cursor() as cur:
+            cur.execute("UPDATE games SET fen=? WHERE id=?", (fen, game_id))
 
     # Moves
-    def add_move(self, game_id: str, move_uci: str, fen: str):
-        conn = self._get_conn()
-        cur = conn.cursor()
-        move_no = cur.execute("SELECT COUNT(*) FROM moves WHERE game_id=?", (game_id,)).fetchone()[0] + 1
-        cur.execute("INSERT INTO moves (game_id, move_uci, fen, move_no) VALUES (?, ?, ?, ?)", (game_id, move_uci, fen, move_no))
-        # update game's fen
-        cur.execute("UPDATE games SET fen=? WHERE id=?", (fen, game_id))
-        conn.commit()
-        conn.close()
-
-    def get_moves(self, game_id: str) -> List[dict]:
-        conn = self._get_conn()
-        cur = conn.cursor()
-        rows = cur.execute("SELECT move_no, move_uci, fen, created_at FROM moves WHERE game_id=? ORDER BY move_no ASC", (game_id,)).fetchall()
-        conn.close()
+    def add_move(self, game_id: str, move_uci: str, fen: str) -> int:
+        """Append a move and update the game's fen in one transaction; returns its move_no."""
+        with self._cursor() as cur:
+            # bumping the counter takes the write lock, so the number cannot race
+            cur.execute("UPDATE games SET move_count = move_count + 1, fen=? WHERE id=?", (fen, game_id))
+            if cur.rowcount == 0:
+                raise ValueError(f"Unknown game: {game_id}")
+            move_no = cur.execute("SELECT move_count FROM games WHERE id=?", (game_id,)).fetchone()[0]
+            cur.execute("INSERT INTO moves (game_id, move_uci, fen, move_no) VALUES (?, ?, ?, ?)", (game_id, move_uci, fen, move_no))
+        return move_no
+
+    def get_moves(self, game_id: str, since_move_no: int = 0, limit: int = None) -> List[dict]:
+        """
+        Moves of a game in order. Keyset pagination on move_no (served by the
+        (game_id, move_no) index): only moves with move_no > since_move_no,
+        at most `limit` of them.
+        """
+        with self._cursor() as cur:
+            rows = cur.execute(
+                "SELECT move_no, move_uci, fen, created_at FROM moves WHERE game_id=? AND move_no > ? ORDER BY move_no ASC LIMIT ?",
+                (game_id, int(since_move_no or 0), -1 if limit is None else int(limit))
+            ).fetchall()
         out = []
         for r in rows:
             out.append({"move_no": r[0], "uci": r[1], "fen": r[2], "created_at": r[3]})
         return out
+
+    # Position analysis
+    def get_position_analysis(self, position_key: str, engine: str, min_depth: int = 0) -> Optional[dict]:
+        with self._cursor() as cur:
+            res = cur.execute(
+                "SELECT depth, eval, lines, updated_at FROM position_analysis WHERE position_key=? AND engine=? AND depth >= ? LIMIT 1",
+                (position_key, engine, int(min_depth or 0))
+            ).fetchone()
+        if not res:
+            return None
+        return {"position_key": position_key, "engine": engine, "depth": res[0], "eval": res[1], "lines": json.loads(res[2]), "updated_at": res[3]}
+
+    def save_position_analysis(self, position_key: str, engine: str, depth: int, eval_cp: float, lines: list):
+        """Upsert an analysis; an existing deeper analysis of the same position/engine is kept
+        unless the new one has more lines (a higher MultiPV)."""
+        with self._cursor() as cur:
+            cur.execute("""
+                INSERT INTO position_analysis (position_key, engine, depth, eval, lines) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (position_key, engine) DO UPDATE SET
+                    depth=excluded.depth, eval=excluded.eval, lines=excluded.lines, updated_at=CURRENT_TIMESTAMP
+                WHERE excluded.depth >= position_analysis.depth
+                   OR json_array_length(excluded.lines) > json_array_length(position_analysis.lines)
+            """, (position_key, engine, int(depth or 0), eval_cp, json.dumps(lines)))
+
+    # Game reviews
+    def get_game_review(self, game_id: str) -> Optional[dict]:
+        with self._cursor() as cur:
+            res = cur.execute("SELECT move_count, report, created_at FROM game_reviews WHERE game_id=? LIMIT 1", (game_id,)).fetchone()
+        if not res:
+            return None
+        return {"game_id": game_id, "move_count": res[0], "report": json.loads(res[1]), "created_at": res[2]}
+
+    def save_game_review(self, game_id: str, move_count: int, report: dict):
+        with self._cursor() as cur:
+            cur.execute("""
+                INSERT INTO game_reviews (game_id, move_count, report) VALUES (?, ?, ?)
+                ON CONFLICT (game_id) DO UPDATE SET
+                    move_count=excluded.move_count, report=excluded.report, created_at=CURRENT_TIMESTAMP
+            """, (game_id, int(move_count), json.dumps(report)))
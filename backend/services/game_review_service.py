@@ -0,0 +1,125 @@
+"""
+Post-game review: evaluate every position of a stored game and classify each move
+by how much evaluation the mover gave away.
+
+All positions of the game go through AIService.analyze_batch_async in one call, so
+with an engine pool the searches run in parallel (one per pooled engine), and
+without one every position is scored by a single model batch. The report is stored
+in the game_reviews table and served again until the game gets new moves.
+
+Classification uses the eval loss from the mover's point of view, in centipawns:
+    inaccuracy >= 50, mistake >= 100, blunder >= 300   (ai.review_thresholds)
+Evals are clamped to +/-REVIEW_EVAL_CAP first, so converting a won position into a
+mate (or walking into one from a lost position) is not reported as a huge loss.
+"""
+import asyncio
+import time
+import chess
+
+DEFAULT_THRESHOLDS = {"inaccuracy": 50, "mistake": 100, "blunder": 300}
+REVIEW_EVAL_CAP = 1000.0
+
+
+def classify_loss(loss: float, thresholds: dict = None) -> str:
+    """Name of the worst category `loss` reaches, or None for a good move."""
+    thresholds = thresholds or DEFAULT_THRESHOLDS
+    label = None
+    for name in ("inaccuracy", "mistake", "blunder"):
+        if loss >= thresholds[name]:
+            label = name
+    return label
+
+
+def _clamp(cp: float) -> float:
+    return max(-REVIEW_EVAL_CAP, min(REVIEW_EVAL_CAP, float(cp)))
+
+
+class GameReviewService:
+    def __init__(self, db, ai_service, ai_config: dict = None):
+        self.db = db
+        self.ai_service = ai_service
+        self.ai_config = ai_config or {}
+        self.thresholds = dict(DEFAULT_THRESHOLDS, **self.ai_config.get('review_thresholds', {}))
+
+    def get_review(self, game_id: str):
+        """Stored review of the game's current move list, or None."""
+        game = self.db.get_game(game_id)
+        if not game:
+            return None
+        stored = self.db.get_game_review(game_id)
+        if stored is None or stored["move_count"] != game["move_count"]:
+            return None
+        return stored["report"]
+
+    async def review_game(self, game_id: str, start_fen: str = chess.STARTING_FEN) -> dict:
+        """Analyze every ply of a stored game and persist the report; ValueError for an unknown game."""
+        start = time.perf_counter()
+        game = await asyncio.to_thread(self.db.get_game, game_id)
+        if not game:
+            raise ValueError(f"Unknown game: {game_id}")
+        moves = await asyncio.to_thread(self.db.get_moves, game_id)
+
+        # positions[i] is the position before ply i+1; each move row stores the fen after it
+        positions = [chess.Board(start_fen)] + [chess.Board(m["fen"]) for m in moves]
+        analyses = await self.ai_service.analyze_batch_async([(board, None) for board in positions])
+
+        report = self.build_report(game_id, positions, moves, analyses)
+        elapsed = time.perf_counter() - start
+        report["elapsed_ms"] = round(elapsed * 1000, 2)
+        report["plies_per_second"] = round(len(moves) / elapsed, 2) if elapsed > 0 and moves else 0.0
+        await asyncio.to_thread(self.db.save_game_review, game_id, game["move_count"], report)
+        return report
+
+    def build_report(self, game_id: str, positions: list, moves: list, analyses: list) -> dict:
+        evals = [None if isinstance(a, Exception) else a["eval"] for a in analyses]
+
+        plies = []
+        totals = {color: {"moves": 0, "loss": 0.0, "inaccuracy": 0, "mistake": 0, "blunder": 0} for color in ("white", "black")}
+        for i, move in enumerate(moves):
+            board = positions[i]
+            color = "white" if board.turn == chess.WHITE else "black"
+            try:
+                mv = chess.Move.from_uci(move["uci"])
+                san = board.san(mv)
+            except Exception:
+                san = move["uci"]
+            before, after = evals[i], evals[i + 1]
+            entry = {
+                "move_no": move["move_no"],
+                "uci": move["uci"],
+                "san": san,
+                "color": color,
+                "eval_before": before,
+                "eval_after": after,
+                "loss": None,
+                "classification": None,
+                "best": self._best_move(analyses[i])
+            }
+            if before is not None and after is not None:
+                delta = _clamp(after) - _clamp(before)
+                loss = max(0.0, -delta if color == "white" else delta)
+                label = classify_loss(loss, self.thresholds)
+                entry["loss"] = round(loss, 1)
+                entry["classification"] = label
+                totals[color]["moves"] += 1
+                totals[color]["loss"] += loss
+                if label:
+                    totals[color][label] += 1
+            plies.append(entry)
+
+        summary = {}
+        for color, t in totals.items():
+            summary[color] = {
+                "inaccuracies": t["inaccuracy"],
+                "mistakes": t["mistake"],
+                "blunders": t["blunder"],
+                "average_loss": round(t["loss"] / t["moves"], 1) if t["moves"] else 0.0
+            }
+        return {"game_id": game_id, "plies": plies, "summary": summary, "thresholds": self.thresholds}
+
+    @staticmethod
+    def _best_move(analysis):
+        if isinstance(analysis, Exception) or not analysis or not analysis.get("suggestions"):
+            return None
+        best = analysis["suggestions"][0]
+        return {"uci": best.get("uci"), "san": best.get("san")}
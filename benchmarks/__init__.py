@@ -0,0 +1,6 @@
+# Benchmarks for hot paths. Run from the repository root, e.g.:
+#   python -m benchmarks.bench_encoder
+# The regression check over all ai/ hot paths compares with benchmarks/baseline.json,
+# a machine-specific file (not committed) recorded first with --save-baseline;
+# comparing without one exits with status 2:
+#   python -m benchmarks.suite [--save-baseline]
@@ -0,0 +1,56 @@
+# benchmarks/bench_db.py
+"""
+DatabaseService throughput for the DB work of one /game/move request
+(get_game + add_move + get_moves), on a throwaway database file.
+
+Usage:
+    python -m benchmarks.bench_db [--games 20] [--plies 40] [--threads 1]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+import chess
+from backend.services.database_service import DatabaseService
+
+
+def play_game(db, plies):
+    game_id = str(uuid.uuid4())
+    board = chess.Board()
+    db.create_game(game_id, board.fen(), "local", "white", "black")
+    for _ in range(plies):
+        if board.is_game_over():
+            break
+        move = next(iter(board.legal_moves))
+        db.get_game(game_id)
+        board.push(move)
+        db.add_move(game_id, move.uci(), board.fen())
+        db.get_moves(game_id)
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseService(os.path.join(tmp, "bench.sqlite3"))
+        per_thread = max(1, args.games // args.threads)
+        threads = [threading.Thread(target=lambda: [play_game(db, args.plies) for _ in range(per_thread)]) for _ in range(args.threads)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        moves = per_thread * args.threads * args.plies
+        print(f"{moves} moves in {elapsed:.2f}s -> {moves / elapsed:.0f} moves/s ({args.threads} thread(s))")
+        if hasattr(db, "close"):
+            db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--plies", type=int, default=40)
+    parser.add_argument("--threads", type=int, default=1)
+    main(parser.parse_args())
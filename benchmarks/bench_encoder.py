@@ -0,0 +1,57 @@
+# benchmarks/bench_encoder.py
+"""
+Per-node cost of encoding child positions:
+- full:        board.push(mv); encode_board_features(board); board.pop()
+- incremental: IncrementalFeatureEncoder.features_after(mv)
+
+Usage:
+    python -m benchmarks.bench_encoder [--repeat 20]
+"""
+
+import argparse
+import time
+import chess
+from ai.utils import encode_board_features
+from ai.feature_encoder import IncrementalFeatureEncoder
+
+FENS = {
+    "opening": "rnbqkb1r/pppp1ppp/5n2/4p3/2B1P3/8/PPPP1PPP/RNBQK1NR w KQkq - 2 3",
+    "middlegame": "r1bq1rk1/pp2bppp/2n1pn2/2pp4/3P4/2PBPN2/PP1N1PPP/R1BQ1RK1 w - - 0 8",
+    "endgame": "8/5pk1/6p1/3R4/1r6/6P1/5PKP/8 w - - 0 40",
+}
+
+
+def bench_full(board, moves, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for mv in moves:
+            board.push(mv)
+            encode_board_features(board)
+            board.pop()
+    return time.perf_counter() - start
+
+
+def bench_incremental(board, moves, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        enc = IncrementalFeatureEncoder(board)
+        for mv in moves:
+            enc.features_after(mv)
+    return time.perf_counter() - start
+
+
+def main(args):
+    print(f"{'position':<12}{'nodes':>8}{'full us/node':>15}{'incr us/node':>15}{'speedup':>10}")
+    for name, fen in FENS.items():
+        board = chess.Board(fen)
+        moves = list(board.legal_moves)
+        nodes = len(moves) * args.repeat
+        full = bench_full(board, moves, args.repeat)
+        incr = bench_incremental(board, moves, args.repeat)
+        print(f"{name:<12}{nodes:>8}{full / nodes * 1e6:>15.1f}{incr / nodes * 1e6:>15.1f}{full / incr:>9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over all legal moves per position")
+    main(parser.parse_args())
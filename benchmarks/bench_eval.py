@@ -0,0 +1,75 @@
+# benchmarks/bench_eval.py
+"""
+Nodes per second of the fallback material evaluation over the child positions of a
+few reference positions:
+- legacy:  per-piece-type len(board.pieces()) + len(list(board.legal_moves))
+- scalar:  bitboard_eval.evaluate(board), one position at a time
+- batched: bitboard_eval.evaluate_batch(boards), bitboards extracted + NumPy scoring
+- numpy:   bitboard_eval.evaluate_bitboards(bb) on pre-extracted bitboards only
+
+Usage:
+    python -m benchmarks.bench_eval [--repeat 50]
+"""
+
+import argparse
+import time
+import chess
+import numpy as np
+from ai import bitboard_eval
+from benchmarks.bench_encoder import FENS
+
+
+def legacy_eval(board):
+    # the previous Evaluator._material_eval
+    values = {chess.PAWN: 100, chess.KNIGHT: 320, chess.BISHOP: 330, chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 20000}
+    score = 0
+    for ptype, val in values.items():
+        score += len(board.pieces(ptype, chess.WHITE)) * val
+        score -= len(board.pieces(ptype, chess.BLACK)) * val
+    score += int(0.1 * len(list(board.legal_moves)))
+    return score
+
+
+def child_boards(fen):
+    board = chess.Board(fen)
+    children = []
+    for mv in board.legal_moves:
+        board.push(mv)
+        children.append(board.copy(stack=False))
+        board.pop()
+    return children
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return time.perf_counter() - start
+
+
+def main(args):
+    boards = [b for fen in FENS.values() for b in child_boards(fen)]
+    nodes = len(boards) * args.repeat
+    bb = bitboard_eval.board_bitboards(boards)
+    assert np.array_equal(bitboard_eval.evaluate_bitboards(bb), [bitboard_eval.evaluate(b) for b in boards])
+    results = {
+        "legacy": timed(lambda: [legacy_eval(b) for b in boards], args.repeat),
+        "scalar": timed(lambda: [bitboard_eval.evaluate(b) for b in boards], args.repeat),
+        "batched": timed(lambda: bitboard_eval.evaluate_batch(boards), args.repeat),
+        "numpy": timed(lambda: bitboard_eval.evaluate_bitboards(bb), args.repeat),
+    }
+    print(f"{len(boards)} positions x {args.repeat}")
+    print(f"{'path':<10}{'nodes/s':>14}{'us/node':>10}{'vs legacy':>11}")
+    for name, elapsed in results.items():
+        print(f"{name:<10}{nodes / elapsed:>14,.0f}{elapsed / nodes * 1e6:>10.2f}{results['legacy'] / elapsed:>10.1f}x")
+
+    # one large batch, e.g. scoring a whole PGN's positions
+    big = np.tile(bb, (max(1, 10000 // len(bb)), 1))
+    elapsed = timed(lambda: bitboard_eval.evaluate_bitboards(big), 5)
+    print(f"numpy, {len(big)} positions per call: {len(big) * 5 / elapsed:,.0f} nodes/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50, help="Passes over all child positions")
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+# benchmarks/bench_forest.py
+"""
+sklearn forest vs the array runtime (ai/forest_runtime.py):
+- load:   joblib.load(pickle) vs load_forest(export)
+- single: one predict call on one feature row (the per-request evaluate_board path)
+- batch:  one predict call over all child positions of a reference position
+
+Uses the trained models in --models_dir when present, else fits forests with the
+train_model settings on a synthetic dataset. Predictions are checked to be identical.
+
+Usage:
+    python -m benchmarks.bench_forest [--models_dir models] [--repeat 200]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+from ai.forest_runtime import flatten_forest, forest_path, load_forest, save_forest
+from ai.utils import encode_boards_features
+from benchmarks.bench_encoder import FENS
+from benchmarks.bench_eval import child_boards
+from models.train_model import build_datasets, generate_synthetic_dataset
+
+
+def fit_models(n):
+    X, y_eval, y_label = build_datasets(generate_synthetic_dataset(n=n))
+    reg = RandomForestRegressor(n_estimators=100, random_state=42).fit(X, y_eval)
+    clf = RandomForestClassifier(n_estimators=100, random_state=42).fit(X, y_label)
+    return {"move_evaluator": reg, "strategy_recommender": clf}
+
+
+def latencies(fn, repeat):
+    out = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - start)
+    return out
+
+
+def main(args):
+    models = {}
+    for name in ("move_evaluator", "strategy_recommender"):
+        path = os.path.join(args.models_dir, f"{name}.pkl")
+        if os.path.exists(path):
+            models[name] = joblib.load(path)
+    if len(models) < 2:
+        print(f"No trained models in {args.models_dir}: fitting on {args.samples} synthetic positions")
+        models = fit_models(args.samples)
+
+    X = encode_boards_features([b for fen in FENS.values() for b in child_boards(fen)])
+    row = X[:1]
+    tmp = tempfile.mkdtemp()
+    print(f"{'model':<22}{'path':<10}{'load ms':>10}{'p50 us':>10}{'p99 us':>10}{'batch us/row':>14}")
+    for name, model in models.items():
+        pkl = os.path.join(tmp, f"{name}.pkl")
+        joblib.dump(model, pkl)
+        save_forest(flatten_forest(model), forest_path(pkl))
+        forest = load_forest(forest_path(pkl))
+        assert np.array_equal(forest.predict(X), model.predict(X))
+
+        runs = {
+            "sklearn": (lambda: joblib.load(pkl), model),
+            "arrays": (lambda: load_forest(forest_path(pkl)), forest),
+        }
+        for label, (load, m) in runs.items():
+            load_ms = min(latencies(load, 5)) * 1e3
+            single = sorted(latencies(lambda: m.predict(row), args.repeat))
+            batch = min(latencies(lambda: m.predict(X), 10)) / len(X)
+            print(f"{name:<22}{label:<10}{load_ms:>10.2f}{statistics.median(single) * 1e6:>10.0f}"
+                  f"{single[int(len(single) * 0.99) - 1] * 1e6:>10.0f}{batch * 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models_dir", type=str, default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models"))
+    parser.add_argument("--samples", type=int, default=2000, help="Synthetic positions when no trained models exist")
+    parser.add_argument("--repeat", type=int, default=200, help="Single-row predict calls per model")
+    main(parser.parse_args())
@@ -0,0 +1,321 @@
+# benchmarks/suite.py
+"""
+Microbenchmark suite for the ai/ hot paths, with a stored baseline.
+
+Every case runs over the fixed CORPUS (opening, middlegame and endgame positions):
+- encode_board_features          one encoding per position
+- move_type_label                one label per legal move
+- evaluate_board.<tier>          Evaluator.evaluate_board on the material, model,
+                                 engine (stub engine: wrapper cost only) and cache-hit tiers
+- suggest_moves.<path>           Recommender.suggest_moves: one-ply material / model
+                                 scoring and the depth-2 fallback search
+- generate_feedback              FeedbackGenerator.generate_feedback
+- db.add_move                    DatabaseService.add_move on a throwaway database
+
+The model tier uses a forest fitted on a seeded synthetic dataset, never the
+trained models in models/, so the numbers only move when the code does.
+
+Each case is timed in `rounds` rounds of at least `min_time` seconds; the median and
+the best (min) time per operation are reported and saved as JSON. With a baseline,
+a case is flagged when BOTH its best and its median time are more than `tolerance`
+slower than the baseline's; a flagged case is timed again up to `reruns` times and
+only fails if every run is flagged, in which case the process exits with status 1.
+Comparing without a baseline exits with status 2, so a missing file can't pass the check.
+One noisy round moves at most one of the two statistics, and a load spike rarely
+lasts across the re-runs.
+
+Baselines are machine-specific, so none is committed (benchmarks/baseline.json is
+git-ignored): record one on the machine that runs the check, from the commit being
+compared against, e.g. in CI:
+    git checkout <base> && python -m benchmarks.suite --save-baseline
+    git checkout <head> && python -m benchmarks.suite
+
+Usage:
+    python -m benchmarks.suite                                  # compare with benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline                  # record a new baseline
+    python -m benchmarks.suite --out results.json --tolerance 0.3 --filter evaluate
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+import chess
+import chess.engine
+import numpy as np
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+CORPUS = {
+    "opening": [
+        "rnbqkb1r/pppp1ppp/5n2/4p3/2B1P3/8/PPPP1PPP/RNBQK1NR w KQkq - 2 3",
+        "r1bqkbnr/pp1ppppp/2n5/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+    ],
+    "middlegame": [
+        "r1bq1rk1/pp2bppp/2n1pn2/2pp4/3P4/2PBPN2/PP1N1PPP/R1BQ1RK1 w - - 0 8",
+        "r2q1rk1/1b2bppp/p1n1pn2/1pp5/3P4/1BN1PN2/PP3PPP/R1BQR1K1 w - - 0 11",
+    ],
+    "endgame": [
+        "8/5pk1/6p1/3R4/1r6/6P1/5PKP/8 w - - 0 40",
+        "8/8/4k3/3p4/3P1K2/8/8/8 w - - 0 50",
+    ],
+}
+
+
+def corpus_boards() -> list:
+    return [chess.Board(fen) for fens in CORPUS.values() for fen in fens]
+
+
+class _StubEngine:
+    """Engine service answering instantly: times the Evaluator's engine tier without a search."""
+    available = True
+
+    def analyze(self, board, limit=0.05):
+        return {"score": chess.engine.PovScore(chess.engine.Cp(20), chess.WHITE), "depth": 12}
+
+
+_forest = None
+
+
+def synthetic_forest():
+    """ForestModel regressor fitted on seeded random positions (shared by the model cases)."""
+    global _forest
+    if _forest is None:
+        import random
+        from sklearn.ensemble import RandomForestRegressor
+        from ai.forest_runtime import flatten_forest
+        from ai.utils import encode_boards_features
+        rng = random.Random(0)
+        boards = []
+        for _ in range(600):
+            board = chess.Board()
+            for _ in range(rng.randint(0, 40)):
+                moves = list(board.legal_moves)
+                if not moves:
+                    break
+                board.push(rng.choice(moves))
+            boards.append(board)
+        X = encode_boards_features(boards)
+        y = X[:, :6].sum(axis=1) * 100 - X[:, 6:12].sum(axis=1) * 100
+        _forest = flatten_forest(RandomForestRegressor(n_estimators=50, random_state=0).fit(X, y))
+    return _forest
+
+
+def _evaluator(tier: str):
+    from ai.evaluator import Evaluator
+    from ai.model_registry import ModelRegistry
+    cache = 4096 if tier == "cached" else 0
+    ev = Evaluator(_StubEngine() if tier == "engine" else None, {"eval_cache_size": cache}, registry=ModelRegistry())
+    ev.model = synthetic_forest() if tier in ("model", "cached") else None
+    return ev
+
+
+def case_encode_board_features():
+    from ai.utils import encode_board_features
+    boards = corpus_boards()
+    return lambda: [encode_board_features(b) for b in boards], len(boards)
+
+
+def case_move_type_label():
+    from ai.utils import move_type_label
+    pairs = [(b, mv) for b in corpus_boards() for mv in b.legal_moves]
+    return lambda: [move_type_label(b, mv) for b, mv in pairs], len(pairs)
+
+
+def _case_evaluate(tier):
+    def build():
+        ev = _evaluator(tier)
+        boards = corpus_boards()
+        if tier == "cached":
+            for b in boards:
+                ev.evaluate_board(b)
+        return lambda: [ev.evaluate_board(b) for b in boards], len(boards)
+    return build
+
+
+def _case_suggest(depth, model):
+    def build():
+        from ai.recommender import Recommender
+        from ai.model_registry import ModelRegistry
+        ev = _evaluator("model" if model else "material")
+        # a generous time budget: the search always completes its depth
+        rec = Recommender(ev, {"suggestion_count": 3, "fallback_search_depth": depth, "fallback_search_time": 30.0}, registry=ModelRegistry())
+        rec.model = None
+        boards = corpus_boards()
+        return lambda: [rec.suggest_moves(b, use_engine=False) for b in boards], len(boards)
+    return build
+
+
+def case_generate_feedback():
+    from ai.feedback_generator import FeedbackGenerator
+    gen = FeedbackGenerator()
+    samples = []
+    for board in corpus_boards():
+        move = min(board.legal_moves, key=lambda m: m.uci())
+        after = board.copy()
+        after.push(move)
+        suggestions = [{"san": "Nf3", "comment": "Develops a minor piece."}]
+        samples.append((after, move.uci(), 35.0, suggestions))
+    return lambda: [gen.generate_feedback(b, last_move=mv, eval_score=ev, suggestions=s) for b, mv, ev, s in samples], len(samples)
+
+
+def case_db_add_move():
+    from backend.services.database_service import DatabaseService
+    tmp = tempfile.mkdtemp()
+    db = DatabaseService(os.path.join(tmp, "bench.sqlite3"))
+    game_id = str(uuid.uuid4())
+    db.create_game(game_id, chess.STARTING_FEN, "local", "white", "black")
+    fens = [b.fen() for b in corpus_boards()]
+
+    def cleanup():
+        db.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    return lambda: [db.add_move(game_id, "e2e4", fen) for fen in fens], len(fens), cleanup
+
+
+CASES = {
+    "encode_board_features": case_encode_board_features,
+    "move_type_label": case_move_type_label,
+    "evaluate_board.material": _case_evaluate("material"),
+    "evaluate_board.model": _case_evaluate("model"),
+    "evaluate_board.engine": _case_evaluate("engine"),
+    "evaluate_board.cached": _case_evaluate("cached"),
+    "suggest_moves.one_ply": _case_suggest(0, model=False),
+    "suggest_moves.one_ply_model": _case_suggest(0, model=True),
+    "suggest_moves.search_d2": _case_suggest(2, model=False),
+    "suggest_moves.search_d2_model": _case_suggest(2, model=True),
+    "generate_feedback": case_generate_feedback,
+    "db.add_move": case_db_add_move,
+}
+
+
+def time_case(build, rounds: int = 20, min_time: float = 0.02) -> dict:
+    """
+    Median / min microseconds per operation over `rounds` rounds of >= min_time seconds.
+    build() returns (fn, ops) or (fn, ops, cleanup); cleanup() runs once timing is done.
+    """
+    fn, ops, *cleanup = build()
+    try:
+        fn()    # warm up caches and lazy imports
+        start = time.perf_counter()
+        fn()
+        single = max(time.perf_counter() - start, 1e-9)
+        number = max(1, int(min_time / single))
+        per_op = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            per_op.append((time.perf_counter() - start) / (number * ops) * 1e6)
+    finally:
+        for done in cleanup:
+            done()
+    return {"median_us": statistics.median(per_op), "min_us": min(per_op), "ops": ops, "number": number, "rounds": rounds}
+
+
+def run(names=None, rounds: int = 20, min_time: float = 0.02) -> dict:
+    results = {}
+    for name, build in CASES.items():
+        if names is None or name in names:
+            results[name] = time_case(build, rounds, min_time)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "numpy": np.__version__,
+            "chess": chess.__version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25) -> list:
+    """
+    [(case, baseline_us, current_us, ratio)] (best times) of the cases whose best AND
+    median times are both slower than the baseline's by more than `tolerance`.
+    """
+    regressions = []
+    for name, cur in results["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        ratio = cur["min_us"] / base["min_us"]
+        if ratio > 1.0 + tolerance and cur["median_us"] / base["median_us"] > 1.0 + tolerance:
+            regressions.append((name, base["min_us"], cur["min_us"], ratio))
+    return regressions
+
+
+def confirm(regressions: list, baseline: dict, tolerance: float = 0.25, reruns: int = 2, rounds: int = 20, min_time: float = 0.02) -> list:
+    """The regressions still flagged after timing each flagged case again up to `reruns` times."""
+    confirmed = []
+    for regression in regressions:
+        name = regression[0]
+        for _ in range(reruns):
+            again = compare({"results": {name: time_case(CASES[name], rounds, min_time)}}, baseline, tolerance)
+            if not again:
+                print(f"{name}: not slower when timed again, ignored")
+                break
+            regression = again[0]
+        else:
+            confirmed.append(regression)
+    return confirmed
+
+
+def print_report(results: dict, baseline: dict = None):
+    print(f"{'case':<30}{'median us':>12}{'min us':>10}{'base min':>11}{'ratio':>8}")
+    for name, cur in results["results"].items():
+        base = (baseline or {}).get("results", {}).get(name)
+        base_col = f"{base['min_us']:>11.1f}{cur['min_us'] / base['min_us']:>8.2f}" if base else f"{'-':>11}{'-':>8}"
+        print(f"{name:<30}{cur['median_us']:>12.1f}{cur['min_us']:>10.1f}{base_col}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", type=str, default=BASELINE_PATH, help="Baseline JSON to compare with / write")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--out", type=str, default=None, help="Also write the results JSON here")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a case fails (0.25 = 25%%)")
+    parser.add_argument("--filter", type=str, default=None, help="Only cases whose name contains this")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--min_time", type=float, default=0.02, help="Minimum seconds per round")
+    parser.add_argument("--reruns", type=int, default=2, help="Times a flagged case is timed again before it fails")
+    args = parser.parse_args(argv)
+
+    names = [n for n in CASES if args.filter in n] if args.filter else None
+    results = run(names, rounds=args.rounds, min_time=args.min_time)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        print_report(results)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print("Saved baseline:", args.baseline)
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if baseline is None:
+        print("No baseline at", args.baseline, "(record one with --save-baseline)")
+        return 2
+    regressions = confirm(compare(results, baseline, args.tolerance), baseline, args.tolerance, args.reruns, args.rounds, args.min_time)
+    for name, base_us, cur_us, ratio in regressions:
+        print(f"REGRESSION {name}: {base_us:.1f} us -> {cur_us:.1f} us ({ratio:.2f}x, tolerance {1 + args.tolerance:.2f}x)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# models/feature_store.py
+"""
+On-disk feature store for training.
+
+Labeled JSON-lines shards (models/labeling.py) are encoded once into .npy parts:
+    <root>/parts/<source>-<start>.X.npy        float32 (rows, N_FEATURES)
+    <root>/parts/<source>-<start>.y_eval.npy   float32 (rows,)
+    <root>/parts/<source>-<start>.y_label.npy  int8    (rows,)
+and recorded in <root>/manifest.json together with the feature version
+(ai.utils.FEATURE_VERSION, N_FEATURES) and, per source shard, the byte ranges that
+were encoded.
+
+update() is incremental: label shards are append-only, so only the bytes added
+since the last update are encoded. They are read line by line and written out as a
+new part every PART_ROWS rows, so an update never holds more than one part in RAM;
+each part is named after the byte offset it starts at. A source is re-encoded from
+scratch when it shrank, or when the bytes already encoded changed (rewritten in
+place or replaced by a file at least as long): the manifest keeps a SHA-1 of the
+first and last 4 KiB of the encoded range, which is checked before appending.
+Parts written with another feature version are stale as well.
+
+load(sources) concatenates the parts of the given label shards (every recorded
+source when None) into one consolidated set of .npy files (written through
+np.lib.format.open_memmap, so the corpus never has to fit in RAM) and returns them
+opened with mmap_mode='r'. The consolidated files are reused until that set of
+parts changes.
+
+Usage:
+    store = FeatureStore("data/features")
+    store.update(["data/labels/stockfish.jsonl"])
+    X, y_eval, y_label = store.load(["data/labels/stockfish.jsonl"])
+"""
+
+import hashlib
+import json
+import os
+import chess
+import numpy as np
+from ai.utils import FEATURE_VERSION, N_FEATURES, encode_board_features, move_type_label, label_to_int
+
+MANIFEST = "manifest.json"
+# bytes at each end of a source's encoded range that its fingerprint covers
+FINGERPRINT_BYTES = 4096
+# rows per .npy part written by update()
+PART_ROWS = 100_000
+
+
+def encode_labeled_row(fen, best_move):
+    """(features, strategy label int) of one labeled position, or None for a bad FEN."""
+    try:
+        board = chess.Board(fen)
+    except Exception:
+        return None
+    # label of the best move, "other" if there is none
+    lbl = "other"
+    if best_move:
+        try:
+            lbl = move_type_label(board, chess.Move.from_uci(best_move))
+        except Exception:
+            lbl = "other"
+    return encode_board_features(board), label_to_int(lbl)
+
+
+class FeatureStore:
+    def __init__(self, root: str):
+        self.root = root
+        self.parts_dir = os.path.join(root, "parts")
+        os.makedirs(self.parts_dir, exist_ok=True)
+        self.manifest = self._read_manifest()
+
+    @property
+    def version(self) -> dict:
+        return {"feature_version": FEATURE_VERSION, "n_features": N_FEATURES}
+
+    def _read_manifest(self) -> dict:
+        path = os.path.join(self.root, MANIFEST)
+        manifest = None
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                manifest = json.load(f)
+        if not manifest or {k: manifest.get(k) for k in self.version} != self.version:
+            # missing, or written by another feature encoder: every part is stale
+            if manifest:
+                print(f"[FeatureStore] feature version changed ({manifest.get('feature_version')} -> {FEATURE_VERSION}), rebuilding")
+                self._remove_parts(p for src in manifest.get("sources", {}).values() for p in src["parts"])
+            manifest = dict(self.version, sources={}, consolidated=None)
+        return manifest
+
+    def _write_manifest(self):
+        tmp = os.path.join(self.root, MANIFEST + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, os.path.join(self.root, MANIFEST))
+
+    def update(self, label_shards) -> int:
+        """Encode what is new in the given label shards; returns the number of rows added."""
+        added = 0
+        for shard in label_shards:
+            shard = os.path.abspath(shard)
+            if not os.path.exists(shard):
+                continue
+            size = os.path.getsize(shard)
+            source = self.manifest["sources"].get(shard)
+            if source is not None and (size < source["end"] or _fingerprint(shard, source["end"]) != source.get("fingerprint")):
+                # shard was truncated, rewritten or replaced: start over
+                print(f"[FeatureStore] {shard} changed before byte {source['end']}, re-encoding")
+                self._remove_parts(source["parts"])
+                source = None
+            if source is None:
+                source = {"end": 0, "rows": 0, "parts": [], "fingerprint": _fingerprint(shard, 0)}
+                self.manifest["sources"][shard] = source
+            if size > source["end"]:
+                for part, rows, end in self._encode_parts(shard, source["end"]):
+                    if part is not None:
+                        source["parts"].append(part)
+                        source["rows"] += rows
+                        added += rows
+                    source["end"] = end
+                    source["fingerprint"] = _fingerprint(shard, end)
+                    # the manifest is rewritten after every part, so an interrupted
+                    # update keeps what it encoded
+                    self._write_manifest()
+        return added
+
+    def _encode_parts(self, shard: str, start: int):
+        """
+        Yield (part name or None, rows, end offset) for every PART_ROWS rows of complete
+        lines from byte `start` on; the last yield covers the remainder.
+        """
+        X, y_eval, y_label = [], [], []
+        part_start = end = start
+        with open(shard, "rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # a line still being written is picked up next time
+                    break
+                end += len(line)
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                encoded = self._encode_record(rec)
+                if encoded is None:
+                    continue
+                feat, label = encoded
+                X.append(feat)
+                y_eval.append(rec.get("eval") or 0.0)
+                y_label.append(label)
+                if len(X) >= PART_ROWS:
+                    yield self._write_part(shard, part_start, X, y_eval, y_label), len(X), end
+                    X, y_eval, y_label = [], [], []
+                    part_start = end
+        if X or end > part_start:
+            yield (self._write_part(shard, part_start, X, y_eval, y_label) if X else None), len(X), end
+
+    def _write_part(self, shard: str, start: int, X, y_eval, y_label) -> str:
+        name = f"{os.path.splitext(os.path.basename(shard))[0]}-{hashlib.sha1(shard.encode()).hexdigest()[:8]}-{start}"
+        np.save(self._part_path(name, "X"), np.asarray(X, dtype=np.float32))
+        np.save(self._part_path(name, "y_eval"), np.asarray(y_eval, dtype=np.float32))
+        np.save(self._part_path(name, "y_label"), np.asarray(y_label, dtype=np.int8))
+        return name
+
+    @staticmethod
+    def _encode_record(rec):
+        return encode_labeled_row(rec.get("fen"), rec.get("best"))
+
+    def _part_path(self, name: str, kind: str) -> str:
+        return os.path.join(self.parts_dir, f"{name}.{kind}.npy")
+
+    def _remove_parts(self, names):
+        for name in names:
+            for kind in ("X", "y_eval", "y_label"):
+                try:
+                    os.remove(self._part_path(name, kind))
+                except FileNotFoundError:
+                    pass
+
+    def _sources(self, sources=None) -> list:
+        if sources is None:
+            return list(self.manifest["sources"].values())
+        recorded = self.manifest["sources"]
+        return [recorded[p] for p in (os.path.abspath(s) for s in sources) if p in recorded]
+
+    def parts(self, sources=None) -> list:
+        """Part names of the given label shards (every recorded source when None)."""
+        return [p for src in self._sources(sources) for p in src["parts"]]
+
+    def rows(self, sources=None) -> int:
+        return sum(src["rows"] for src in self._sources(sources))
+
+    def load(self, sources=None):
+        """
+        (X, y_eval, y_label) as read-only memory maps over the consolidated arrays of
+        the given label shards (every recorded source when None), or (None, None, None).
+        """
+        parts = self.parts(sources)
+        if not parts:
+            return None, None, None
+        paths = {kind: os.path.join(self.root, f"all.{kind}.npy") for kind in ("X", "y_eval", "y_label")}
+        signature = hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+        if self.manifest.get("consolidated") != signature or not all(os.path.exists(p) for p in paths.values()):
+            self._consolidate(parts, paths)
+            self.manifest["consolidated"] = signature
+            self._write_manifest()
+        return tuple(np.load(paths[kind], mmap_mode="r") for kind in ("X", "y_eval", "y_label"))
+
+    def _consolidate(self, parts: list, paths: dict):
+        for kind, path in paths.items():
+            arrays = [np.load(self._part_path(name, kind), mmap_mode="r") for name in parts]
+            total = sum(len(a) for a in arrays)
+            out = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=arrays[0].dtype, shape=(total,) + arrays[0].shape[1:])
+            pos = 0
+            for a in arrays:
+                out[pos:pos + len(a)] = a
+                pos += len(a)
+            out.flush()
+            del out
+            os.replace(path + ".tmp", path)
+
+
+def _fingerprint(path: str, end: int) -> str:
+    """SHA-1 of the first and last FINGERPRINT_BYTES of path[:end]."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        h.update(f.read(min(end, FINGERPRINT_BYTES)))
+        if end > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, end - FINGERPRINT_BYTES))
+            h.update(f.read(end - f.tell()))
+    return h.hexdigest()
@@ -0,0 +1,169 @@
+# models/ingest.py
+"""
+Parallel, streaming position sampling from PGN files.
+
+Every PGN file is split into byte ranges of about `chunk_bytes` that start at a game
+boundary (a line beginning with "[Event "), and the ranges are parsed by a pool of
+worker processes. Each worker reads its range with chess.pgn.read_game and a
+sampling visitor: headers are not stored, variations are skipped and no
+chess.pgn.Game tree is built; only the sampled (fen, last_move_uci) pairs are sent
+back.
+
+iter_sampled_positions() yields the samples as a generator: ranges are consumed in
+file order and at most `workers * 2` ranges are in flight, so memory stays bounded
+no matter how large the corpus is. The sample of a range is drawn from its own RNG,
+seeded from (seed, file name, range start), so a run is reproducible for the same
+seed and chunk size regardless of the number of workers.
+
+Usage:
+    for fen, last_move in iter_sampled_positions("data/games", max_positions=100000, seed=1):
+        ...
+"""
+
+import io
+import os
+import random
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+import chess
+import chess.pgn
+
+GAME_START = b"[Event "
+DEFAULT_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def split_pgn(path, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> list:
+    """[(path, start, end), ...] byte ranges of `path`, each starting at a game boundary."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    starts = [0]
+    with open(path, "rb") as f:
+        target = chunk_bytes
+        while target < size:
+            f.seek(target)
+            f.readline()    # most likely in the middle of a line
+            boundary = None
+            while True:
+                pos = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if line.startswith(GAME_START):
+                    boundary = pos
+                    break
+            if boundary is None or boundary <= starts[-1]:
+                break
+            starts.append(boundary)
+            target = boundary + chunk_bytes
+    ends = starts[1:] + [size]
+    return [(str(path), start, end) for start, end in zip(starts, ends)]
+
+
+class SamplingVisitor(chess.pgn.BaseVisitor):
+    """
+    Collects (fen after the move, move uci) for a random subset of mainline positions
+    of one game: each position is kept with probability `rate`, at most
+    `per_game_limit` per game. Variations are skipped.
+    """
+
+    def __init__(self, rng: random.Random, rate: float = 0.25, per_game_limit: int = 50):
+        self.rng = rng
+        self.rate = rate
+        self.per_game_limit = per_game_limit
+        self.samples = []
+        self.error = None
+        self._move = None
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def visit_move(self, board, move):
+        self._move = move
+
+    def visit_board(self, board):
+        if self._move is None:
+            return   # starting position
+        if len(self.samples) < self.per_game_limit and self.rng.random() < self.rate:
+            self.samples.append((board.fen(), self._move.uci()))
+
+    def handle_error(self, error):
+        self.error = error
+
+    def result(self):
+        # a game with an illegal/unparsable move contributes nothing
+        return [] if self.error is not None else self.samples
+
+
+def chunk_seed(seed: int, path, start: int) -> int:
+    return zlib.crc32(f"{seed}:{os.path.basename(str(path))}:{start}".encode())
+
+
+def sample_chunk(task) -> list:
+    """Worker: parse one byte range and return its sampled positions."""
+    path, start, end, seed, rate, per_game_limit = task
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # ranges start at a line boundary, so decoding the slice on its own is safe
+    handle = io.StringIO(data.decode("utf-8", errors="ignore"))
+    rng = random.Random(chunk_seed(seed, path, start))
+    out = []
+    while True:
+        try:
+            samples = chess.pgn.read_game(handle, Visitor=lambda: SamplingVisitor(rng, rate, per_game_limit))
+        except Exception as e:
+            print("Failed reading PGN", path, "at byte", start, e)
+            break
+        if samples is None:
+            break
+        out.extend(samples)
+    return out
+
+
+def pgn_tasks(games_dir, seed: int = 0, rate: float = 0.25, per_game_limit: int = 50, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+    for pgn_file in sorted(Path(games_dir).glob("*.pgn")):
+        for path, start, end in split_pgn(pgn_file, chunk_bytes):
+            yield (path, start, end, seed, rate, per_game_limit)
+
+
+def iter_sampled_positions(games_dir, max_positions: int = None, per_game_limit: int = 50, rate: float = 0.25,
+                           seed: int = 0, workers: int = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+    """
+    Generator of (fen, last_move_uci) sampled from every *.pgn in games_dir, in file
+    order. workers: processes (default CPU count); 1 parses in this process.
+    """
+    if not os.path.exists(games_dir):
+        return
+    tasks = pgn_tasks(games_dir, seed, rate, per_game_limit, chunk_bytes)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        batches = map(sample_chunk, tasks)
+        yield from islice((s for batch in batches for s in batch), max_positions)
+        return
+
+    tasks = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        emitted = 0
+        try:
+            while True:
+                # keep a bounded window of ranges in flight, consumed in order
+                while len(pending) < workers * 2:
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    pending.append(pool.submit(sample_chunk, task))
+                if not pending:
+                    return
+                for s in pending.popleft().result():
+                    yield s
+                    emitted += 1
+                    if max_positions is not None and emitted >= max_positions:
+                        return
+        finally:
+            for fut in pending:
+                fut.cancel()
@@ -0,0 +1,78 @@
+# models/label_store.py
+"""
+Persistent engine-label cache for training runs.
+
+LabelStore is a SQLite table of (position_key, limit) -> (eval, best move), where
+position_key is ai.utils.position_key (FEN without move clocks, so transpositions
+and the same position in different games share a label) and limit describes the
+search settings (see limit_key). A label is only reused for the same settings, so
+changing --engine_time or the depth labels the position again.
+
+labeling.label_positions consults the store before starting any engine and writes
+every new label back, so repeated training runs only pay engine time for positions
+they have not seen before.
+"""
+
+import os
+import sqlite3
+
+
+def limit_key(time_limit: float = None, depth: int = None) -> str:
+    """Canonical string for the engine search limit, e.g. 'time=0.05' or 'depth=12'."""
+    parts = []
+    if depth is not None:
+        parts.append(f"depth={int(depth)}")
+    if time_limit is not None:
+        parts.append(f"time={float(time_limit):g}")
+    return ",".join(parts) or "default"
+
+
+class LabelStore:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS labels (
+                position_key TEXT NOT NULL,
+                search_limit TEXT NOT NULL,
+                eval REAL,
+                best TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (position_key, search_limit)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def get_many(self, keys, limit: str) -> dict:
+        """{position_key: (eval, best)} for the keys that have a label under `limit`."""
+        keys = list(keys)
+        out = {}
+        # stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT position_key, eval, best FROM labels WHERE search_limit=? AND position_key IN ({','.join('?' * len(batch))})",
+                [limit] + batch
+            ).fetchall()
+            for key, eval_cp, best in rows:
+                out[key] = (eval_cp, best)
+        return out
+
+    def put_many(self, rows, limit: str):
+        """rows: iterable of (position_key, eval, best); existing labels are replaced."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO labels (position_key, search_limit, eval, best) VALUES (?, ?, ?, ?)",
+                ((key, limit, eval_cp, best) for key, eval_cp, best in rows)
+            )
+
+    def count(self, limit: str = None) -> int:
+        if limit is None:
+            return self.conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM labels WHERE search_limit=?", (limit,)).fetchone()[0]
+
+    def close(self):
+        self.conn.close()
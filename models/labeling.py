@@ -0,0 +1,301 @@
+# models/labeling.py
+"""
+Parallel engine labeling of sampled positions, checkpointed to an on-disk shard.
+
+label_positions() fans the positions out over `workers` threads, each driving its
+own Stockfish process (the search runs in the engine process, so threads are
+enough to keep N engines busy). Every position costs ONE search: the score gives
+the eval label and pv[0] the best move.
+
+Each result is appended to a JSON-lines shard as soon as it arrives:
+    {"fen": ..., "last_move": ..., "eval": ..., "best": ..., "limit": "time=0.05"}
+where limit is label_store.limit_key of the search settings. Positions already in
+the shard under the same settings are skipped, so a run that was interrupted (crash,
+Ctrl-C) resumes where it stopped; a half-written last line from a crash is dropped.
+Positions are deduplicated by ai.utils.position_key before labeling, and an optional
+LabelStore (models/label_store.py) supplies labels from earlier runs. The result
+holds the labels of the requested positions only, however much else the shard holds.
+
+If an engine cannot be started (or restarted), labeling stops with a RuntimeError
+instead of leaving positions silently unlabeled.
+
+Usage:
+    labeled = label_positions(positions, "/usr/bin/stockfish", "data/labels/labels.jsonl", workers=4)
+"""
+
+import json
+import os
+import queue
+import threading
+import chess
+import chess.engine
+from tqdm import tqdm
+from ai.utils import position_key
+from backend.services.chess_engine_service import score_to_cp
+from models.label_store import limit_key
+
+_DONE = object()
+
+
+class _WorkerError:
+    """Posted by a worker that stopped early (engine could not be started or restarted)."""
+    def __init__(self, error):
+        self.error = error
+
+# positions per label store lookup while the input is streamed
+LOOKUP_BATCH = 256
+
+
+def settings_shard(path: str, limit: str) -> str:
+    """Shard path for one set of search settings: labels.jsonl -> labels.time=0.05.jsonl."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{limit}{ext or '.jsonl'}"
+
+
+def read_shard(path, limit: str = None) -> list:
+    """
+    Labeled tuples (fen, last_move, eval_cp, best_move) stored in a shard; with
+    `limit`, only those searched with these settings (rows without one never match).
+    """
+    out = []
+    if not os.path.exists(path):
+        return out
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue    # partial line written when the previous run died
+            if limit is not None and rec.get("limit") != limit:
+                continue
+            out.append((rec["fen"], rec.get("last_move"), rec.get("eval"), rec.get("best")))
+    return out
+
+
+def _drop_partial_line(path):
+    """Cut a half-written last line (from a crash) so new records start on a fresh line."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # scan back to the last complete line
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            idx = chunk.rfind(b"\n")
+            if idx != -1:
+                f.truncate(pos - step + idx + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+def analyse_position(engine, board: chess.Board, limit: chess.engine.Limit):
+    """One search -> (eval_cp from White's view, best move uci or None)."""
+    info = engine.analyse(board, limit)
+    eval_cp = score_to_cp(info.get("score"))
+    pv = info.get("pv")
+    best = pv[0].uci() if pv else None
+    return (eval_cp if eval_cp is not None else 0.0), best
+
+
+class _Worker(threading.Thread):
+    def __init__(self, stockfish_path, limit, tasks, results, threads=1, hash_mb=16):
+        super().__init__(daemon=True)
+        self.stockfish_path = stockfish_path
+        self.limit = limit
+        self.tasks = tasks
+        self.results = results
+        self.options = {"Threads": threads, "Hash": hash_mb}
+
+    def run(self):
+        engine = None
+        try:
+            engine = self._spawn()
+            while True:
+                task = self.tasks.get()
+                if task is _DONE:
+                    break
+                key, fen, last_move = task
+                try:
+                    eval_cp, best = analyse_position(engine, chess.Board(fen), self.limit)
+                except chess.engine.EngineTerminatedError:
+                    # engine died: restart it and retry this position once
+                    engine = self._spawn()
+                    try:
+                        eval_cp, best = analyse_position(engine, chess.Board(fen), self.limit)
+                    except Exception:
+                        eval_cp, best = None, None
+                except Exception:
+                    eval_cp, best = None, None
+                self.results.put((key, fen, last_move, eval_cp, best))
+        except Exception as e:
+            print("[labeling] worker failed:", e)
+            self.results.put(_WorkerError(e))
+        finally:
+            self.results.put(_DONE)
+            if engine is not None:
+                try:
+                    engine.quit()
+                except Exception:
+                    pass
+
+    def _spawn(self):
+        engine = chess.engine.SimpleEngine.popen_uci(self.stockfish_path)
+        options = {k: v for k, v in self.options.items() if k in engine.options}
+        if options:
+            engine.configure(options)
+        return engine
+
+
+def label_positions(positions, stockfish_path, shard_path, workers: int = None, time_limit: float = 0.05,
+                    depth: int = None, threads: int = 1, hash_mb: int = 16, store=None) -> list:
+    """
+    Label (fen, last_move) positions with `workers` engines; returns the labeled
+    tuples (fen, last_move, eval_cp, best_move) of the requested positions, one per
+    position_key in request order (labels found in the shard from an earlier run with
+    the same search settings are reused). With a label_store.LabelStore, positions it
+    already knows for these search settings are copied from it without an engine
+    search, and new labels are added to it. Positions whose search failed are not
+    written or returned, so they are retried on the next run.
+    `positions` may be a generator: it is consumed in batches while the engines work.
+    Raises RuntimeError when an engine cannot be started.
+    """
+    workers = max(1, workers or (os.cpu_count() or 1))
+    limit = chess.engine.Limit(time=time_limit, depth=depth)
+    search_limit = limit_key(time_limit, depth)
+    # labels in the shard under these settings, by position: rows from other
+    # settings or other position sets are neither reused nor returned
+    labels = {position_key(chess.Board(row[0])): row for row in read_shard(shard_path, search_limit)}
+    if labels:
+        print(f"Resuming: {len(labels)} positions already labeled in {shard_path} ({search_limit})")
+    seen, requested = set(), []
+
+    os.makedirs(os.path.dirname(os.path.abspath(shard_path)), exist_ok=True)
+    _drop_partial_line(shard_path)
+    with open(shard_path, "a", encoding="utf-8") as shard:
+        def write(key, fen, last_move, eval_cp, best):
+            shard.write(json.dumps({"fen": fen, "last_move": last_move, "eval": eval_cp, "best": best, "limit": search_limit}) + "\n")
+            labels[key] = (fen, last_move, eval_cp, best)
+
+        def pending():
+            """(key, fen, last_move) still to search, as `positions` is read; store hits are written here."""
+            for batch in _batches(positions, LOOKUP_BATCH):
+                todo = []
+                for fen, last_move in batch:
+                    key = position_key(chess.Board(fen))
+                    if key not in seen:
+                        seen.add(key)
+                        requested.append(key)
+                        if key not in labels:
+                            todo.append((key, fen, last_move))
+                if store is not None and todo:
+                    cached = store.get_many([key for key, _, _ in todo], search_limit)
+                    for key, fen, last_move in todo:
+                        if key in cached:
+                            write(key, fen, last_move, *cached[key])
+                    shard.flush()
+                    todo = [t for t in todo if t[0] not in cached]
+                yield from todo
+
+        new_labels = []
+        try:
+            for key, fen, last_move, eval_cp, best in _run_workers(pending(), stockfish_path, limit, workers, threads, hash_mb):
+                write(key, fen, last_move, eval_cp, best)
+                # flushed per result: a crash loses at most the in-flight searches
+                shard.flush()
+                if store is not None:
+                    new_labels.append((key, eval_cp, best))
+                    if len(new_labels) >= 64:
+                        store.put_many(new_labels, search_limit)
+                        new_labels = []
+        finally:
+            if store is not None and new_labels:
+                store.put_many(new_labels, search_limit)
+    return [labels[key] for key in requested if key in labels]
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _run_workers(todo, stockfish_path, limit, workers, threads, hash_mb):
+    """
+    Yield (key, fen, last_move, eval_cp, best) for every successfully searched position.
+    `todo` is consumed lazily in the calling thread; an engine is started per task fed
+    until there are `workers`, so no engine starts when there is nothing to search.
+    Raises RuntimeError as soon as a worker loses its engine for good.
+    """
+    # bounded task queue: positions are fed while the engines work
+    tasks = queue.Queue(maxsize=workers * 4)
+    results = queue.Queue()
+    pool = []
+    running = 0
+
+    def ready(block):
+        nonlocal running
+        while running:
+            try:
+                item = results.get(block=block)
+            except queue.Empty:
+                return
+            if item is _DONE:
+                running -= 1
+                continue
+            if isinstance(item, _WorkerError):
+                raise RuntimeError(f"labeling engine {stockfish_path} failed: {item.error}") from item.error
+            progress.update(1)
+            if item[3] is not None:
+                yield item
+
+    def feed(task):
+        while True:
+            try:
+                tasks.put(task, timeout=0.1)
+                return
+            except queue.Full:
+                # the engines are busy: hand out what they finished meanwhile
+                # (and notice a dead one, which would otherwise block this put forever)
+                yield from ready(block=False)
+
+    try:
+        with tqdm() as progress:
+            for task in todo:
+                if len(pool) < workers:
+                    pool.append(_Worker(stockfish_path, limit, tasks, results, threads, hash_mb))
+                    pool[-1].start()
+                    running += 1
+                yield from feed(task)
+                yield from ready(block=False)
+            for _ in pool:
+                yield from feed(_DONE)
+            yield from ready(block=True)
+    finally:
+        if running:
+            # stopped early (error, or the consumer closed us): drop the queued
+            # positions and let the remaining workers quit their engines
+            while True:
+                try:
+                    tasks.get_nowait()
+                except queue.Empty:
+                    break
+            for _ in pool:
+                try:
+                    tasks.put_nowait(_DONE)
+                except queue.Full:
+                    break
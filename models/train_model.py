@@ -3,10 +3,17 @@
 Training script for:
 - move_evaluator.pkl : RandomForestRegressor predicting a position evaluation (centipawns)
 - strategy_recommender.pkl : RandomForestClassifier predicting move-type labels
+Each is also exported as <name>.forest/ (flat node arrays, see ai/forest_runtime.py),
+which is what the server loads.
 
 Behavior:
 - If STOCKFISH_PATH env var is set (or config/settings.yaml contains engine path),
   the script will use Stockfish to label positions (eval + best move -> label).
+  Engine labels are encoded into the feature store (--feature_dir, see
+  models/feature_store.py) and training reads the features back as memory maps.
+  Training uses the whole label shard of the current --engine_time, i.e. every
+  position labeled with those settings by this and earlier runs, not only the
+  positions sampled this time.
 - Otherwise falls back to generating a small synthetic dataset.
 
 Usage:
@@ -19,21 +26,24 @@ Notes:
 
 import os
 import argparse
-import chess.pgn
+import itertools
 import chess
 import random
 import numpy as np
 import joblib
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
-from tqdm import tqdm
-from pathlib import Path
-from ai.utils import encode_board_features, move_type_label, label_to_int
-import subprocess
-import chess.engine
+from models.ingest import iter_sampled_positions
+from models.labeling import label_positions, settings_shard
+from models.label_store import LabelStore, limit_key
+from models.feature_store import FeatureStore, encode_labeled_row
+from ai.forest_runtime import forest_path, save_forest
 import multiprocessing
 
 DEFAULT_OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models")
 DEFAULT_GAMES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "games")
+DEFAULT_LABEL_SHARD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "labels", "stockfish.jsonl")
+DEFAULT_LABEL_STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "labels", "labels.sqlite3")
+DEFAULT_FEATURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "features")
 STOCKFISH_ENV = os.environ.get("STOCKFISH_PATH", "")
 
 
@@ -61,69 +71,36 @@ def find_stockfish(config_path=None):
             pass
     return None
 
-def sample_positions_from_pgns(games_dir, max_positions=2000, per_game_limit=50):
+def sample_positions_from_pgns(games_dir, max_positions=2000, per_game_limit=50, seed=0, workers=None):
     """
-    Iterate through PGN files and sample positions.
-    Yields (fen, last_move_uci) where fen is board AFTER the move.
+    Sample positions from the PGNs in games_dir (see models/ingest.py: files are split
+    at game boundaries and parsed by a process pool, reproducibly for a given seed).
+    Yields (fen, last_move_uci) where fen is board AFTER the move, as the parser
+    produces them: the labeler consumes them without the sample ever being a list.
     """
-    out = []
-    if not os.path.exists(games_dir):
-        return out
-    for pgn_file in Path(games_dir).glob("*.pgn"):
-        try:
-            with open(pgn_file, "r", encoding="utf-8", errors="ignore") as f:
-                while True:
-                    game = chess.pgn.read_game(f)
-                    if game is None:
-                        break
-                    board = game.board()
-                    count = 0
-                    for move in game.mainline_moves():
-                        board.push(move)
-                        # sample some positions to avoid too many per game
-                        if random.random() < 0.25 and count < per_game_limit:
-                            out.append((board.fen(), move.uci()))
-                            count += 1
-                        if len(out) >= max_positions:
-                            return out
-        except Exception as e:
-            print("Failed reading PGN", pgn_file, e)
-    return out
+    return iter_sampled_positions(
+        games_dir,
+        max_positions=max_positions,
+        per_game_limit=per_game_limit,
+        seed=seed,
+        workers=workers
+    )
 
-def label_positions_with_stockfish(positions, stockfish_path, time_limit=0.05):
+def label_positions_with_stockfish(positions, stockfish_path, time_limit=0.05, shard_path=None, workers=None, store_path=None):
     """
-    For each fen, run Stockfish to get evaluation (cp) and best move.
-    Returns list of tuples (fen, last_move_uci, eval_cp, best_move_uci)
+    Label positions with Stockfish (see models/labeling.py): one search per position
+    gives eval (cp) and best move, spread over `workers` engines, and every result is
+    appended to shard_path so an interrupted run resumes where it stopped. Positions
+    are deduplicated, and labels already in the persistent label store (store_path,
+    keyed by position + search limit) are reused instead of searched again.
+    Returns list of tuples (fen, last_move_uci, eval_cp, best_move_uci) for the
+    given positions only (the shard may hold more from earlier runs).
     """
-    engine = chess.engine.SimpleEngine.popen_uci(stockfish_path)
-    labeled = []
+    store = LabelStore(store_path or DEFAULT_LABEL_STORE)
     try:
-        for fen, last_move in tqdm(positions):
-            board = chess.Board(fen)
-            try:
-                info = engine.analyse(board, chess.engine.Limit(time=time_limit))
-                score = info.get("score")
-                if score is None:
-                    eval_cp = 0.0
-                else:
-                    if score.is_mate():
-                        mate = score.white().mate()
-                        eval_cp = 100000.0 if mate and mate > 0 else -100000.0
-                    else:
-                        eval_cp = float(score.white().cp)
-                # best move
-                try:
-                    mv = engine.play(board, chess.engine.Limit(depth=12))
-                    best = mv.move.uci() if mv and mv.move else None
-                except Exception:
-                    best = None
-            except Exception:
-                eval_cp = 0.0
-                best = None
-            labeled.append((fen, last_move, eval_cp, best))
+        return label_positions(positions, stockfish_path, shard_path or settings_shard(DEFAULT_LABEL_SHARD, limit_key(time_limit)), workers=workers, time_limit=time_limit, store=store)
     finally:
-        engine.quit()
-    return labeled
+        store.close()
 
 
 def generate_synthetic_dataset(n=500):
@@ -167,23 +144,13 @@ def build_datasets(labeled_positions):
     y_eval = []
     y_label = []
     for fen, last_move, eval_cp, best_move in labeled_positions:
-        try:
-            board = chess.Board(fen)
-        except Exception:
+        encoded = encode_labeled_row(fen, best_move)
+        if encoded is None:
             continue
-        feat = encode_board_features(board)
+        feat, label = encoded
         X.append(feat)
         y_eval.append(eval_cp if eval_cp is not None else 0.0)
-        # determine label from best_move if exists
-        if best_move:
-            try:
-                mv = chess.Move.from_uci(best_move)
-                lbl = move_type_label(board, mv)  # label of move (post position should be same)
-            except Exception:
-                lbl = "other"
-        else:
-            lbl = "other"
-        y_label.append(label_to_int(lbl))
+        y_label.append(label)
     if len(X) == 0:
         return None, None, None
     X = np.vstack(X)
@@ -192,6 +159,18 @@ def build_datasets(labeled_positions):
     return X, y_eval, y_label
 
 
+def export_forest(model, model_path):
+    """
+    Write the flattened node arrays of a fitted forest next to its pickle
+    (move_evaluator.pkl -> move_evaluator.forest/, see ai/forest_runtime.py). The
+    Evaluator/Recommender serve the export instead of the pickle: it loads without
+    unpickling and predicts identically with much lower per-call overhead.
+    """
+    path = save_forest(model, forest_path(model_path))
+    print("Exported forest arrays:", path)
+    return path
+
+
 def train_and_save(X, y_eval, y_label, out_dir):
     os.makedirs(out_dir, exist_ok=True)
     # Regressor for evaluation
@@ -200,6 +179,7 @@ def train_and_save(X, y_eval, y_label, out_dir):
     reg_path = os.path.join(out_dir, "move_evaluator.pkl")
     joblib.dump(reg, reg_path)
     print("Saved evaluator:", reg_path)
+    export_forest(reg, reg_path)
 
     # Classifier for strategy label
     clf = RandomForestClassifier(n_estimators=100, n_jobs=max(1, multiprocessing.cpu_count()-1), random_state=42)
@@ -207,20 +187,29 @@ def train_and_save(X, y_eval, y_label, out_dir):
     clf_path = os.path.join(out_dir, "strategy_recommender.pkl")
     joblib.dump(clf, clf_path)
     print("Saved recommender:", clf_path)
+    export_forest(clf, clf_path)
 
 
 def main(args):
     stockfish_path = find_stockfish(args.config)  # attempt config if user provided
     if args.verbose:
         print("Stockfish path:", stockfish_path)
-    positions = []
+    positions = iter(())
     if args.games_dir and os.path.exists(args.games_dir):
         print("Sampling positions from PGNs in", args.games_dir)
-        positions = sample_positions_from_pgns(args.games_dir, max_positions=args.max_positions, per_game_limit=50)
-    if stockfish_path and len(positions) > 0:
+        positions = sample_positions_from_pgns(args.games_dir, max_positions=args.max_positions, per_game_limit=50, seed=args.seed, workers=args.workers)
+    # peek at the stream: only the first sample is read before labeling starts
+    first = next(positions, None)
+    have_positions = first is not None
+    if have_positions:
+        positions = itertools.chain([first], positions)
+    # one shard per search settings: the feature store then only sees comparable labels
+    label_shard = settings_shard(args.label_shard, limit_key(args.engine_time))
+    if stockfish_path and have_positions:
         print("Labeling positions with Stockfish...")
-        labeled = label_positions_with_stockfish(positions, stockfish_path, time_limit=args.engine_time)
-    elif len(positions) > 0:
+        # the labels are appended to label_shard; training reads them back from there
+        label_positions_with_stockfish(positions, stockfish_path, time_limit=args.engine_time, shard_path=label_shard, workers=args.engine_workers, store_path=args.label_store)
+    elif have_positions:
         # No stockfish, but we can still create synthetic labels (cheap)
         print("Stockfish not found. Creating heuristic labels for sampled positions...")
         labeled = []
@@ -246,7 +235,16 @@ def main(args):
         print("No PGN data found. Generating synthetic dataset...")
         labeled = generate_synthetic_dataset(n=args.max_positions)
 
-    X, y_eval, y_label = build_datasets(labeled)
+    if stockfish_path and have_positions:
+        # engine labels live in the shard: encode only what is new and train from memory maps
+        # over everything accumulated in it (earlier runs with the same settings included)
+        store = FeatureStore(args.feature_dir)
+        added = store.update([label_shard])
+        print(f"Feature store: {added} new rows, {store.rows([label_shard])} in {label_shard}")
+        # only this shard: sources recorded by other runs (paths, settings) are left out
+        X, y_eval, y_label = store.load([label_shard])
+    else:
+        X, y_eval, y_label = build_datasets(labeled)
     if X is None:
         print("No training data could be built. Exiting.")
         return
@@ -262,6 +260,12 @@ if __name__ == "__main__":
     parser.add_argument("--config", type=str, default=None, help="Path to config/settings.yaml (optional)")
     parser.add_argument("--max_positions", type=int, default=1000, help="Max sampled positions")
     parser.add_argument("--engine_time", type=float, default=0.05, help="Stockfish analysis time per position (s)")
+    parser.add_argument("--engine_workers", type=int, default=None, help="Parallel Stockfish processes for labeling (default: CPU count)")
+    parser.add_argument("--label_shard", type=str, default=DEFAULT_LABEL_SHARD, help="JSON-lines file labels are appended to (resumed from if present); one file per --engine_time, e.g. stockfish.time=0.05.jsonl")
+    parser.add_argument("--label_store", type=str, default=DEFAULT_LABEL_STORE, help="SQLite cache of engine labels shared across runs")
+    parser.add_argument("--feature_dir", type=str, default=DEFAULT_FEATURE_DIR, help="Feature store (.npy shards + manifest) built from the label shard")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for position sampling")
+    parser.add_argument("--workers", type=int, default=None, help="PGN parsing processes (default: CPU count)")
     parser.add_argument("--verbose", action="store_true")
     args = parser.parse_args()
     main(args)
\ No newline at end of file
@@ -0,0 +1,60 @@
+# scripts/review_game.py
+"""
+Review a stored game from the command line: evaluates every ply (in parallel on the
+engine pool when one is configured), prints the classified moves and the throughput,
+and stores the report like POST /game/{game_id}/review.
+
+Usage:
+    python -m scripts.review_game <game_id> [--db path/to/db.sqlite3] [--json]
+"""
+import argparse
+import asyncio
+import json
+from backend.config import load_config
+from backend.services.ai_service import AIService
+from backend.services.async_engine_service import AsyncChessEngineService
+from backend.services.database_service import DatabaseService, DB_PATH
+from backend.services.game_review_service import GameReviewService
+
+
+async def review(args):
+    config = load_config()
+    db = DatabaseService(args.db)
+    engine = AsyncChessEngineService(config.get('engine', {}))
+    ai_service = AIService(None, config.get('ai', {}), async_engine_service=engine, db=db)
+    reviewer = GameReviewService(db, ai_service, config.get('ai', {}))
+    try:
+        return await reviewer.review_game(args.game_id)
+    finally:
+        await engine.quit()
+        db.close()
+
+
+def main(args):
+    try:
+        report = asyncio.run(review(args))
+    except ValueError as e:
+        print(e)
+        return 1
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    for ply in report["plies"]:
+        prefix = f"{(ply['move_no'] + 1) // 2}." + ("" if ply["color"] == "white" else "..")
+        line = f"{prefix:>6} {ply['san']:<8} eval {ply['eval_after']!s:>9}"
+        if ply["classification"]:
+            best = ply["best"]["san"] if ply["best"] else "?"
+            line += f"  {ply['classification']} (-{ply['loss']:.0f}), best was {best}"
+        print(line)
+    for color, s in report["summary"].items():
+        print(f"{color}: {s['inaccuracies']} inaccuracies, {s['mistakes']} mistakes, {s['blunders']} blunders, avg loss {s['average_loss']}")
+    print(f"{len(report['plies'])} plies in {report['elapsed_ms']:.0f} ms ({report['plies_per_second']} plies/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("game_id")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    raise SystemExit(main(parser.parse_args()))
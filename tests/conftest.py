@@ -0,0 +1,51 @@
+# tests/conftest.py
+import sys
+import pytest
+
+# Minimal UCI engine: answers every "go" at once with depth 1, +12 cp and the first
+# legal move, so engine code paths can be tested without a Stockfish binary.
+FAKE_UCI_ENGINE = r"""
+import sys
+import chess
+board = chess.Board()
+for line in sys.stdin:
+    cmd = line.split()
+    if not cmd:
+        continue
+    if cmd[0] == "uci":
+        print("id name FakeFish 1")
+        print("uciok")
+    elif cmd[0] == "isready":
+        print("readyok")
+    elif cmd[0] == "position":
+        moves = cmd[cmd.index("moves") + 1:] if "moves" in cmd else []
+        board = chess.Board(" ".join(cmd[2:8])) if cmd[1] == "fen" else chess.Board()
+        for mv in moves:
+            board.push_uci(mv)
+    elif cmd[0] == "go":
+        mv = next(iter(board.legal_moves)).uci()
+        print(f"info depth 1 score cp 12 pv {mv}")
+        print(f"bestmove {mv}")
+    elif cmd[0] == "quit":
+        break
+    sys.stdout.flush()
+"""
+
+
+@pytest.fixture(scope="session", autouse=True)
+def test_database(tmp_path_factory):
+    """Point the default DatabaseService path (used by the app's services) at a temp file."""
+    from backend.services import database_service
+    path = str(tmp_path_factory.mktemp("database") / "db.sqlite3")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(database_service, "DB_PATH", path)
+        yield path
+
+
+@pytest.fixture
+def fake_engine(tmp_path):
+    """Path of an executable running FAKE_UCI_ENGINE with this interpreter."""
+    script = tmp_path / "fakefish"
+    script.write_text(f"#!{sys.executable}\n" + FAKE_UCI_ENGINE)
+    script.chmod(0o755)
+    return str(script)
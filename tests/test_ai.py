@@ -23,3 +23,333 @@ def test_evaluator_fallback():
     board = chess.Board()
     val = ev.evaluate_board(board)
     assert isinstance(val, float)
+
+
+class _MultiPVStub:
+    """Engine stand-in that only supports a MultiPV search and counts calls."""
+
+    def __init__(self):
+        self.multipv_calls = 0
+
+    def analyze_multipv(self, board, multipv=3, limit=0.1):
+        self.multipv_calls += 1
+        moves = list(board.legal_moves)[:multipv]
+        return [{"move": mv, "score": None, "cp": 10.0 - i, "pv": [mv], "depth": 10} for i, mv in enumerate(moves)]
+
+    def analyze(self, board, limit=0.1):
+        raise AssertionError("per-move engine search should not run")
+
+    def bestmove(self, board, depth=12):
+        raise AssertionError("separate bestmove search should not run")
+
+
+def test_recommender_uses_single_multipv_search():
+    from ai.recommender import Recommender
+    stub = _MultiPVStub()
+    ev = Evaluator(engine_service=stub, ai_config={})
+    rec = Recommender(ev, {"suggestion_count": 3})
+    suggestions = rec.suggest_moves(chess.Board())
+    assert stub.multipv_calls == 1
+    assert len(suggestions) == 3
+    assert suggestions[0]["score"] == 10.0
+    assert suggestions[0]["pv"] == [suggestions[0]["uci"]]
+
+
+class _FailingMultiPVStub(_MultiPVStub):
+    """MultiPV search that never produces lines; any per-move search is a failure."""
+
+    def __init__(self, result=None):
+        super().__init__()
+        self.result = result
+
+    def analyze_multipv(self, board, multipv=3, limit=0.1):
+        self.multipv_calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def test_failed_multipv_does_not_fan_out_to_per_move_searches():
+    from ai.analysis_pipeline import AnalysisPipeline
+    for result in (None, RuntimeError("engine died")):
+        stub = _FailingMultiPVStub(result)
+        pipeline = AnalysisPipeline(engine_service=stub, ai_config={"suggestion_count": 3})
+        out = pipeline.analyze(chess.Board())
+        assert stub.multipv_calls == 1
+        assert len(out["suggestions"]) == 3
+
+
+def test_evaluate_boards_matches_single_calls():
+    import numpy as np
+    from sklearn.ensemble import RandomForestRegressor
+    from ai.utils import encode_boards_features
+    board = chess.Board()
+    children = []
+    for mv in board.legal_moves:
+        board.push(mv)
+        children.append(board.copy())
+        board.pop()
+    ev = Evaluator(engine_service=None, ai_config={})
+    ev.model = None
+    assert ev.evaluate_boards(children) == [ev.evaluate_board(b) for b in children]
+
+    X = encode_boards_features(children)
+    ev.model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, np.arange(len(children), dtype=float))
+    assert X.shape == (len(children), 22)
+    assert ev.evaluate_boards(children) == [ev.evaluate_board(b) for b in children]
+
+
+def test_incremental_encoder_matches_full_encoder():
+    import numpy as np
+    from ai.feature_encoder import IncrementalFeatureEncoder
+    # position with castling, en passant and a capturing promotion available
+    board = chess.Board("r3k2r/1P3ppp/8/3pP3/8/8/5PPP/R3K2R w KQkq d6 0 20")
+    enc = IncrementalFeatureEncoder(board)
+    for mv in list(board.legal_moves):
+        feat = enc.features_after(mv)
+        board.push(mv)
+        assert np.array_equal(feat, encode_board_features(board)), mv.uci()
+        board.pop()
+    for uci in ["e5d6", "e8g8", "b7a8q", "g8h8"]:
+        enc.push(chess.Move.from_uci(uci))
+        assert np.array_equal(enc.features(), encode_board_features(board)), uci
+    while board.move_stack:
+        enc.pop()
+    assert np.array_equal(enc.features(), encode_board_features(board))
+
+
+def test_eval_cache_lru_and_deeper_result_wins():
+    from ai.eval_cache import EvalCache
+    cache = EvalCache(max_entries=2)
+    cache.put(1, 10.0, "engine", depth=12)
+    cache.put(1, 99.0, "engine", depth=8)      # shallower: ignored
+    cache.put(1, 50.0, "model")                # weaker tier: ignored
+    assert cache.get(1, min_tier="engine") == (10.0, "engine", 12)
+    cache.put(2, 1.0, "material")
+    assert cache.get(2, min_tier="model") is None
+    cache.get(1)
+    cache.put(3, 3.0, "material")              # evicts 2 (least recently used)
+    assert cache.get(2) is None and cache.get(1) is not None
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["evictions"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 2
+    cache.clear(tier="material")
+    assert len(cache) == 1 and cache.get(1) is not None
+
+
+def test_evaluator_caches_by_zobrist_hash():
+    ev = Evaluator(engine_service=None, ai_config={"eval_cache_size": 16})
+    ev.model = None
+    board = chess.Board()
+    first = ev.evaluate_board(board)
+    # same position reached by a different move order is a cache hit
+    transposed = chess.Board()
+    for uci in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+        transposed.push_uci(uci)
+    assert ev.evaluate_board(transposed) == first
+    assert ev.cache_stats()["hits"] == 1
+
+
+def test_fallback_search_finds_tactics_within_budget():
+    import time
+    from ai.search import FallbackSearcher, MATE_SCORE
+    # back-rank mate in one
+    res = FallbackSearcher().search(chess.Board("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"), max_depth=3)
+    assert res.best_move == chess.Move.from_uci("a1a8")
+    assert res.score == MATE_SCORE - 1
+    # the black queen on h4 hangs to the knight; scores are from White's view
+    board = chess.Board("rnb1kbnr/pppp1ppp/8/4p3/4P2q/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+    res = FallbackSearcher().search(board, max_depth=2, multipv=3)
+    assert res.best_move == chess.Move.from_uci("f3h4")
+    assert res.score > 700 and len(res.lines) == 3
+    # best-so-far result once the budget runs out
+    start = time.perf_counter()
+    res = FallbackSearcher().search(chess.Board(), max_depth=30, time_limit=0.1)
+    assert time.perf_counter() - start < 0.5
+    assert 1 <= res.depth < 30 and res.best_move in chess.Board().legal_moves
+
+
+def test_fallback_search_check_evasions_and_repetition():
+    from ai.search import FallbackSearcher, INF, static_eval
+    # White is in check and loses the queen after any evasion: no standing pat on +80
+    board = chess.Board("1r5k/8/8/8/8/Q7/2n5/4K3 w - - 0 1")
+    assert static_eval(board) > 0
+    searcher = FallbackSearcher()
+    assert searcher._quiescence(board, -INF, INF, 0) < -500
+    # a queen down, Black takes the draw by repeating a position of the game
+    board = chess.Board("3k4/8/8/8/8/8/4P3/4K2Q w - - 0 1")
+    for uci in ("h1h2", "d8e8", "h2h1", "e8d8", "h1h2"):
+        board.push_uci(uci)
+    res = FallbackSearcher().search(board, max_depth=2, multipv=3)
+    assert res.best_move == chess.Move.from_uci("d8e8") and res.score == 0
+
+
+def test_recommender_fallback_search():
+    from ai.recommender import Recommender
+    ev = Evaluator(engine_service=None, ai_config={})
+    rec = Recommender(ev, {"suggestion_count": 3, "fallback_search_depth": 2})
+    board = chess.Board("rnb1kbnr/pppp1ppp/8/4p3/4P2q/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+    suggestions = rec.suggest_moves(board)
+    assert suggestions[0]["uci"] == "f3h4"
+    assert suggestions[0]["pv"][0] == "f3h4"
+    assert len(suggestions) == 3
+
+
+def test_recommender_fallback_search_scores_candidates_with_model():
+    import numpy as np
+    from ai.recommender import Recommender
+
+    class FlatModel:
+        calls = 0
+
+        def predict(self, X):
+            FlatModel.calls += 1
+            return np.full(len(X), 42.0)
+
+    ev = Evaluator(engine_service=None, ai_config={"eval_cache_size": 0})
+    ev.model = FlatModel()
+    rec = Recommender(ev, {"suggestion_count": 3, "fallback_search_depth": 2, "fallback_search_time": 5.0})
+    rec.model = None
+    # the candidates are scored by the evaluator's model (on the scale of the root eval),
+    # in one predict: the search itself runs on static_eval
+    assert [s["score"] for s in rec.suggest_moves(chess.Board(), use_engine=False)] == [42.0] * 3
+    assert FlatModel.calls == 1
+
+
+def test_bitboard_eval_batch_matches_scalar():
+    import random
+    import numpy as np
+    from ai import bitboard_eval
+    rng = random.Random(7)
+    boards, board = [], chess.Board()
+    for _ in range(400):
+        moves = list(board.legal_moves)
+        if not moves:
+            board = chess.Board()
+            continue
+        board.push(rng.choice(moves))
+        boards.append(board.copy(stack=False))
+    scalar = [bitboard_eval.evaluate(b) for b in boards]
+    assert np.array_equal(bitboard_eval.evaluate_batch(boards), scalar)
+    assert bitboard_eval.evaluate(chess.Board()) == 0.0
+    # Nc3 attacks 5 free squares instead of 2, and the a1 rook now sees b1
+    assert bitboard_eval.evaluate(chess.Board("rnbqkbnr/pppppppp/8/8/8/2N5/PPPPPPPP/R1BQKBNR w KQkq - 0 1")) == 4.0
+    x = np.array([2 ** 64 - 1, 5, 0], dtype=np.uint64)
+    assert list(bitboard_eval._popcount_lut(x)) == [64, 2, 0]
+
+
+def test_forest_runtime_matches_sklearn(tmp_path):
+    import os
+    import joblib
+    import numpy as np
+    from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+    from ai.forest_runtime import flatten_forest, forest_path, load_forest, save_forest
+    from ai.evaluator import MODEL_PATH_DEFAULT
+    from ai.recommender import Recommender
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 22)) * 100
+    reg = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, X[:, 0] * 2 + rng.normal(size=400))
+    clf = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, np.where(X[:, 1] > 0, 4, 1))
+    test = rng.normal(size=(100, 22)) * 100
+    for model in (reg, clf):
+        forest = flatten_forest(model)
+        assert np.array_equal(forest.predict(test), model.predict(test))
+        assert np.array_equal(load_forest(save_forest(model, str(tmp_path / "f")), mmap_mode="r").predict(test), model.predict(test))
+    assert np.array_equal(flatten_forest(clf).predict_proba(test), clf.predict_proba(test))
+
+    # the export next to the pickle is what gets served
+    pkl = str(tmp_path / "strategy_recommender.pkl")
+    joblib.dump(clf, pkl)
+    save_forest(clf, forest_path(pkl))
+    rec = Recommender(Evaluator(engine_service=None, ai_config={}), {}, model_path=pkl)
+    assert type(rec.model).__name__ == "ForestModel"
+    assert os.path.dirname(os.path.dirname(MODEL_PATH_DEFAULT)) == os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_model_registry_shares_and_reloads(tmp_path):
+    import os
+    import numpy as np
+    from sklearn.ensemble import RandomForestRegressor
+    from ai.forest_runtime import forest_path, save_forest
+    from ai.model_registry import ModelRegistry
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 22))
+    path = str(tmp_path / "move_evaluator.pkl")
+    save_forest(RandomForestRegressor(n_estimators=3, random_state=0).fit(X, X[:, 0]), forest_path(path))
+    registry = ModelRegistry()
+    a = Evaluator(engine_service=None, ai_config={"model_reload_interval": 0}, model_path=path, registry=registry)
+    b = Evaluator(engine_service=None, ai_config={"model_reload_interval": 0}, model_path=path, registry=registry)
+    assert a.model is b.model and isinstance(a.model.threshold, np.memmap)
+    score = a.evaluate_board(chess.Board())
+    a.cache.put(1, 35.0, "engine", depth=12)
+    assert len(a.cache) == 2
+
+    # retrained model on disk: picked up without a restart, stale model evals dropped
+    save_forest(RandomForestRegressor(n_estimators=3, random_state=0).fit(X, X[:, 0] + 500), forest_path(path))
+    os.utime(os.path.join(forest_path(path), "meta.json"), ns=(0, 10 ** 18))
+    assert a.evaluate_board(chess.Board()) != score
+    # engine results do not depend on the model and survive the reload
+    assert a.cache.get(1, min_tier="engine") == (35.0, "engine", 12)
+    assert b.model is a.model and registry.get(path).version == 2
+    stats = registry.stats()
+    info = stats["models"][os.path.abspath(path)]
+    assert info["format"] == "forest-mmap" and info["version"] == 2 and info["nbytes"] > 0
+    assert stats["reloads"] == 1
+
+    # a pinned model is left alone
+    a.model = None
+    assert a.model is None and b.model is not None
+
+
+def test_benchmark_suite_flags_regressions(tmp_path):
+    import json
+    from benchmarks import suite
+    results = suite.run(["encode_board_features"], rounds=2, min_time=0.001)
+    case = results["results"]["encode_board_features"]
+    assert case["ops"] == 6 and case["min_us"] > 0
+    # far faster than any machine: flagged however noisy the timing is
+    faster = {"results": {"encode_board_features": dict(case, min_us=case["min_us"] / 50, median_us=case["median_us"] / 50)}}
+    assert [r[0] for r in suite.compare(results, faster)] == ["encode_board_features"]
+    assert suite.compare(results, results) == []
+    # only one of best / median slower: noise, not a regression
+    noisy = {"results": {"encode_board_features": dict(case, min_us=case["min_us"] / 2)}}
+    assert suite.compare(results, noisy) == []
+    # flagged but not slower when timed again: not confirmed
+    slow = {"results": {"encode_board_features": dict(case, min_us=case["min_us"] * 1000, median_us=case["median_us"] * 1000)}}
+    flagged = [("encode_board_features", 1.0, 2.0, 2.0)]
+    assert suite.confirm(flagged, slow, reruns=1, rounds=2, min_time=0.001) == []
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(faster))
+    assert suite.main(["--filter", "encode_board", "--rounds", "2", "--min_time", "0.001", "--reruns", "1", "--baseline", str(baseline)]) == 1
+    assert suite.main(["--filter", "encode_board", "--rounds", "2", "--min_time", "0.001", "--reruns", "1", "--baseline", str(baseline), "--tolerance", "1000"]) == 0
+    missing = tmp_path / "missing.json"
+    assert suite.main(["--filter", "encode_board", "--rounds", "2", "--min_time", "0.001", "--baseline", str(missing)]) == 2
+
+
+def test_expand_children_single_pass_matches_encoder():
+    import numpy as np
+    from ai.recommender import Recommender
+    from ai.utils import encode_boards_features
+    board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+    moves = list(board.legal_moves)
+    children, features = Recommender._expand_children(board, moves, with_features=True)
+    assert board.fen() == "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3"
+    assert [c.fen() for c in children] == [_after(board, mv) for mv in moves]
+    assert np.array_equal(features, encode_boards_features(children))
+    assert Recommender._expand_children(board, moves)[1] is None
+
+
+def test_benchmark_cases_clean_up(tmp_path, monkeypatch):
+    import tempfile
+    from benchmarks import suite
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    suite.time_case(suite.case_db_add_move, rounds=1, min_time=0.001)
+    # the throwaway database is closed and its directory removed
+    assert list(tmp_path.iterdir()) == []
+
+
+def _after(board, mv):
+    b = board.copy()
+    b.push(mv)
+    return b.fen()
@@ -1,8 +1,11 @@
 # tests/test_backend.py
+import chess
+import pytest
 from fastapi.testclient import TestClient
 from backend.app import app
 
 client = TestClient(app)
+IMPORT_TIME_BUDGET_S = 2.0
 
 
 def test_root():
@@ -11,6 +14,86 @@ def test_root():
     assert r.json().get("ok") is True
 
 
+def test_backend_import_is_light():
+    # cold start budget: importing the app must not pull in numpy/sklearn or load models
+    import json, os, subprocess, sys
+    code = (
+        "import json, sys, time; t = time.perf_counter(); import backend.app; "
+        "print(json.dumps({'seconds': time.perf_counter() - t, 'modules': sorted(sys.modules)}))"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    assert not {"numpy", "sklearn", "joblib", "ai", "uvicorn"} & set(result["modules"])
+    assert result["seconds"] < IMPORT_TIME_BUDGET_S
+
+
+def test_ready_reports_warmup():
+    import time
+    with TestClient(app) as c:
+        deadline = time.time() + 30
+        r = c.get("/ready")
+        while r.status_code == 503 and time.time() < deadline:
+            assert r.json()["status"] == "cold"
+            time.sleep(0.05)
+            r = c.get("/ready")
+        assert r.status_code == 200
+        assert r.json()["status"] == "warm" and r.json()["models"] is True
+
+
+def test_failed_warmup_is_retried():
+    import asyncio
+    from backend.services.container import ServiceContainer
+
+    async def scenario():
+        services = ServiceContainer({"server": {"warmup_retry_max_delay": 0.01}, "ai": {}})
+        warmup, failures = services.ai_service.warmup, []
+
+        def flaky():
+            if len(failures) < 2:
+                failures.append(1)
+                raise RuntimeError("model file busy")
+            warmup()
+
+        services.ai_service.warmup = flaky
+        assert services.readiness()["warmup_seconds"] is None
+        await services.startup()
+        await asyncio.wait_for(services._warmup_task, timeout=30)
+        state = services.readiness()
+        assert services.ready and state["status"] == "warm"
+        assert state["attempts"] == 3 and state["error"] is None and state["warmup_seconds"] > 0
+        await services.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_warmup_is_not_ready():
+    import asyncio
+    import threading
+    from backend.services.container import ServiceContainer
+
+    async def scenario():
+        services = ServiceContainer({"ai": {}})
+        loading = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            loading.set()
+            release.wait(10)
+
+        services.ai_service.warmup = slow
+        await services.startup()
+        await asyncio.to_thread(loading.wait, 10)
+        services._warmup_task.cancel()
+        await asyncio.gather(services._warmup_task, return_exceptions=True)
+        release.set()
+        assert services._warmup_task.done() and services.warmup_error is None
+        assert not services.ready and services.readiness()["status"] == "cold"
+        await services.shutdown()
+
+    asyncio.run(scenario())
+
+
 def test_start_and_state():
     r = client.post("/game/start", json={"mode":"local"})
     assert r.status_code == 200
@@ -22,3 +105,236 @@ def test_start_and_state():
     assert r2.status_code == 200
     d2 = r2.json()
     assert d2["game_id"] == game_id
+
+
+def test_engine_pool_without_binary_falls_back():
+    from backend.services.chess_engine_service import ChessEngineService
+    svc = ChessEngineService({"stockfish_path": "/nonexistent/stockfish", "pool_size": 2})
+    assert svc.available is False
+    assert svc.analyze(chess.Board()) is None
+    assert svc.analyze_multipv(chess.Board()) is None
+    assert svc.stats()["engines"] == 0
+    svc.quit()
+
+
+def test_ai_analyze():
+    r = client.post("/ai/analyze", json={"fen": "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1", "last_move": "e2e4"})
+    assert r.status_code == 200
+    data = r.json()
+    assert isinstance(data["eval"], float)
+    assert len(data["suggestions"]) > 0
+    assert client.post("/ai/analyze", json={"fen": "not a fen"}).status_code == 400
+
+
+def test_ai_analyze_stream():
+    r = client.get("/ai/analyze/stream", params={"fen": chess.STARTING_FEN, "max_depth": 4})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    # without an engine the stream is a single final event
+    assert "event: done" in r.text
+    assert client.get("/ai/analyze/stream", params={"fen": "not a fen"}).status_code == 400
+
+
+def test_ai_analyze_batch():
+    mated = "rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3"
+    items = [{"fen": chess.STARTING_FEN}, {"fen": "not a fen"}, {"fen": mated, "last_move": "d8h4"}]
+    r = client.post("/ai/analyze_batch", json={"items": items})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [res["fen"] for res in results] == [item["fen"] for item in items]
+    assert len(results[0]["suggestions"]) > 0
+    assert "Invalid FEN" in results[1]["error"]
+    assert results[2]["eval"] == -100000.0
+
+
+def test_batch_falls_back_to_per_item_eval():
+    from backend.services.ai_service import AIService
+    svc = AIService(None, {"suggestion_count": 2})
+    evaluator = svc.evaluator
+    bad = chess.Board("rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2")
+    single, batch = evaluator.evaluate_board, evaluator.evaluate_boards
+
+    # one position the evaluator cannot handle: it poisons any batch it is part of
+    def evaluate_boards(boards, *args, **kwargs):
+        if any(b.board_fen() == bad.board_fen() for b in boards):
+            raise RuntimeError("bad position")
+        return batch(boards, *args, **kwargs)
+
+    def evaluate_board(board, *args, **kwargs):
+        if board.board_fen() == bad.board_fen():
+            raise RuntimeError("bad position")
+        return single(board, *args, **kwargs)
+
+    evaluator.evaluate_boards = evaluate_boards
+    evaluator.evaluate_board = evaluate_board
+    results = svc._execute_batch([(chess.Board(), None), (bad, None)])
+    # the batch error is not fatal: every item is evaluated on its own, only the bad one fails
+    assert isinstance(results[0], dict) and len(results[0]["suggestions"]) > 0
+    assert isinstance(results[1], RuntimeError)
+
+
+def test_services_are_app_scoped():
+    from backend.services.container import ServiceContainer
+    with TestClient(app) as c:
+        services = app.state.services
+        assert isinstance(services, ServiceContainer)
+        gid = c.post("/game/start", json={"mode": "local"}).json()["game_id"]
+        assert c.get(f"/game/state/{gid}").status_code == 200
+        assert app.state.services is services
+    # torn down with the lifespan
+    assert app.state.services is None
+
+
+def test_analysis_plan_searches_root_once():
+    from backend.services.ai_service import AIService
+
+    class FailingEngine:
+        available = True
+        calls = 0
+
+        def analyze_multipv(self, board, multipv=3, limit=0.1):
+            FailingEngine.calls += 1
+            return None     # search failed: must not be retried per move or for the eval
+
+        def analyze(self, board, limit=0.1):
+            raise AssertionError("root already searched")
+
+    svc = AIService(FailingEngine(), {"suggestion_count": 3})
+    out = svc.analyze_position(chess.Board(), last_move=None)
+    assert FailingEngine.calls == 1
+    assert len(out["suggestions"]) == 3
+    assert set(out["timings"]) >= {"engine", "eval", "suggestions", "feedback", "total"}
+
+
+def test_database_reuses_thread_connection(tmp_path):
+    from backend.services.database_service import DatabaseService
+    db = DatabaseService(str(tmp_path / "t.sqlite3"), busy_timeout_ms=1234)
+    conn = db._get_conn()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+    db.create_game("g1", "fen", "local", "w", "b")
+    db.add_move("g1", "e2e4", "fen2")
+    assert db._get_conn() is conn
+    assert db.get_game("g1")["fen"] == "fen2"
+    db.close()
+
+
+def test_database_migrates_move_numbering(tmp_path):
+    import sqlite3
+    from backend.services.database_service import DatabaseService
+    path = str(tmp_path / "old.sqlite3")
+    old = sqlite3.connect(path)
+    old.execute("CREATE TABLE games (id TEXT PRIMARY KEY, fen TEXT, mode TEXT, white TEXT, black TEXT, created_at TIMESTAMP)")
+    old.execute("CREATE TABLE moves (id INTEGER PRIMARY KEY AUTOINCREMENT, game_id TEXT, move_uci TEXT, fen TEXT, move_no INTEGER, created_at TIMESTAMP)")
+    old.execute("INSERT INTO games (id, fen) VALUES ('g1', 'f')")
+    # duplicate move_no as produced by two racing COUNT(*)-based inserts
+    old.executemany("INSERT INTO moves (game_id, move_uci, fen, move_no) VALUES ('g1', ?, 'f', ?)", [("e2e4", 1), ("e7e5", 2), ("g1f3", 2)])
+    old.commit()
+    old.close()
+
+    db = DatabaseService(path)
+    assert [m["move_no"] for m in db.get_moves("g1")] == [1, 2, 3]
+    assert db.add_move("g1", "b8c6", "f2") == 4
+    with pytest.raises(sqlite3.IntegrityError):
+        db._get_conn().execute("INSERT INTO moves (game_id, move_uci, fen, move_no) VALUES ('g1', 'x', 'f', 4)")
+    # tables added since are created on open: the schema comes from DatabaseService, not a shipped db file
+    db.save_position_analysis("k", "TestFish 1", 10, 5.0, [])
+    assert db.get_position_analysis("k", "TestFish 1")["depth"] == 10
+    db.close()
+
+
+def test_position_analysis_is_reused(tmp_path):
+    from backend.services.database_service import DatabaseService
+    from backend.services.ai_service import AIService
+
+    class CountingEngine:
+        available = True
+        engine_name = "TestFish 1"
+        calls = 0
+
+        def analyze_multipv(self, board, multipv=3, limit=0.1):
+            CountingEngine.calls += 1
+            moves = list(board.legal_moves)[:multipv]
+            return [{"move": mv, "score": None, "cp": 20.0, "pv": [mv], "depth": 14} for mv in moves]
+
+    db = DatabaseService(str(tmp_path / "a.sqlite3"))
+    svc = AIService(CountingEngine(), {"suggestion_count": 3}, db=db)
+    first = svc.analyze_position(chess.Board())
+    # same position in another game (different move clocks) reuses the stored search
+    again = svc.analyze_position(chess.Board("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 4 3"))
+    assert CountingEngine.calls == 1
+    assert again["suggestions"] == first["suggestions"] and again["eval"] == 20.0
+
+    key = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -"
+    db.save_position_analysis(key, "TestFish 1", 5, 99.0, [])   # shallower: ignored
+    assert db.get_position_analysis(key, "TestFish 1")["depth"] == 14
+    assert db.get_position_analysis(key, "TestFish 1", min_depth=20) is None
+    # a deeper single-line search is replaced by a shallower one with more lines
+    db.save_position_analysis("k2", "TestFish 1", 20, 1.0, [{"uci": "e2e4"}])
+    db.save_position_analysis("k2", "TestFish 1", 14, 2.0, [{"uci": "e2e4"}, {"uci": "d2d4"}, {"uci": "g1f3"}])
+    assert len(db.get_position_analysis("k2", "TestFish 1")["lines"]) == 3
+    db.save_position_analysis("k2", "TestFish 1", 10, 3.0, [{"uci": "c2c4"}])   # shallower and fewer lines: ignored
+    assert db.get_position_analysis("k2", "TestFish 1")["eval"] == 2.0
+    db.close()
+
+
+def test_async_engine_pool_restarts_dead_engines(fake_engine):
+    import asyncio
+    from backend.services.async_engine_service import AsyncChessEngineService
+
+    async def scenario():
+        svc = AsyncChessEngineService({"stockfish_path": fake_engine, "pool_size": 2, "health_check_interval": 0})
+        await svc.start()
+        assert svc.stats()["engines"] == 2 and svc.engine_name == "FakeFish 1"
+        lines = await svc.analyze_multipv(chess.Board(), multipv=1, limit=0.01)
+        assert lines[0]["cp"] == 12.0
+        stats = svc.stats()
+        assert stats["checkouts"] == 1 and stats["idle"] == 2 and stats["in_use"] == 0
+
+        # an idle engine died: the health check replaces it
+        svc._engines[0][0].kill()
+        await asyncio.sleep(0.2)
+        assert await svc.health_check() == 1
+        assert svc.stats()["engines"] == 2 and svc.stats()["restarts"] == 1
+
+        # both died while idle: checkout restarts them before use
+        for transport, _ in list(svc._engines):
+            transport.kill()
+        await asyncio.sleep(0.2)
+        assert (await svc.analyze(chess.Board(), limit=0.01))["depth"] == 1
+        assert (await svc.analyze(chess.Board(), limit=0.01))["depth"] == 1
+        assert svc.stats()["restarts"] == 3 and svc.stats()["idle"] == 2
+        await svc.quit()
+
+        # the periodic check runs on its own
+        svc = AsyncChessEngineService({"stockfish_path": fake_engine, "pool_size": 1, "health_check_interval": 0.1})
+        await svc.start()
+        svc._engines[0][0].kill()
+        for _ in range(50):
+            await asyncio.sleep(0.1)
+            if svc.stats()["restarts"] and svc.stats()["idle"]:
+                break
+        assert svc.stats()["restarts"] == 1 and svc.stats()["engines"] == 1
+        await svc.quit()
+
+    asyncio.run(scenario())
+
+
+def test_analysis_events_returns_engine_on_close(fake_engine):
+    import asyncio
+    from backend.services.async_engine_service import AsyncChessEngineService
+    from backend.services.ai_service import AIService
+
+    async def scenario():
+        engine = AsyncChessEngineService({"stockfish_path": fake_engine, "pool_size": 1, "health_check_interval": 0})
+        svc = AIService(None, {"suggestion_count": 1}, async_engine_service=engine)
+        events = svc.analysis_events(chess.Board(), max_depth=5, max_time=5.0)
+        first = await events.__anext__()
+        assert first["depth"] == 1 and not first["final"]
+        assert engine.stats()["in_use"] == 1
+        # a disconnecting client closes the outer generator: the engine is back right away
+        await events.aclose()
+        assert engine.stats()["in_use"] == 0
+        await engine.quit()
+
+    asyncio.run(scenario())
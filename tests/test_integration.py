@@ -19,3 +19,57 @@ def test_move_flow():
     data = r2.json()
     assert "analysis" in data
     assert data["fen"] is not None
+
+
+def test_move_cursor_and_pagination():
+    gid = client.post("/game/start", json={"mode": "local"}).json()["game_id"]
+    cursor = 0
+    for uci in ["e2e4", "e7e5", "g1f3", "b8c6"]:
+        data = client.post("/game/move", json={"game_id": gid, "uci": uci, "since_move_no": cursor}).json()
+        # only the moves the client did not have yet
+        assert [m["uci"] for m in data["moves"]] == [uci]
+        cursor = data["move_no"]
+    assert cursor == 4
+    assert client.get(f"/game/state/{gid}", params={"since_move_no": 4}).json()["moves"] == []
+
+    page1 = client.get(f"/game/{gid}/moves", params={"limit": 3}).json()
+    assert [m["move_no"] for m in page1["moves"]] == [1, 2, 3]
+    page2 = client.get(f"/game/{gid}/moves", params={"after": page1["next_cursor"], "limit": 3}).json()
+    assert [m["uci"] for m in page2["moves"]] == ["b8c6"]
+    assert page2["next_cursor"] is None
+
+
+def test_game_review():
+    gid = client.post("/game/start", json={"mode": "local"}).json()["game_id"]
+    assert client.get(f"/game/{gid}/review").status_code == 404
+    for uci in ["e2e4", "e7e5", "g1f3", "d8h4", "f3h4"]:
+        client.post("/game/move", json={"game_id": gid, "uci": uci})
+    review = client.post(f"/game/{gid}/review").json()
+    assert [p["move_no"] for p in review["plies"]] == [1, 2, 3, 4, 5]
+    assert review["plies"][3]["color"] == "black"
+    assert set(review["summary"]) == {"white", "black"}
+    assert review["plies_per_second"] > 0
+    assert client.get(f"/game/{gid}/review").json()["plies"] == review["plies"]
+
+    # a new move makes the stored review stale
+    client.post("/game/move", json={"game_id": gid, "uci": "b8c6"})
+    assert client.get(f"/game/{gid}/review").status_code == 404
+    assert client.post("/game/nope/review").status_code == 404
+
+
+def test_review_classifies_from_movers_view():
+    from backend.services.game_review_service import GameReviewService
+    board = chess.Board()
+    positions, moves = [board.copy()], []
+    for no, uci in enumerate(["e2e4", "d7d5", "e4d5"], start=1):
+        board.push_uci(uci)
+        positions.append(board.copy())
+        moves.append({"move_no": no, "uci": uci, "fen": board.fen()})
+    # 1. e4 drops 60, 1... d5 allows a mate, 2. exd5 misses it but stays winning
+    analyses = [{"eval": e, "suggestions": []} for e in (30.0, -30.0, 100000.0, 2000.0)]
+    report = GameReviewService(None, None).build_report("g", positions, moves, analyses)
+    assert [p["classification"] for p in report["plies"]] == ["inaccuracy", "blunder", None]
+    assert report["summary"]["black"]["blunders"] == 1
+    # mate scores are clamped before taking the difference
+    assert report["plies"][1]["loss"] == 1030.0
+    assert report["plies"][2]["loss"] == 0.0
@@ -0,0 +1,177 @@
+# tests/test_models.py
+import random
+import chess
+import chess.pgn
+import pytest
+
+
+def _write_pgn(path, games=60, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for g in range(games):
+            board, game = chess.Board(), chess.pgn.Game()
+            game.headers["Event"] = f"Game {g}"
+            node = game
+            for _ in range(rng.randint(5, 40)):
+                moves = list(board.legal_moves)
+                if not moves:
+                    break
+                mv = rng.choice(moves)
+                node = node.add_variation(mv)
+                board.push(mv)
+            print(game, file=f, end="\n\n")
+
+
+def test_parallel_pgn_ingestion_is_reproducible(tmp_path):
+    from models.ingest import iter_sampled_positions, split_pgn
+    _write_pgn(tmp_path / "a.pgn")
+    _write_pgn(tmp_path / "b.pgn", seed=1)
+
+    chunks = split_pgn(tmp_path / "a.pgn", chunk_bytes=1024)
+    assert len(chunks) > 1
+    with open(tmp_path / "a.pgn", "rb") as f:
+        data = f.read()
+    assert all(data[start:].startswith(b"[Event ") for _, start, _ in chunks)
+    assert chunks[-1][2] == len(data)
+
+    kwargs = dict(seed=3, chunk_bytes=1024)
+    serial = list(iter_sampled_positions(str(tmp_path), workers=1, **kwargs))
+    assert serial == list(iter_sampled_positions(str(tmp_path), workers=2, **kwargs))
+    assert serial != list(iter_sampled_positions(str(tmp_path), workers=1, seed=4, chunk_bytes=1024))
+    assert list(iter_sampled_positions(str(tmp_path), max_positions=10, workers=2, **kwargs)) == serial[:10]
+    for fen, uci in serial[:20]:
+        # fen is the position after the move: the moved piece belongs to the side not to move
+        board = chess.Board(fen)
+        assert board.color_at(chess.Move.from_uci(uci).to_square) != board.turn
+
+
+def test_labeling_resumes_from_shard(tmp_path):
+    import json
+    from models.labeling import label_positions, read_shard, _drop_partial_line
+    shard = tmp_path / "labels.jsonl"
+    fen = chess.Board().fen()
+    other = chess.Board("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1").fen()
+    with open(shard, "w") as f:
+        f.write(json.dumps({"fen": other, "last_move": "e2e4", "eval": 30.0, "best": "e7e5", "limit": "time=0.05"}) + "\n")
+        f.write(json.dumps({"fen": fen, "last_move": None, "eval": 20.0, "best": "e2e4", "limit": "time=0.05"}) + "\n")
+        f.write('{"fen": "rnbqkb')     # the previous run died mid-write
+    assert read_shard(shard)[1] == (fen, None, 20.0, "e2e4")
+    # everything requested is already labeled: no engine is started (the path does
+    # not exist), and only the requested position comes back
+    assert label_positions([(fen, None)], "/nonexistent/stockfish", str(shard)) == [(fen, None, 20.0, "e2e4")]
+    _drop_partial_line(shard)
+    assert open(shard).read().endswith('"limit": "time=0.05"}\n')
+    # labels searched with other settings are not reused: that needs an engine
+    assert read_shard(shard, "depth=12") == []
+    with pytest.raises(RuntimeError):
+        label_positions([(fen, None)], "/nonexistent/stockfish", str(shard), depth=12, time_limit=None)
+
+
+def test_label_store_reuses_labels_across_runs(tmp_path):
+    from models.label_store import LabelStore, limit_key
+    from models.labeling import label_positions
+    from ai.utils import position_key
+    start = chess.Board()
+    # same position with different move clocks, plus an exact duplicate
+    positions = [(start.fen(), None), (chess.Board("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 4 3").fen(), None), (start.fen(), None)]
+    store = LabelStore(str(tmp_path / "labels.sqlite3"))
+    store.put_many([(position_key(start), 25.0, "e2e4")], limit_key(0.05))
+    assert limit_key(0.05) == "time=0.05" and limit_key(None, 12) == "depth=12"
+
+    # every position is known to the store: no engine needed (the path does not exist)
+    labeled = label_positions(positions, "/nonexistent/stockfish", str(tmp_path / "run.jsonl"), time_limit=0.05, store=store)
+    assert labeled == [(start.fen(), None, 25.0, "e2e4")]
+    # other search settings do not reuse the label
+    assert store.get_many([position_key(start)], limit_key(0.1)) == {}
+    store.close()
+
+
+def test_feature_store_incremental_and_versioned(tmp_path, monkeypatch):
+    import json
+    import numpy as np
+    import models.feature_store as fs
+    from models.train_model import build_datasets
+    shard = tmp_path / "labels.jsonl"
+    board = chess.Board()
+    rows = []
+    for uci in ["e2e4", "e7e5", "g1f3", "b8c6"]:
+        rows.append((board.fen(), None, 10.0 * len(rows), uci))
+        board.push_uci(uci)
+    with open(shard, "w") as f:
+        for fen, last, ev, best in rows[:3]:
+            f.write(json.dumps({"fen": fen, "last_move": last, "eval": ev, "best": best}) + "\n")
+        f.write('{"fen": "rnbqkb')     # still being written: left for the next update
+
+    store = fs.FeatureStore(str(tmp_path / "features"))
+    assert store.update([str(shard)]) == 3
+    assert store.update([str(shard)]) == 0
+    with open(shard, "a") as f:
+        fen, last, ev, best = rows[3]
+        f.write('nr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", "eval": 0.0, "best": null}\n')
+        f.write(json.dumps({"fen": fen, "last_move": last, "eval": ev, "best": best}) + "\n")
+    assert store.update([str(shard)]) == 2
+    assert len(store.parts()) == 2
+
+    X, y_eval, y_label = fs.FeatureStore(str(tmp_path / "features")).load()
+    assert isinstance(X, np.memmap) and X.shape == (5, fs.N_FEATURES)
+    expected = rows[:3] + [(chess.Board().fen(), None, 0.0, None), rows[3]]
+    eX, ey, el = build_datasets(expected)
+    assert np.allclose(X, eX) and np.allclose(y_eval, ey) and (y_label == el).all()
+
+    # a new feature encoder makes every stored part stale
+    monkeypatch.setattr(fs, "FEATURE_VERSION", fs.FEATURE_VERSION + 1)
+    store = fs.FeatureStore(str(tmp_path / "features"))
+    assert store.parts() == [] and list((tmp_path / "features" / "parts").iterdir()) == []
+    assert store.update([str(shard)]) == 5
+
+    # rewritten in place without shrinking: the encoded bytes changed, so start over
+    text = shard.read_text()
+    shard.write_text(text.replace('"eval": 0.0', '"eval": 9.0'))
+    assert store.update([str(shard)]) == 5 and len(store.parts()) == 1
+    assert float(store.load()[1][3]) == 9.0
+
+    # load() only includes the sources asked for
+    other = tmp_path / "other.jsonl"
+    with open(other, "w") as f:
+        f.write(json.dumps({"fen": rows[0][0], "last_move": None, "eval": 1.0, "best": "d2d4"}) + "\n")
+    assert store.update([str(other)]) == 1
+    assert len(store.load()[0]) == 6
+    assert len(store.load([str(shard)])[0]) == 5 and len(store.load([str(other)])[0]) == 1
+
+    # large updates are split into parts of PART_ROWS rows, each named after its start offset
+    monkeypatch.setattr(fs, "PART_ROWS", 2)
+    store = fs.FeatureStore(str(tmp_path / "split"))
+    assert store.update([str(shard)]) == 5
+    offsets = [int(p.rsplit("-", 1)[1]) for p in store.parts()]
+    assert len(offsets) == 3 and offsets[0] == 0
+    lines = shard.read_bytes().splitlines(keepends=True)
+    assert offsets[1:] == [len(b"".join(lines[:2])), len(b"".join(lines[:4]))]
+    whole = fs.FeatureStore(str(tmp_path / "features")).load([str(shard)])
+    assert all(np.array_equal(a, b) for a, b in zip(store.load(), whole))
+
+
+def test_labeling_streams_positions(tmp_path, fake_engine):
+    from models.labeling import label_positions
+    consumed = []
+
+    def sample():
+        board = chess.Board()
+        for uci in ["e2e4", "e7e5", "g1f3", "b8c6"]:
+            board.push_uci(uci)
+            consumed.append(uci)
+            yield board.fen(), uci
+
+    labeled = label_positions(sample(), fake_engine, str(tmp_path / "labels.jsonl"), workers=2, time_limit=0.01)
+    assert len(consumed) == 4 and len(labeled) == 4
+    assert all(abs(ev) == 12.0 and chess.Move.from_uci(best) in chess.Board(fen).legal_moves for fen, _, ev, best in labeled)
+    # engines that cannot start fail the run instead of blocking on the full task queue
+    many = []
+    for fen, _, _, _ in labeled:
+        board = chess.Board(fen)
+        for mv in board.legal_moves:
+            board.push(mv)
+            many.append((board.fen(), mv.uci()))
+            board.pop()
+    assert len(many) > 40
+    with pytest.raises(RuntimeError):
+        label_positions(iter(many), "/nonexistent/stockfish", str(tmp_path / "other.jsonl"), workers=1)